@@ -1,7 +1,7 @@
 from .diary import Diary
-from .events import Event
+from .events import BaseEvent, Event, CompactEvent
 from .levels import log_level
 from .logdb import DiaryDB
 from .logthread import DiaryThread
 
-__all__ = ['Diary', 'DiaryDB', 'DiaryThread', 'Event', 'log_level']
\ No newline at end of file
+__all__ = ['BaseEvent', 'CompactEvent', 'Diary', 'DiaryDB', 'DiaryThread', 'Event', 'log_level']
\ No newline at end of file
@@ -0,0 +1,141 @@
+"""
+asyncio support for Diary, requires Python 3.5 or newer.
+AsyncDiary logs like Diary without blocking the event loop; events wait in
+an asyncio.Queue and are written in batches by a task which runs file and
+database I/O in a single worker thread:
+    logger = AsyncDiary("logs")
+    logger.info("Started app")
+    await logger.flush()
+    await logger.aclose()
+"""
+
+import asyncio
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from diary.diary import Diary
+
+if sys.version_info < (3, 7):
+    _running_loop = asyncio._get_running_loop
+else:
+    def _running_loop():
+        """:return: loop running in this thread, None if there is none"""
+        try:
+            return asyncio.get_running_loop()
+        except RuntimeError:
+            return None
+
+
+class AsyncDiary(Diary):
+    """A Diary whose writer is an asyncio task"""
+
+    def __init__(self, path, loop=None, max_batch=1000, **kwargs):
+        """
+        :param path: see Diary.__init__
+        :param loop: event loop to run the writer task in, defaults to the
+            current event loop
+        :param max_batch: most events written in a single group commit
+        :param kwargs: passed to Diary, async and queue are ignored
+        """
+        self.loop = asyncio.get_event_loop() if loop is None else loop
+        self.max_batch = max_batch
+        self._closed = False
+        kwargs['async'] = False
+        kwargs.pop('queue', None)
+        Diary.__init__(self, path, **kwargs)
+
+    def _start_writer(self, sets_db, queue):
+        """Start the writer task and its worker thread
+
+        :param sets_db: if a database needs to be set
+        :param queue: unused, events wait in an asyncio.Queue
+        """
+        # One worker keeps SQLite on one thread and bounds I/O to a batch at a time
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        if sets_db:
+            self._executor.submit(self.set_db)
+        if sys.version_info < (3, 10):
+            self._queue = asyncio.Queue(loop=self.loop)
+        else:  # Queues bind to the running loop
+            self._queue = asyncio.Queue()
+        self._writer = self.loop.create_task(self._run())
+
+    def _waiting(self):
+        """:return: asyncio.Queue events wait in"""
+        return self._queue
+
+    def _write(self, event):
+        """Queue an event for the writer task. Events logged from other
+        threads are handed to the loop, an asyncio.Queue is not thread-safe;
+        flush only waits for them once the loop has queued them.
+
+        :param event: event object to log
+        """
+        if self.loop.is_running() and _running_loop() is not self.loop:
+            self.loop.call_soon_threadsafe(self._queue.put_nowait, event)
+        else:
+            self._queue.put_nowait(event)
+
+    async def _run(self):
+        """Write batches of queued events until None is queued, doing the
+        idle work of the log file and database in the worker while none arrive"""
+        while True:
+            if self._queue.empty():
+                try:
+                    received = await asyncio.wait_for(self._queue.get(), self._idle_timeout())
+                except asyncio.TimeoutError:
+                    await self.loop.run_in_executor(self._executor, self._idle)
+                    continue
+            else:  # wait_for gives up on a timeout of 0 even when events are queued
+                received = self._queue.get_nowait()
+            batch = [received]
+            while len(batch) < self.max_batch and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+
+            closed = batch[-1] is None
+            events = [event for event in batch if event is not None]
+            try:
+                if events:
+                    await self.loop.run_in_executor(self._executor, self._write_many, events)
+            except Exception:  # Keep writing later batches
+                self.handle_error()
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if closed:
+                return
+
+    async def flush(self):
+        """Wait until every event logged so far is written to its file and db"""
+        await self._queue.join()
+        if self.log_file:
+            await self.loop.run_in_executor(self._executor, self.log_file.flush)
+
+    async def aclose(self):
+        """Write every queued event, then close the log file and database"""
+        if self._closed:
+            return
+        self._closed = True
+        self._queue.put_nowait(None)
+        await self._writer
+        await self.loop.run_in_executor(self._executor, self._close_files)
+        self._executor.shutdown()
+
+    def close(self):
+        """Close from synchronous code when the event loop is not running,
+        use await aclose() inside coroutines.
+        """
+        if self._closed or self.loop.is_closed():
+            return
+        if self.loop.is_running():
+            raise RuntimeError("AsyncDiary must be closed with await aclose() while its loop runs")
+        self.loop.run_until_complete(self.aclose())
+
+    def _close_files(self):
+        """Close the log file and database in the worker thread"""
+        if self.db_file:
+            self.db_file.close()
+            self.logdb.close()
+            self.readers.close()
+        if self.log_file:
+            self.log_file.close()
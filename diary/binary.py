@@ -0,0 +1,242 @@
+"""
+A compact binary log format for high volume logging.
+BinaryWriter skips text formatting entirely and stores each event as a
+length-prefixed record:
+    logger = Diary("log.bin", sink=BinaryWriter)
+
+Records are read back as Events or rendered as text with any format:
+    for event in read("log.bin"):
+        ...
+    convert("log.bin", "log.txt", log_format=formats.standard)
+
+A file starts with MAGIC followed by records of:
+    uint32  length of the rest of the record
+    int64   epoch microseconds the event was logged
+    uint8   level code, the severity of a built-in level or 0 for others
+    uint32  length of info
+    bytes   info encoded as UTF-8
+    bytes   JSON object of extra fields from Event subclasses, may be empty
+All integers are little-endian.
+"""
+
+from __future__ import absolute_import
+import calendar
+import io
+import json
+import math
+import struct
+import time
+from datetime import datetime
+
+from diary import events
+from diary import formats
+from diary import levels
+from diary.writers import LogWriter
+
+MAGIC = b'DIARYBIN\x01'
+HEADER = struct.Struct('<IqBI')
+
+_LENGTH_SIZE = 4
+_FIXED_SIZE = HEADER.size - _LENGTH_SIZE
+_CUSTOM_LEVEL = 0
+_BASE_FIELDS = frozenset(('info', 'level', 'dt', 'level_str', 'args', 'timestamp'))
+_CODES = {'DEBUG': 10, 'INFO': 20, 'WARN': 30, 'ERROR': 40}
+_NAMES = dict((code, name) for name, code in _CODES.items())
+_PLAIN_EVENTS = (events.Event, events.CompactEvent)
+_pack = HEADER.pack
+_last_minute = None, None
+
+try:
+    _text_type = unicode
+except NameError:  # python 3
+    _text_type = str
+
+
+def encode(event):
+    """
+    :param event: rendered event object
+    :return: bytes of event's record
+    """
+    info = event.info
+    if not isinstance(info, bytes):
+        info = (info if isinstance(info, _text_type) else _text_type(info)).encode('utf-8')
+
+    code = _CODES.get(event.level_str, _CUSTOM_LEVEL)
+    if type(event) in _PLAIN_EVENTS and code != _CUSTOM_LEVEL:
+        extra = b''
+    else:
+        extras = dict((name, value) for name, value in event.fields().items()
+                      if name not in _BASE_FIELDS and not name.startswith('_'))
+        if code == _CUSTOM_LEVEL:
+            extras['_level'] = event.level_str
+        extra = json.dumps(extras, default=str).encode('utf-8') if extras else b''
+
+    return _pack(_FIXED_SIZE + len(info) + len(extra), _epoch_us(event),
+                 code, len(info)) + info + extra
+
+
+def _epoch_us(event):
+    """:return: int microseconds since the epoch event was logged"""
+    global _last_minute
+    if isinstance(event, events.CompactEvent) and event.timestamp is not None:
+        fraction, seconds = math.modf(event.timestamp)  # Round as datetime.fromtimestamp does
+        return int(seconds) * 1000000 + int(round(fraction * 1000000))
+    dt = event.dt
+    minute, seconds = _last_minute
+    if minute is None or dt.tzinfo is not minute.tzinfo:
+        elapsed = None
+    else:
+        elapsed = dt - minute
+    # Offsets only change on the minute, so mktime is only needed once a minute
+    if elapsed is None or elapsed.days or elapsed.seconds >= 60:
+        minute = dt.replace(second=0, microsecond=0)
+        if dt.tzinfo is None:
+            seconds = int(time.mktime(minute.timetuple()))
+        else:
+            seconds = calendar.timegm(minute.utctimetuple())
+        _last_minute = minute, seconds
+        elapsed = dt - minute
+    return (seconds + elapsed.seconds) * 1000000 + elapsed.microseconds
+
+
+class BinaryWriter(LogWriter):
+    """Writes events as binary records instead of formatted text,
+    with the same flush and rotation policies as LogWriter.
+    """
+    text = False  # Diary does not format events for this writer
+    header = MAGIC
+
+    def write_many(self, texts, events=()):
+        """Buffer a group of events and flush if the policy is met
+
+        :param texts: ignored, records are made from events
+        :param events: events to write
+        """
+        records = [encode(event) for event in events]
+        self._pending.extend(records)
+        self.pending_bytes += sum(map(len, records))
+        self.pending_events += len(records)
+        if self.policy.due(self, events):
+            self.flush()
+
+
+def records(source, buffer_size=1 << 16):
+    """Read raw records without building events, the fastest way to scan a file
+
+    :param source: str path of a binary log file
+    :param buffer_size: bytes read from the file at a time
+    :return: generator of (epoch microseconds, level code, info bytes, extra bytes)
+    :raises ValueError: if source is not a binary log or ends with a partial record
+    """
+    unpack_from = HEADER.unpack_from
+    header_size = HEADER.size
+    with io.open(source, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError("{} is not a binary diary log".format(source))
+
+        data = b''
+        offset = 0
+        while True:
+            chunk = f.read(buffer_size)
+            if not chunk:
+                break
+            data = data[offset:] + chunk
+            offset = 0
+            end = len(data)
+            while end - offset >= header_size:
+                length, us, code, info_length = unpack_from(data, offset)
+                record_end = offset + _LENGTH_SIZE + length
+                if record_end > end:
+                    break
+                info_end = offset + header_size + info_length
+                yield us, code, data[offset + header_size:info_end], data[info_end:record_end]
+                offset = record_end
+
+        if offset < len(data):
+            raise ValueError("{} ends with a partial record".format(source))
+
+
+def unpack(buffer):
+    """Read raw records from a buffer of whole records, slicing without copying
+    when buffer is a memoryview
+
+    :param buffer: bytes or memoryview of records with no MAGIC
+    :return: generator of (epoch microseconds, level code, info, extra)
+    :raises ValueError: if buffer ends with a partial record
+    """
+    unpack_from = HEADER.unpack_from
+    header_size = HEADER.size
+    offset = 0
+    end = len(buffer)
+    while end - offset >= header_size:
+        length, us, code, info_length = unpack_from(buffer, offset)
+        record_end = offset + _LENGTH_SIZE + length
+        if record_end > end:
+            break
+        info_end = offset + header_size + info_length
+        yield us, code, buffer[offset + header_size:info_end], buffer[info_end:record_end]
+        offset = record_end
+
+    if offset < end:
+        raise ValueError("Buffer ends with a partial record")
+
+
+def read(source, event=events.Event, buffer_size=1 << 16):
+    """Read events from a binary log file
+
+    :param source: str path of a binary log file
+    :param event: Event class to construct, extra fields are set as attributes
+    :param buffer_size: bytes read from the file at a time
+    :return: generator of events in the order they were written
+    """
+    return build(records(source, buffer_size), event)
+
+
+def build(records, event=events.Event):
+    """Make events from raw records
+
+    :param records: iterable of records from records or unpack
+    :param event: Event class to construct, extra fields are set as attributes
+    :return: generator of events
+    """
+    base_init = events.CompactEvent.__init__ if issubclass(event, events.CompactEvent) \
+        else events.Event.__init__
+    from_timestamp = datetime.fromtimestamp
+    for us, code, info, extra in records:
+        seconds, microseconds = divmod(us, 1000000)
+        extras = json.loads(bytes(extra).decode('utf-8')) if extra else {}
+        level = levels.from_name(extras.pop('_level', None) or _NAMES[code])
+
+        logged = event.__new__(event)  # Subclass constructors may take other arguments
+        base_init(logged, bytes(info).decode('utf-8'), level,
+                  from_timestamp(seconds).replace(microsecond=microseconds))
+        for name, value in extras.items():
+            setattr(logged, name, value)
+        yield logged
+
+
+def convert(source, dest, log_format=formats.standard, event=events.Event,
+            encoding="utf-8"):
+    """Render a binary log file as a text log
+
+    :param source: str path of a binary log file
+    :param dest: str path of the text file to write
+    :param log_format: function or str.format template (see formats.py),
+        events with their own formatter use it instead
+    :param event: Event class to construct
+    :param encoding: str type of encoding to use for writing
+    :return: number of events written
+    """
+    log_format = formats.compile_format(log_format)
+    count = 0
+    with io.open(dest, 'w', encoding=encoding) as f:
+        for logged in read(source, event):
+            if logged.formatter is None:
+                text = log_format(logged)
+            else:
+                text = logged.formatted()
+            if isinstance(text, bytes):  # python 2
+                text = text.decode(encoding)
+            f.write(text + u'\n')
+            count += 1
+    return count
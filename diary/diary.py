@@ -1,14 +1,19 @@
 from __future__ import absolute_import
 from __future__ import print_function
 import atexit
+import functools
 import os.path
-import codecs
 import sys
+import traceback
+from time import time
+from timeit import default_timer
 
 from diary import logdb
 from diary import levels
 from diary import formats
 from diary import events
+from diary import writers
+from diary.stats import Stats
 
 _PY2 = sys.version_info[0] == 2
 
@@ -19,7 +24,9 @@ class Diary(object):
     def __init__(self, path, file_name="diary.txt", db_name="diary.db",
                  event=events.Event, log_format=formats.standard,
                  db=logdb.DiaryDB, async=True, debug_enabled=True,
-                 encoding="utf-8", also_print=True):
+                 encoding="utf-8", also_print=True, flush_policy=None,
+                 queue=None, min_level=None, rotation=None, sink=writers.LogWriter,
+                 stats=True):
         """
         Initialization takes a file path meant to make startup simple
         :param path: str of a path pointing to:
@@ -32,12 +39,24 @@ class Diary(object):
         :param file_name: a specified name for a log text file
         :param db_name: a specified name for a log database file
         :param event: Event object to construct log info
-        :param log_format: function to format logging info (see formats.py)
+        :param log_format: function or str.format template to format logging
+            info, compiled with formats.compile_format (see formats.py)
         :param db: database class for reading/writing database
         :param async: boolean if logging should occur in own thread
         :param debug_enabled: boolean if logger supports debugging
         :param encoding: str type of encoding to use for writing to log file
         :param also_print: boolean if a logged statement will also be printed to the console
+        :param flush_policy: writers.FlushPolicy deciding when buffered log
+            text is written, defaults to writing after every event or batch
+        :param queue: queue for async events such as a bounded
+            queues.DiaryQueue, defaults to an unbounded Queue
+        :param min_level: least severe level that is logged, None logs all levels
+        :param rotation: writers.RotationPolicy for starting new log files,
+            None appends to a single file
+        :param sink: writer class for the log file such as writers.LogWriter
+            or binary.BinaryWriter
+        :param stats: True to collect runtime statistics (see stats.py),
+            a stats.Stats to also save them to the database, False for none
         """
 
         self.path = path
@@ -45,20 +64,75 @@ class Diary(object):
         self.log_file = None
         self.db_file = None
         self.also_print = also_print
+        self.flush_policy = flush_policy
+        self.rotation = rotation
+        self.sink = sink
+        self.db = db
+        self._open_path(path, file_name, db_name)
+
+        self._register_close()
+        self.event = event
+        self.format = formats.compile_format(log_format)
+        self.async = async
+        self._debug_enabled = debug_enabled
+        self.set_min_level(min_level)
+
+        self.logdb = None
+        self.last_logged_event = None
+        self.statistics = Stats() if stats is True else stats or None
+        self._stamps = self.statistics is not None  # Events note when they were queued
+        # Connections are only opened when borrowed, see logdb.ReaderPool
+        self.readers = logdb.ReaderPool(self.db_file.name, db=db) if self.db_file else None
+
+        self._start_writer(self.db_file is not None, queue)
+
+    def _start_writer(self, sets_db, queue):
+        """Start the thread which writes events or set the db if not async
+
+        :param sets_db: if a database needs to be set
+        :param queue: queue for async events
+        """
+        if self.async:
+            from diary.logthread import DiaryThread
+            self.thread = DiaryThread(self, sets_db=sets_db, queue=queue)
+        elif sets_db:
+            self.set_db()
+
+    def close(self):
+        """Called on system exit to ensure logs are saved."""
+        if self.async:
+            self.thread.join()
+
+        if self.db_file:
+            self.db_file.close()
+
+            self.logdb.close()
+            self.readers.close()
+        if self.log_file:
+            self.log_file.close()
+        self.timer = None
+
+    def _register_close(self):
+        """Ensure close is called on system exit"""
+        atexit.register(self.close)
+
+    def _open_path(self, path, file_name, db_name):
+        """Resolve path to a log file, a database file or both and open them
+        (see __init__ for how path is resolved)"""
         if os.path.exists(path):
             if os.path.isdir(path):
-                self.log_file = codecs.open(os.path.join(path, file_name), mode='a+', buffering=1, encoding=self.encoding)
-                self.db_file = open(os.path.join(path, db_name), 'a')
+                self.log_file = self._open_log(os.path.join(path, file_name))
+                self.db_file = self._open_db(os.path.join(path, db_name))
             elif os.path.isfile(path):
                 head, tail = os.path.split(path)
                 _, ext = os.path.splitext(tail)
                 if ext == '':
-                    self.log_file = codecs.open(path, mode='a+', buffering=1, encoding=self.encoding)
+                    self.log_file = self._open_log(path)
                 elif tail == db_name or ext[1:] in ('db', 'sql', 'sqlite',
                                                     'sqlite3'):
-                    self.db_file = open(path, 'a')
-                elif tail == file_name or ext[1:] in ('txt', 'text', 'log'):
-                    self.log_file = codecs.open(path, mode='a+', buffering=1, encoding=self.encoding)
+                    self.db_file = self._open_db(path)
+                elif tail == file_name or ext[1:] in ('txt', 'text', 'log', 'bin'):
+                    self.log_file = self._open_log(path)
                 else:
                     raise ValueError("Could not resolve to database or text file: {}".format(
                         path))
@@ -70,44 +144,26 @@ class Diary(object):
                 _, ext = os.path.splitext(path)
                 if len(ext) > 1:
                     if ext[1:] in ('db', 'sql', 'sqlite', 'sqlite3'):
-                        self.db_file = open(path, 'a')
+                        self.db_file = self._open_db(path)
                     else:
-                        self.log_file = codecs.open(path, mode='a+', buffering=1, encoding=self.encoding)
+                        self.log_file = self._open_log(path)
                 else:
-                    self.log_file = codecs.open(path, mode='a+', buffering=1, encoding=self.encoding)
+                    self.log_file = self._open_log(path)
             except Exception as e:
                 raise e
 
-        @atexit.register
-        def cleanup():
-            """Called on system exit to ensure logs are saved."""
-            if self.async:
-                self.thread.join()
-
-            if self.db_file:
-                self.db_file.close()
-
-                self.logdb.close()
-            if self.log_file:
-                self.log_file.close()
-            self.timer = None
-
-        self.close = cleanup
-        self.event = event
-        self.format = log_format
-        self.db = db
-        self.async = async
-        self.debug_enabled = debug_enabled
-
-        self.logdb = None
-        self.last_logged_event = None
+    def _open_db(self, path):
+        """Make the database file at path unless the db names its own files after it"""
+        db = self.db.func if isinstance(self.db, functools.partial) else self.db
+        if getattr(db, 'opens_path', True):
+            return open(path, 'a')
+        return _DatabasePath(path)
 
-        sets_db = self.db_file is not None
-        if async:
-            from diary.logthread import DiaryThread
-            self.thread = DiaryThread(self, sets_db=sets_db)
-        elif sets_db:
-            self.set_db()
+    def _open_log(self, path):
+        """Open the log at path with the sink for buffered appending"""
+        return self.sink(path, encoding=self.encoding,
+                         flush_policy=self.flush_policy,
+                         rotation=self.rotation)
 
     def set_db(self):
         """
@@ -133,87 +189,278 @@ class Diary(object):
         self.timer = RepeatedTimer(interval, func, args=args, kwargs=kwargs)
         self.timer.start()
 
+    def stats(self):
+        """
+        :return: dict snapshot of the runtime statistics (see stats.Stats.snapshot),
+            None if they are not collected
+        """
+        if self.statistics is None:
+            return None
+        return self.statistics.snapshot(self._waiting(), self.log_file)
+
+    def _waiting(self):
+        """:return: queue events wait in before being written, None if not async"""
+        return self.thread.queue if self.async else None
+
+    def _idle_timeout(self):
+        """:return: seconds the writer may wait for an event before a log file
+            flush, database maintenance or a stats snapshot is due, None to
+            wait forever"""
+        timeouts = []
+        if self.log_file:
+            timeouts.append(self.log_file.timeout())
+        if self.logdb:
+            timeouts.append(self.logdb.maintenance_timeout())
+            if self.statistics is not None:
+                timeouts.append(self.statistics.timeout())
+        timeouts = [timeout for timeout in timeouts if timeout is not None]
+        return min(timeouts) if timeouts else None
+
+    def _idle(self):
+        """Do the work due while no events arrive: flush the log file on its
+        interval, maintain the database and save stats. Errors are reported
+        through handle_error so the writer keeps running.
+        """
+        if self.log_file:
+            try:
+                self.log_file.poll()
+            except Exception:  # Such as a full disk, keep logging
+                self.handle_error()
+        if self.logdb:
+            self._maintain()
+            try:
+                self._save_stats()
+            except Exception:
+                self.handle_error()
+
+    def _maintain(self):
+        """Enforce the database's retention policy, reporting errors such as
+        a locked database through handle_error, maintenance is retried later"""
+        try:
+            self.logdb.maintain()
+        except Exception:
+            self.handle_error()
+
+    def _save_stats(self):
+        """Save a snapshot of the runtime statistics to the database if one is due"""
+        if self.logdb is not None and self.statistics is not None and self.statistics.save_due():
+            self.logdb.log_stats(self.stats())
+
+    def _render(self, event):
+        """Render an event's deferred info, falling back to the template and
+        repr(args) when it cannot be rendered so the event is still written
+
+        :param event: event object to render
+        """
+        try:
+            event.render()
+        except Exception:
+            self.handle_error(event)
+            info = event.info if isinstance(event.info, (str, type(u''))) else repr(event.info)
+            event.info = info + ' ' + repr(event.args) if event.args else info
+            event.args = ()
+
+    def handle_error(self, event=None):
+        """Report the exception being handled while writing, then carry on.
+        Like logging.Handler.handleError the traceback is printed to stderr;
+        override to report errors elsewhere.
+
+        :param event: event being written when the error was raised, None
+            if it was raised writing a batch
+        """
+        if sys.stderr is None:
+            return
+        try:
+            sys.stderr.write("--- Diary error ---\n")
+            traceback.print_exc(file=sys.stderr)
+            if event is not None:
+                sys.stderr.write("Message: {!r}\nArguments: {!r}\n".format(
+                    event.info, getattr(event, 'args', ())))
+        except (IOError, OSError):  # stderr is gone, nothing left to report to
+            pass
+
     def _write(self, event):
         """Write an event object to the proper channel
 
         :param event: event object to log
         """
-        if self.db_file:
-            self.logdb.log(event)
+        self._write_many((event,))
+
+    def _write_many(self, events):
+        """Write a group of event objects to the proper channels, committing
+        them to the database in a single transaction
+
+        :param events: sequence of event objects to log
+        """
+        written = time()
+        started = default_timer()
+        timings = {}
+        for event in events:
+            self._render(event)
+
+            if _PY2 and isinstance(event.info, unicode):  # short-circuiting at its best
+                event.info = event.info.encode(self.encoding)
+
+        if self.db_file:  # Before formatting, so a format error cannot lose the rows
+            self.logdb.log_many(events)
+            finished = default_timer()
+            timings['db'] = finished - started
+            started = finished
 
         if self.log_file:
-            if event.formatter is None:
-                to_write = self.format(event) + '\n'
-            else:
-                to_write = event.formatted() + '\n'
+            texts = []
+            if self.log_file.text or self.also_print:
+                for event in events:
+                    if event.formatter is None:
+                        to_write = self.format(event) + '\n'
+                    else:
+                        to_write = event.formatted() + '\n'
 
-            if _PY2:
-                to_write = to_write.decode(self.encoding)
+                    if _PY2:
+                        to_write = to_write.decode(self.encoding)
 
-            self.log_file.write(to_write)
+                    texts.append(to_write)
+            finished = default_timer()
+            timings['format'] = finished - started
 
             if self.also_print:
-                print(to_write)
+                for to_write in texts:
+                    print(to_write)
+                finished = default_timer()
+            self.log_file.write_many(texts, events)
+            timings['file'] = default_timer() - finished
+
+        self.last_logged_event = events[-1]
+        if self.db_file:
+            self._maintain()
+        if self.statistics is not None:
+            self.statistics.record(events, written, timings)
+            self._save_stats()
+
+    @property
+    def debug_enabled(self):
+        """boolean if logger supports debugging"""
+        return self._debug_enabled
+
+    @debug_enabled.setter
+    def debug_enabled(self, enabled):
+        self._debug_enabled = enabled
+        self.set_min_level(self.min_level)
+
+    def set_min_level(self, level):
+        """Only log events at least as severe as level (see levels.severity).
+        Level methods below the minimum are replaced with a method that does
+        nothing, so a disabled call costs no more than an attribute lookup.
+
+        :param level: least severe level to log, None to log every level
+        """
+        self.min_level = level
+        self._min_severity = None if level is None else levels.severity(level)
+        for name, level_method in (('debug', levels.debug), ('info', levels.info),
+                                   ('warn', levels.warn), ('error', levels.error)):
+            if not self.enabled_for(level_method):
+                setattr(self, name, self._ignore)
+            else:
+                self.__dict__.pop(name, None)
+
+    def enabled_for(self, level):
+        """
+        :param level: @log_level func or other level classifier
+        :return: True if events at level will be logged
+        """
+        if level is levels.debug and not self._debug_enabled:
+            return False
+        return self._min_severity is None or levels.severity(level) >= self._min_severity
 
-        self.last_logged_event = event
+    def _ignore(self, info, *args, **kwargs):
+        """Stands in for a disabled level method"""
 
-    def log(self, info, level=levels.info, **kwargs):
+    def log(self, info, level=levels.info, *args, **kwargs):
         """Log info to its relevant level (see levels.py)
+        info may be a callable which is called when the event is written.
 
         :param info: info for logging
         :param level: @level decorated function handle relevant behavior
+        :param args: values interpolated into info when the event is written
+        :raises TypeError: if level is not a level function, such as a value
+            for info passed without a level before it
         """
-        if isinstance(info, events.Event):
+        if not callable(level):
+            raise TypeError("level must be a @log_level function, got {!r}; pass args "
+                            "after the level".format(level))
+        if self._min_severity is not None and levels.severity(level) < self._min_severity:
+            return
+        self._log(info, level, args, **kwargs)
+
+    def _log(self, info, level, args=(), **kwargs):
+        """Build and report an event without checking the minimum level"""
+        if isinstance(info, events.BaseEvent):
             event_to_log = info
         else:
             event_to_log = self.event(info, level)
 
-        if _PY2 and isinstance(event_to_log.info, unicode):  # short-circuiting at its best
-            event_to_log.info = event_to_log.info.encode(self.encoding)
+        if args:
+            event_to_log.args = args
+        if self._stamps:
+            event_to_log._queued = time()  # Latency is measured from here, not from dt
 
         if self.async:
             level(event_to_log, self.thread.add, **kwargs)
         else:
             level(event_to_log, self._write, **kwargs)
 
-    def info(self, info, **kwargs):
+    def info(self, info, *args, **kwargs):
         """Log general info
 
         :param info: info relevant to application processes
+        :param args: values interpolated into info when the event is written
         """
-        if isinstance(info, events.Event):
+        if isinstance(info, events.BaseEvent):
             info.set_level(levels.info)
 
-        self.log(info, level=levels.info, **kwargs)
+        self._log(info, levels.info, args, **kwargs)
 
-    def warn(self, info, **kwargs):
+    def warn(self, info, *args, **kwargs):
         """Log info that requires a warning
 
         :param info: info relevant to a warning
+        :param args: values interpolated into info when the event is written
         """
-        if isinstance(info, events.Event):
+        if isinstance(info, events.BaseEvent):
             info.set_level(levels.warn)
 
-        self.log(info, level=levels.warn, **kwargs)
+        self._log(info, levels.warn, args, **kwargs)
 
-    def error(self, info, **kwargs):
+    def error(self, info, *args, **kwargs):
         """Log info that may cause an error
 
         :param info: info relevant to an error
+        :param args: values interpolated into info when the event is written
         """
-        if isinstance(info, events.Event):
+        if isinstance(info, events.BaseEvent):
             info.set_level(levels.error)
 
-        self.log(info, level=levels.error, **kwargs)
+        self._log(info, levels.error, args, **kwargs)
 
-    def debug(self, info, **kwargs):
+    def debug(self, info, *args, **kwargs):
         """Log info that may only be helpful to the developer
         Will only log if debugging is enabled
 
         :param info: info for the devs
+        :param args: values interpolated into info when the event is written
         """
-        if isinstance(info, events.Event):
+        if isinstance(info, events.BaseEvent):
             info.set_level(levels.debug)
 
-        if self.debug_enabled:
-            self.log(info, level=levels.debug, **kwargs)
+        self._log(info, levels.debug, args, **kwargs)
+
+
+class _DatabasePath(object):
+    """Stands in for the database file of a db which makes its own files"""
+
+    def __init__(self, name):
+        self.name = name
+        self.closed = False
+
+    def close(self):
+        self.closed = True
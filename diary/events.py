@@ -1,11 +1,71 @@
 from __future__ import absolute_import
 
-from diary.formats import stringify_level
+from diary.formats import stringify_level, compile_template
 from datetime import datetime
+from time import time
 from types import FunctionType
 
 
-class Event(object):
+class BaseEvent(object):
+    """Rendering and formatting shared by Event and CompactEvent. It holds no
+    attributes, so slotted subclasses allocate no instance dict.
+    """
+    __slots__ = ()
+    formatter = None
+
+    def render(self):
+        """
+        Evaluate deferred info, interpolating args into the info template
+        or calling info if it is callable
+        :return: None
+        """
+        if self.args:
+            self.info = self.info % self.args
+            self.args = ()
+        elif callable(self.info):
+            self.info = self.info()
+
+    def _formatted_setup(self):
+        """
+        Set class formatter
+        :return: event formatted in a string
+        """
+        if self.formatter:
+            self.set_formatter(self.formatter)  # Set class formatter discarding this method
+            return self.formatted()
+        else:
+            raise AttributeError("{} does not have a valid formatter: {}".format(self, self.formatter))
+
+    def formatted(self):
+        """
+        :return: event formatted in a string
+        """
+        return self._formatted_setup()
+
+    @classmethod
+    def set_formatter(cls, formatter):
+        """Set the class formatter
+
+        :param formatter: valid string or func to format events
+        :return: None
+        """
+        cls.formatted = cls._formatted_setup
+        cls.formatter = formatter
+        if formatter:
+            if isinstance(formatter, str):
+                cls.formatted = compile_template(formatter)
+            elif type(formatter) is FunctionType:
+                cls.formatted = cls.formatter
+            else:
+                raise ValueError('Could not identify formatter {}'.format(formatter))
+
+    def __str__(self):
+        if self.formatter:
+            return self.formatted()
+        return repr(self)
+
+
+class Event(BaseEvent):
     """Events to log
     Give a class level variable called formatter to set an Event subclass format:
         class CustomEvent(Event):
@@ -19,8 +79,11 @@ class Event(object):
 
         class CustomEvent(Event):
             formatter = format_my_event
+
+    info may be a %-style template with its values deferred in args, or a
+    callable returning info. Either is only evaluated when render is called.
     """
-    formatter = None
+    args = ()
 
     def __init__(self, info, level=None, dt=None):
         """All events should have info, level, and dt. Devs should inherit this
@@ -39,39 +102,65 @@ class Event(object):
         self.level = level
         self.level_str = stringify_level(self.level)
 
-    def _formatted_setup(self):
+    def set_level(self, level):
         """
-        Set class formatter
-        :return: event formatted in a string
+        Set the event level
+        :param level: @log_level func or other level classifier
+        :return: None
         """
-        if self.formatter:
-            self.set_formatter(self.formatter)  # Set class formatter discarding this method
-            return self.formatted()
-        else:
-            raise AttributeError("{} does not have a valid formatter: {}".format(self, self.formatter))
+        self.level = level
+        self.level_str = stringify_level(self.level)
 
-    def formatted(self):
+    def fields(self):
         """
-        :return: event formatted in a string
+        :return: dict of attributes available to string formatters
         """
-        return self._formatted_setup()
+        return self.__dict__
 
-    @classmethod
-    def set_formatter(cls, formatter):
-        """Set the class formatter
 
-        :param formatter: valid string or func to format events
-        :return: None
+class CompactEvent(BaseEvent):
+    """An event which stores its attributes in __slots__, so no instance
+    dict is allocated, and which renders dt and level_str only when they
+    are read. Subclasses should declare __slots__ for added attributes to
+    stay compact:
+        class UserEvent(CompactEvent):
+            __slots__ = ('user_name',)
+            formatter = "{info}|{user_name}"
+    """
+    __slots__ = ('info', 'level', 'args', 'timestamp', '_dt', '_level_str', '_queued')
+
+    def __init__(self, info, level=None, dt=None):
         """
-        cls.formatted = cls._formatted_setup
-        cls.formatter = formatter
-        if formatter:
-            if isinstance(formatter, str):
-                cls.formatted = lambda self: formatter.format(**self.__dict__)
-            elif type(formatter) is FunctionType:
-                cls.formatted = cls.formatter
-            else:
-                raise ValueError('Could not identify formatter {}'.format(formatter))
+        :param info: information relevant to the log
+        :param level: a level of classification to the log
+        :param dt: time of logging, when None the epoch time is stored and
+            dt is made from it when read
+        """
+        self.info = info
+        self.level = level
+        self.args = ()
+        self.timestamp = time() if dt is None else None
+        self._dt = dt
+        self._level_str = None
+
+    @property
+    def dt(self):
+        """datetime of the event, made from timestamp the first time it is read"""
+        if self._dt is None:
+            self._dt = datetime.fromtimestamp(self.timestamp)
+        return self._dt
+
+    @dt.setter
+    def dt(self, dt):
+        self._dt = dt
+        self.timestamp = None
+
+    @property
+    def level_str(self):
+        """level as a string, made the first time it is read"""
+        if self._level_str is None:
+            self._level_str = stringify_level(self.level)
+        return self._level_str
 
     def set_level(self, level):
         """
@@ -80,9 +169,18 @@ class Event(object):
         :return: None
         """
         self.level = level
-        self.level_str = stringify_level(self.level)
+        self._level_str = None
 
-    def __str__(self):
-        if self.formatter:
-            return self.formatted()
-        return repr(self)
+    def fields(self):
+        """
+        :return: dict of attributes available to string formatters
+        """
+        fields = {'info': self.info, 'level': self.level, 'args': self.args,
+                  'dt': self.dt, 'level_str': self.level_str}
+        for cls in type(self).__mro__:
+            for name in getattr(cls, '__slots__', ()):
+                if not name.startswith('_') and name not in fields and hasattr(self, name):
+                    fields[name] = getattr(self, name)
+        if getattr(self, '__dict__', None):
+            fields.update(self.__dict__)
+        return fields
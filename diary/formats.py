@@ -5,10 +5,19 @@ For help creating your own:
 Format functions take an event instance parameter
     def example(event):
         return "Level: {} {} {}".format(event.level, event.dt, event.info)
+compile_format turns a format into the fastest equivalent callable and is
+applied to Diary's log_format and Event formatter templates.
+render_time renders datetimes with a per second cache for custom formats.
 """
 
+from datetime import datetime, timedelta
+from operator import attrgetter
+from string import Formatter
 from types import FunctionType
 
+_level_names = {}  # Level function to its name
+_timestamp_caches = {}
+
 
 def stringify_level(level):
     """Turn level functions into a clean string
@@ -21,6 +30,72 @@ def stringify_level(level):
     else:
         return str(level)
 
+def level_name(level):
+    """stringify_level which remembers the names of level functions such as
+    the built-in levels. Other levels are stringified every time, so levels
+    made per event are not held on to and str(level) may change.
+
+    :param level: any object to be stringified
+    :return: level as a string
+    """
+    if type(level) is not FunctionType:
+        return str(level)
+    try:
+        return _level_names[level]
+    except KeyError:
+        name = _level_names[level] = level.__name__.upper()
+        return name
+
+class TimestampCache(object):
+    """Renders datetimes, reusing the text rendered for the last second.
+    Events logged in a burst almost always share a second, so most renders
+    only need the microseconds appended, if at all.
+    """
+
+    def __init__(self, pattern=None):
+        """
+        :param pattern: strftime pattern, None renders like str(datetime)
+        """
+        self.pattern = pattern
+        self.cacheable = pattern is None or not any(
+            directive in pattern for directive in ('%f', '%z', '%Z'))
+        self._last = (None, None)
+
+    def __call__(self, dt):
+        """
+        :param dt: datetime to render, other objects are formatted with
+            the pattern as their format spec like str.format would
+        :return: dt as a string
+        """
+        if not self.cacheable or type(dt) is not datetime or dt.tzinfo is not None:
+            return format(dt, self.pattern or '')
+
+        microsecond = dt.microsecond
+        second = dt - timedelta(0, 0, microsecond)
+        last_second, text = self._last
+        if second != last_second:
+            text = str(second) if self.pattern is None else second.strftime(self.pattern)
+            self._last = (second, text)
+
+        if self.pattern is None and microsecond:
+            return '%s.%06d' % (text, microsecond)
+        return text
+
+
+def render_time(dt, pattern=None):
+    """Render a datetime through a shared TimestampCache for pattern.
+    Custom formats can use this in place of str(dt) or dt.strftime(pattern).
+
+    :param dt: datetime to render
+    :param pattern: strftime pattern, None renders like str(datetime)
+    :return: dt as a string
+    """
+    try:
+        cache = _timestamp_caches[pattern]
+    except KeyError:
+        cache = _timestamp_caches.setdefault(pattern, TimestampCache(pattern))
+    return cache(dt)
+
 def stringify_info(info):
     """Turn info into a readadble string
 
@@ -73,3 +148,112 @@ def easy_read(event):
         name=stringify_level(event.level),
         text=stringify_info(event.info)
     )
+
+
+_standard_time = TimestampCache()
+_minimal_time = TimestampCache("%x %X")
+_easy_read_time = TimestampCache("%x @ %I:%M.%S%p")
+
+
+def _compiled_standard(event):
+    return "[" + level_name(event.level) + "]:[" + _standard_time(event.dt) + "]: " + \
+        str(event.info).strip()
+
+
+def _compiled_minimal(event):
+    return level_name(event.level) + ": " + _minimal_time(event.dt) + ": " + str(event.info).strip()
+
+
+def _compiled_alarms(event):
+    name = level_name(event.level)
+    separators = "!!!" if name == 'ERROR' else " - "
+    return separators + name + separators + _standard_time(event.dt) + separators + \
+        str(event.info).strip() + separators
+
+
+def _compiled_easy_read(event):
+    return "|" + level_name(event.level) + "| On " + _easy_read_time(event.dt) + \
+        " | " + str(event.info).strip()
+
+
+_compiled = {
+    standard: _compiled_standard,
+    minimal: _compiled_minimal,
+    alarms: _compiled_alarms,
+    easy_read: _compiled_easy_read,
+}
+
+
+def compile_format(log_format):
+    """Turn a format into a specialized callable once so formatting each
+    event does as little work as possible. Built-in formats are swapped for
+    versions with cached level names and no keyword lookups, str.format
+    templates become a fixed set of attribute getters and other callables
+    are returned unchanged.
+
+    :param log_format: format function or str.format template of event attributes
+    :return: function taking an event and returning a string
+    """
+    if isinstance(log_format, str):
+        return compile_template(log_format)
+    return _compiled.get(log_format, log_format)
+
+
+def compile_template(template):
+    """Compile a template of event attributes such as "{info}|{level_str}"
+    into a function which reads each attribute directly instead of
+    unpacking the event's fields. {dt} and {dt:<strftime pattern>} fields
+    are rendered through render_time.
+
+    :param template: str.format template with named fields
+    :return: function taking an event and returning a string
+    """
+    keys = []
+    getters = []
+    compiled = []
+    for literal, field, spec, conversion in Formatter().parse(template):
+        compiled.append(literal.replace('{', '{{').replace('}', '}}'))
+        if field is None:
+            continue
+        name, rest = _split_field(field)
+        if not name or name.isdigit() or (spec and '{' in spec):
+            return lambda event: template.format(**event.fields())  # Not compilable
+
+        if name == 'dt' and not rest and not conversion:
+            key, getter = (name, spec), _dt_getter(spec or None)
+            spec = None
+        else:
+            key, getter = name, None
+        if key not in keys:
+            keys.append(key)
+            getters.append(getter)
+        compiled.append('{' + str(keys.index(key)) + rest +
+                        ('!' + conversion if conversion else '') +
+                        (':' + spec if spec else '') + '}')
+
+    positional = ''.join(compiled).format
+    if not keys:
+        text = template.format()
+        return lambda event: text
+    elif any(getters):
+        getters = [getter or attrgetter(key) for key, getter in zip(keys, getters)]
+        return lambda event: positional(*[getter(event) for getter in getters])
+    elif len(keys) == 1:
+        getter = attrgetter(keys[0])
+        return lambda event: positional(getter(event))
+    getter = attrgetter(*keys)
+    return lambda event: positional(*getter(event))
+
+
+def _dt_getter(pattern):
+    """:return: function rendering an event's dt through a TimestampCache"""
+    cache = TimestampCache(pattern)
+    return lambda event: cache(event.dt)
+
+
+def _split_field(field):
+    """Split a field such as "dt.year" into its name and the rest: ("dt", ".year")"""
+    for index, char in enumerate(field):
+        if char in '.[':
+            return field[:index], field[index:]
+    return field, ''
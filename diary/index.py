@@ -0,0 +1,152 @@
+"""
+A sparse index of a text log maps the time of an entry to its byte offset
+every `every` bytes, so a reader can seek near a time instead of scanning
+the whole log. LogWriter keeps the index up to date as it writes:
+    logger = Diary("log.txt", sink=functools.partial(LogWriter, index_every=64 * 1024))
+
+    reader = LogReader("log.txt")
+    for event in reader.window(since=datetime(2016, 7, 4, 14, 3), until=...):
+        ...
+
+The index is a sidecar file next to the log, <log>.idx, of RECORD entries:
+    int64   microseconds from 0001-01-01 to the entry's dt, ignoring time zones
+    uint64  byte offset of the first line of the entry
+All integers are little-endian. Logs written without an index, or whose
+index was lost, can be indexed with rebuild.
+"""
+
+from __future__ import absolute_import
+import bisect
+import io
+import os
+import struct
+
+from diary import events
+from diary import formats
+
+RECORD = struct.Struct('<qQ')
+SUFFIX = '.idx'
+EVERY = 64 * 1024
+
+
+def index_path(path):
+    """:return: str path of the index of the log at path"""
+    return path + SUFFIX
+
+
+def key(dt):
+    """:return: int microseconds from 0001-01-01 to dt, ordered like dt"""
+    return ((dt.toordinal() * 86400 + dt.hour * 3600 + dt.minute * 60 + dt.second) * 1000000 +
+            dt.microsecond)
+
+
+class IndexWriter(object):
+    """Appends an index record once every bytes have been written since the last"""
+
+    def __init__(self, path, every=EVERY):
+        """
+        :param path: str path of the log being indexed
+        :param every: bytes of log between records
+        """
+        self.path = index_path(path)
+        self.every = every
+        self.records = 0
+        self.last = None  # Offset of the last record
+        self.file = io.open(self.path, 'ab')
+        size = self.file.tell()
+        if size >= RECORD.size:
+            with io.open(self.path, 'rb') as f:
+                f.seek(size - size % RECORD.size - RECORD.size)
+                self.last = RECORD.unpack(f.read(RECORD.size))[1]
+
+    def add(self, dt, offset):
+        """Record that an entry logged at dt begins at offset if a record is due
+
+        :param dt: datetime of the entry
+        :param offset: byte offset of the entry in the log
+        """
+        if self.last is not None and offset - self.last < self.every:
+            return
+        self.file.write(RECORD.pack(key(dt), offset))
+        self.file.flush()
+        self.last = offset
+        self.records += 1
+
+    def close(self):
+        self.file.close()
+
+
+class Index(object):
+    """The records of a log's index, loaded for bisecting"""
+
+    def __init__(self, path):
+        """
+        :param path: str path of the indexed log
+        :raises IOError: if the log has no index
+        """
+        with io.open(index_path(path), 'rb') as f:
+            data = f.read()
+        data = data[:len(data) - len(data) % RECORD.size]  # Drop a partly written record
+        self.keys = []
+        self.offsets = []
+        for start in range(0, len(data), RECORD.size):
+            dt_key, offset = RECORD.unpack_from(data, start)
+            self.keys.append(dt_key)
+            self.offsets.append(offset)
+
+    def offset(self, since):
+        """
+        :param since: datetime to read from
+        :return: byte offset of an entry at or before the first entry logged
+            at or after since, 0 if since precedes the index
+        """
+        position = bisect.bisect_left(self.keys, key(since)) - 1
+        return self.offsets[position] if position >= 0 else 0
+
+    def __len__(self):
+        return len(self.keys)
+
+
+def offset(path, since):
+    """
+    :param path: str path of a log
+    :param since: datetime to read from, None for the start of the log
+    :return: byte offset to start reading at, 0 if the log has no index
+    """
+    if since is None:
+        return 0
+    try:
+        return Index(path).offset(since)
+    except (IOError, OSError):
+        return 0
+
+
+def rebuild(path, log_format=formats.standard, event=events.Event, every=EVERY,
+            encoding="utf-8"):
+    """Index a log from its contents, replacing any index it has.
+    The log should not be open in a LogWriter indexing it.
+
+    :param path: str path of a text log
+    :param log_format: built-in format or str.format template the log was written with
+    :param event: Event class logged
+    :param every: bytes of log between records
+    :param encoding: str encoding of the log
+    :return: number of records written
+    """
+    from diary.reader import LogReader
+    reader = LogReader(path, log_format, event, encoding)
+    temporary = index_path(path + '.tmp')
+    if os.path.exists(temporary):
+        os.remove(temporary)
+    writer = IndexWriter(path + '.tmp', every)
+    try:
+        for start, text in reader.entries():
+            if writer.last is not None and start - writer.last < every:
+                continue
+            logged = reader.parse(text)
+            if logged is not None:
+                writer.add(logged.dt, start)
+    finally:
+        writer.close()
+    os.rename(temporary, index_path(path))
+    return writer.records
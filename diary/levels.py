@@ -6,9 +6,16 @@ def example_level(event):
     # do some behavior
 """
 
+from __future__ import absolute_import
 from functools import wraps
 import traceback
 
+from diary.formats import stringify_level
+
+SEVERITIES = {'DEBUG': 10, 'INFO': 20, 'WARN': 30, 'WARNING': 30,
+              'ERROR': 40, 'CRITICAL': 50}
+
+
 def log_level(logged):
     """
     Decorator to automatically log an event based on level.
@@ -28,6 +35,36 @@ def log_level(logged):
     return level_wrapper
 
 
+def _render(event):
+    """Evaluate deferred event info before a level reads or changes it"""
+    render = getattr(event, 'render', None)
+    if render is not None:
+        render()
+
+
+def severity(level):
+    """Rank a level so levels can be compared with one another.
+    A level may set its own rank with a severity attribute, otherwise it is
+    ranked by its name and unknown levels rank alongside info.
+
+    :param level: @log_level func or other level classifier
+    :return: integer rank, higher is more severe
+    """
+    try:
+        return level.severity
+    except AttributeError:
+        return SEVERITIES.get(stringify_level(level), SEVERITIES['INFO'])
+
+
+def from_name(name):
+    """Find the level a level string was made from
+
+    :param name: str such as an event's level_str
+    :return: the built-in level named name, or name if there is none
+    """
+    return _BY_NAME.get(name, name)
+
+
 @log_level
 def info(event):
     """The most generic level of logging. No special behavior needed.
@@ -45,6 +82,7 @@ def warn(event, log_trace=False):
     :param log_trace: boolean of whether or not to log current trace
     """
     if log_trace:
+        _render(event)
         event.info += ''.join(traceback.format_stack()[:-1])
 
 
@@ -58,6 +96,7 @@ def error(event, raises=False, e_type=Exception, log_trace=True, limit=None):
     :param log_trace: boolean of whether or not log traceback
     :param limit: integer of traceback limit
     """
+    _render(event)
     if raises:
         if hasattr(event, "info"):
             logged_exception = e_type(event.info)
@@ -87,3 +126,11 @@ def debug(event):
     :param event: event instance
     """
     pass
+
+
+debug.severity = SEVERITIES['DEBUG']
+info.severity = SEVERITIES['INFO']
+warn.severity = SEVERITIES['WARN']
+error.severity = SEVERITIES['ERROR']
+
+_BY_NAME = {'DEBUG': debug, 'INFO': info, 'WARN': warn, 'ERROR': error}
@@ -1,5 +1,55 @@
+from __future__ import absolute_import
+import json
+import math
 import sqlite3
+import warnings
 import os, sys
+from contextlib import contextmanager
+from datetime import datetime, timedelta
+from threading import Lock
+from timeit import default_timer
+
+try:
+    from queue import Queue, Empty
+    from urllib.request import pathname2url
+except ImportError:  # python 2
+    from Queue import Queue, Empty
+    from urllib import pathname2url
+
+from diary.formats import stringify_level
+
+try:
+    _string_types = basestring
+except NameError:  # python 3
+    _string_types = str
+
+DURABLE = "durable"
+BALANCED = "balanced"
+FAST = "fast"
+
+MINUTE = "minute"
+HOUR = "hour"
+DAY = "day"
+
+# Rollup periods and the SQLite strftime pattern truncating times to their buckets.
+# Buckets hold wall times: the UTC offset of an aware dt is ignored, as SQLite would convert to UTC
+PERIODS = {MINUTE: '%Y-%m-%d %H:%M:00', HOUR: '%Y-%m-%d %H:00:00', DAY: '%Y-%m-%d 00:00:00'}
+_SECONDS = {MINUTE: 60, HOUR: 3600, DAY: 86400}
+
+# Applied in order; journal_mode comes first so later settings apply to the WAL
+PROFILES = {
+    # Survives power loss: every commit is synced, readers never block the writer
+    DURABLE: (('journal_mode', 'WAL'), ('synchronous', 'FULL'),
+              ('wal_autocheckpoint', 1000)),
+    # Survives a crash of the application, the last commits may be lost on power loss
+    BALANCED: (('journal_mode', 'WAL'), ('synchronous', 'NORMAL'),
+               ('cache_size', -16000), ('mmap_size', 64 * 1024 ** 2),
+               ('temp_store', 'MEMORY'), ('wal_autocheckpoint', 1000)),
+    # Never syncs and checkpoints rarely, a crash of the system may corrupt the database
+    FAST: (('journal_mode', 'WAL'), ('synchronous', 'OFF'),
+           ('cache_size', -64000), ('mmap_size', 256 * 1024 ** 2),
+           ('temp_store', 'MEMORY'), ('wal_autocheckpoint', 10000)),
+}
 
 
 class DiaryDB(object):
@@ -8,24 +58,116 @@ class DiaryDB(object):
     DiaryDB should be inherited from and create_table and log should
     be overridden in such a way to store an event in the database.
     DiaryDB.log must take a first argument that is an event with information
-    to log. DiaryDB uses SQLite3.
+    to log. Overriding insert_query and values instead of log lets
+    log_many commit a group of events at once. DiaryDB uses SQLite3.
+    Naming columns of table in search_columns keeps an FTS5 full-text index
+    of them for search, rollups keeps per-level counts of events by minute,
+    hour and day for counts and rate, and a Retention policy expires old rows.
     """
+    insert_query = '''INSERT INTO logs(inputDT, level, log)
+                      VALUES(?, ?, ?)'''
+    table = 'logs'
+    search_columns = ()
+    retention = None
+    pragmas = None
+    rollups = False
+    opens_path = True  # Diary makes the file at path, False if files are named after it
 
-    def __init__(self, path=None):
+    def __init__(self, path=None, search_columns=None, retention=None, pragmas=None,
+                 read_only=False, rollups=None):
         """
         Create the connection with the database and attempt to make a table.
         :param path: relative path of database
+        :param search_columns: columns of table to index for full-text
+            search, overriding the class's search_columns
+        :param retention: Retention policy enforced by maintain, overriding
+            the class's retention
+        :param pragmas: DURABLE, BALANCED, FAST or a sequence of (name, value)
+            pragmas set on the connection, overriding the class's pragmas.
+            None keeps SQLite's defaults.
+        :param read_only: open an existing database for queries only. Nothing
+            is created or configured and the connection may be used from any
+            thread, so readers can run beside the writer (see ReaderPool).
+        :param rollups: True to count events per level in minute, hour and
+            day buckets as they are logged, overriding the class's rollups
         """
-        if path is None:
-            if sys.argv[0]:
-                self.path = os.path.join(os.path.dirname(os.path.realpath(sys.argv[0])), 'log.sqlite3')
-            else:
-                self.path = 'log.sqlite3'
-        else:
-            self.path = path
+        if search_columns is not None:
+            self.search_columns = tuple(search_columns)
+        if retention is not None:
+            self.retention = retention
+        if pragmas is not None:
+            self.pragmas = pragmas
+        if rollups is not None:
+            self.rollups = rollups
+        self.path = self.default_path() if path is None else path
+        self.read_only = read_only
+        self._maintenance_due = default_timer()
+        if read_only:
+            self.retention = None
+            self.conn = self._connect_read_only()
+            self.cursor = self.conn.cursor()
+            return
         self.conn = sqlite3.connect(self.path, detect_types=sqlite3.PARSE_DECLTYPES)
         self.cursor = self.conn.cursor()
+        if self.retention is not None:
+            # Only takes effect before the first table is made, see Retention
+            self.cursor.execute('PRAGMA auto_vacuum = INCREMENTAL')
+        if self.pragmas is not None:
+            self.configure(self.pragmas)
         self.create_tables()
+        if self.search_columns:
+            self.create_search()
+        if self.rollups:
+            if type(self).log != DiaryDB.log:
+                warnings.warn("{} overrides log, its events are only counted in the rollups if it calls "
+                              "DiaryDB.log; override insert_query and values instead or call "
+                              "backfill_rollups".format(type(self).__name__))
+            self.create_rollups()
+
+    @staticmethod
+    def default_path():
+        """:return: log.sqlite3 in the directory of the running script"""
+        if sys.argv[0]:
+            return os.path.join(os.path.dirname(os.path.realpath(sys.argv[0])), 'log.sqlite3')
+        return 'log.sqlite3'
+
+    def _connect_read_only(self):
+        """:return: connection which cannot write to the database at path"""
+        uri = 'file:{}?mode=ro'.format(pathname2url(os.path.abspath(self.path)))
+        try:
+            return sqlite3.connect(uri, uri=True, detect_types=sqlite3.PARSE_DECLTYPES,
+                                   check_same_thread=False)
+        except TypeError:  # python 2 cannot open uris
+            conn = sqlite3.connect(self.path, detect_types=sqlite3.PARSE_DECLTYPES,
+                                   check_same_thread=False)
+            conn.execute('PRAGMA query_only = ON')
+            return conn
+
+    def configure(self, pragmas):
+        """Set pragmas on the connection
+
+        :param pragmas: DURABLE, BALANCED, FAST or a sequence of (name, value)
+        :return: dict of each pragma's name to the value SQLite reports after setting it
+        """
+        if isinstance(pragmas, _string_types):
+            if pragmas not in PROFILES:
+                raise ValueError("Could not identify pragma profile {}".format(pragmas))
+            pragmas = PROFILES[pragmas]
+        elif isinstance(pragmas, dict):
+            pragmas = pragmas.items()
+        applied = {}
+        for name, value in pragmas:
+            if not _is_identifier(name) or not (isinstance(value, int) or _is_identifier(value)):
+                raise ValueError("Invalid pragma {} = {}".format(name, value))
+            # Pragmas cannot be bound as parameters, both parts were checked above
+            self.cursor.execute('PRAGMA {} = {}'.format(name, value)).fetchall()
+            applied[name] = self.cursor.execute('PRAGMA {}'.format(name)).fetchone()[0]
+        return applied
+
+    def uses_wal(self):
+        """:return: True if the database uses journal_mode=WAL, which any
+            pragma profile sets, so readers never block the writer"""
+        return self.cursor.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
 
     def create_tables(self):
         """
@@ -35,6 +177,104 @@ class DiaryDB(object):
                 CREATE TABLE IF NOT EXISTS logs
                 (inputDT TIMESTAMP, level TEXT, log TEXT)
                             ''')
+        self.create_indexes()
+
+    def create_indexes(self):
+        """
+        Index logs by time, and by level then time, for query. Existing
+        databases are indexed when opened.
+        """
+        self.cursor.execute('''
+                CREATE INDEX IF NOT EXISTS logs_inputDT ON logs(inputDT)
+                            ''')
+        self.cursor.execute('''
+                CREATE INDEX IF NOT EXISTS logs_level_inputDT ON logs(level, inputDT)
+                            ''')
+
+    def create_search(self):
+        """
+        Create an FTS5 index of table's search_columns which triggers keep in
+        step with table, so rows are indexed in the transaction inserting them.
+        Rows logged before the index existed are indexed when it is made, and
+        an index of other columns is dropped and made again.
+        """
+        fts = self.table + '_fts'
+        names = {'fts': fts, 'table': self.table,
+                 'columns': ', '.join(self.search_columns),
+                 'new': ', '.join('new.' + column for column in self.search_columns),
+                 'old': ', '.join('old.' + column for column in self.search_columns)}
+        exists = self.cursor.execute('''SELECT 1 FROM sqlite_master
+                                         WHERE type='table' AND name=?''', (fts,)).fetchone()
+        if exists:
+            indexed = tuple(row[1] for row in self.cursor.execute(
+                'PRAGMA table_info({})'.format(fts)))
+            if indexed == tuple(self.search_columns):
+                return
+
+        with self.conn:
+            if exists:
+                self.drop_search()
+            try:
+                self.cursor.execute('''
+                    CREATE VIRTUAL TABLE {fts} USING fts5({columns},
+                    content='{table}', content_rowid='rowid')'''.format(**names))
+            except sqlite3.OperationalError as e:
+                if 'fts5' in str(e):
+                    raise ValueError("Full-text search requires SQLite built with FTS5")
+                raise
+            self.cursor.execute('''
+                CREATE TRIGGER {fts}_insert AFTER INSERT ON {table} BEGIN
+                    INSERT INTO {fts}(rowid, {columns}) VALUES (new.rowid, {new});
+                END'''.format(**names))
+            self.cursor.execute('''
+                CREATE TRIGGER {fts}_delete AFTER DELETE ON {table} BEGIN
+                    INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.rowid, {old});
+                END'''.format(**names))
+            self.cursor.execute('''
+                CREATE TRIGGER {fts}_update AFTER UPDATE ON {table} BEGIN
+                    INSERT INTO {fts}({fts}, rowid, {columns}) VALUES ('delete', old.rowid, {old});
+                    INSERT INTO {fts}(rowid, {columns}) VALUES (new.rowid, {new});
+                END'''.format(**names))
+            self.cursor.execute("INSERT INTO {fts}({fts}) VALUES('rebuild')".format(**names))
+
+    def drop_search(self):
+        """Drop the full-text index of table and the triggers keeping it"""
+        fts = self.table + '_fts'
+        for trigger in ('insert', 'delete', 'update'):
+            self.cursor.execute('DROP TRIGGER IF EXISTS {}_{}'.format(fts, trigger))
+        self.cursor.execute('DROP TABLE IF EXISTS {}'.format(fts))
+
+    def create_rollups(self):
+        """
+        Create the <table>_rollups table of event counts per period, bucket
+        and level. Rows logged before it existed are counted when it is made.
+        """
+        rollups = self.table + '_rollups'
+        exists = self.cursor.execute('''SELECT 1 FROM sqlite_master
+                                         WHERE type='table' AND name=?''', (rollups,)).fetchone()
+        if exists:
+            return
+        with self.conn:
+            self.cursor.execute('''
+                CREATE TABLE {} (period TEXT, start TIMESTAMP, level TEXT, count INTEGER,
+                PRIMARY KEY (period, level, start)) WITHOUT ROWID'''.format(rollups))
+        self.backfill_rollups()
+
+    def backfill_rollups(self):
+        """Recount the rollups from every row of table in one transaction,
+        for databases logged to without rollups or by other programs.
+        Rows deleted from table stay counted until this is called. Like
+        events counted as they are logged, rows are bucketed by wall time.
+        """
+        rollups = self.table + '_rollups'
+        with self.conn:
+            self.cursor.execute('DELETE FROM {}'.format(rollups))
+            for period, pattern in PERIODS.items():
+                self.cursor.execute('''
+                    INSERT INTO {rollups} SELECT ?, strftime(?, substr(inputDT, 1, 19)) AS bucket,
+                    level, count(*)
+                    FROM {table} WHERE inputDT IS NOT NULL GROUP BY bucket, level
+                    '''.format(rollups=rollups, table=self.table), (period, pattern))
 
     def log(self, event):
         """
@@ -43,12 +283,42 @@ class DiaryDB(object):
 
         :param event: event object to commit to db
         """
+        self._insert([event])
+
+    def log_many(self, events):
+        """
+        Log a group of events into the database in a single transaction.
+        Subclasses opt in to group commits by overriding insert_query and
+        values instead of log. A subclass which only overrides log has each
+        event passed to its own log method.
+
+        :param events: sequence of event objects to commit to db
+        """
+        if type(self).log != DiaryDB.log:
+            for event in events:
+                self.log(event)
+            return
+
+        self._insert(events)
+
+    def values(self, event):
+        """
+        Turn an event into the row inserted by insert_query
+
+        :param event: event object to be stored
+        :return: tuple of values for insert_query
+        """
+        return event.dt, event.level_str, event.info
+
+    def _insert(self, events):
+        """Execute insert_query for every event, count them in the rollups
+        and commit once"""
         try:
             with self.conn:
-                self.cursor.execute('''
-                                    INSERT INTO logs(inputDT, level, log)
-                                                     VALUES(?, ?, ?)''',
-                                    (event.dt, event.level_str, event.info))
+                self.cursor.executemany(self.insert_query,
+                                        [self.values(event) for event in events])
+                if self.rollups:
+                    self._count(events)
         except sqlite3.ProgrammingError:
             raise ValueError("""diary does not support logging unicode strings into a database in Python2.
     To avoid this:
@@ -56,19 +326,251 @@ class DiaryDB(object):
         2. Write your own implementation of DiaryDB that can handle unicode
             """)
 
+    def _count(self, events):
+        """Add events to the rollups, one statement per bucket rather than per event"""
+        counts = {}
+        for event in events:
+            minute = event.dt.replace(second=0, microsecond=0, tzinfo=None)
+            for bucket in ((MINUTE, minute), (HOUR, minute.replace(minute=0)),
+                           (DAY, minute.replace(hour=0, minute=0))):
+                bucket += (event.level_str,)
+                counts[bucket] = counts.get(bucket, 0) + 1
+        rollups = self.table + '_rollups'
+        self.cursor.executemany('''INSERT OR IGNORE INTO {} (period, start, level, count)
+                                   VALUES (?, ?, ?, 0)'''.format(rollups), list(counts))
+        self.cursor.executemany('''UPDATE {} SET count = count + ?
+                                   WHERE period = ? AND start = ? AND level = ?'''.format(rollups),
+                                [(count,) + bucket for bucket, count in counts.items()])
+
+    def counts(self, period=MINUTE, since=None, until=None, levels=None):
+        """Read event counts from the rollups, oldest bucket first
+
+        :param period: MINUTE, HOUR or DAY buckets
+        :param since: datetime, buckets starting before its bucket are left out
+        :param until: datetime, buckets starting at or after its bucket are left out
+        :param levels: level or sequence of levels to count, None for every level
+        :return: generator of (bucket start datetime, level str, count) rows
+        """
+        sql, parameters = self._rollup_select('start, level, count', period, since, until, levels)
+        return self._fetch(sql + ' ORDER BY start ASC, level ASC', parameters, 1000)
+
+    def count(self, since=None, until=None, levels=None, period=MINUTE):
+        """Count events from the rollups. since and until are rounded down
+        to the start of their period's buckets.
+
+        :param since: datetime of the earliest events to count, None for all
+        :param until: datetime events must be logged before, None for all
+        :param levels: level or sequence of levels to count, None for every level
+        :param period: MINUTE, HOUR or DAY buckets to sum, coarser reads fewer rows
+        :return: int number of events
+        """
+        sql, parameters = self._rollup_select('sum(count)', period, since, until, levels)
+        return self.cursor.execute(sql, parameters).fetchone()[0] or 0
+
+    def rate(self, since, until=None, levels=None, per=MINUTE):
+        """
+        :param since: datetime the rate is measured from
+        :param until: datetime the rate is measured to, None for now
+        :param levels: level or sequence of levels to count, None for every level
+        :param per: MINUTE, HOUR or DAY the rate is given per
+        :return: float average events per period between since and until
+        """
+        until = datetime.now() if until is None else until
+        seconds = (until - since).total_seconds()
+        if seconds <= 0:
+            raise ValueError("until must be after since")
+        return self.count(since, until, levels) * _SECONDS[per] / seconds
+
+    def _rollup_select(self, columns, period, since, until, levels):
+        """:return: (sql, parameters) selecting columns of the rollups matching the arguments"""
+        if not self.rollups:
+            raise ValueError("{} does not keep rollups".format(type(self).__name__))
+        if period not in PERIODS:
+            raise ValueError("Could not identify rollup period {}".format(period))
+        sql = 'SELECT {} FROM {}_rollups WHERE period = ?'.format(columns, self.table)
+        parameters = [period]
+        if levels is not None:
+            levels = _level_strings(levels)
+            sql += ' AND level IN ({})'.format(', '.join('?' * len(levels)))
+            parameters.extend(levels)
+        if since is not None:
+            sql += ' AND start >= ?'
+            parameters.append(_bucket(since, period))
+        if until is not None:
+            sql += ' AND start < ?'
+            parameters.append(_bucket(until, period))
+        return sql, parameters
+
+    def log_stats(self, snapshot, dt=None):
+        """Save a snapshot of a Diary's runtime statistics (see stats.py) as
+        json in <table>_stats, which is created the first time
+
+        :param snapshot: dict returned by Diary.stats
+        :param dt: datetime of the snapshot, None for now
+        """
+        with self.conn:
+            self.cursor.execute('''CREATE TABLE IF NOT EXISTS {}_stats
+                                   (inputDT TIMESTAMP, stats TEXT)'''.format(self.table))
+            self.cursor.execute('INSERT INTO {}_stats VALUES (?, ?)'.format(self.table),
+                                (datetime.now() if dt is None else dt,
+                                 json.dumps(snapshot, sort_keys=True)))
+
+    def saved_stats(self, since=None, until=None):
+        """Read snapshots saved by log_stats, oldest first
+
+        :param since: datetime of the earliest snapshot to read
+        :param until: datetime snapshots must be saved before
+        :return: generator of (datetime, snapshot dict)
+        """
+        exists = self.cursor.execute('''SELECT 1 FROM sqlite_master
+                                         WHERE type='table' AND name=?''',
+                                     (self.table + '_stats',)).fetchone()
+        if not exists:
+            return
+        sql = 'SELECT inputDT, stats FROM {}_stats WHERE inputDT >= ?'.format(self.table)
+        parameters = [datetime.min if since is None else since]
+        if until is not None:
+            sql += ' AND inputDT < ?'
+            parameters.append(until)
+        for dt, saved in self._fetch(sql + ' ORDER BY inputDT ASC', parameters, 100):
+            yield dt, json.loads(saved)
+
+    def maintenance_timeout(self):
+        """:return: seconds until maintain has work to do, None if it never does"""
+        if self.retention is None:
+            return None
+        return max(self._maintenance_due - default_timer(), 0)
+
+    def maintain(self):
+        """
+        Enforce the retention policy one chunk at a time when it is due.
+        Diary calls this between writes so the writer is never paused for
+        longer than a chunk takes.
+
+        :return: True if more chunks are waiting
+        """
+        if self.retention is None or default_timer() < self._maintenance_due:
+            return False
+        # Scheduled first so a step which raises, such as on a locked database, waits an interval
+        self._maintenance_due = default_timer() + self.retention.interval
+        pending = self.retention.step(self)
+        if pending:
+            self._maintenance_due = default_timer()
+        return pending
+
     def assert_event_logged(self, log, level='%', limit=-1):
         """Testing method to ensure an event is logged
 
         :param log: log text to look
         :param level: info text to look for - % for any level
         :param limit: how far back to look in logs
-        :asserts: if an event with given parameters is logged
+        :asserts: if an event with given parameters is logged, levels are
+            matched ignoring case as LIKE matches them
         """
-        entries = self.cursor.execute('''
-            SELECT * FROM logs WHERE log=(?) AND level LIKE (?) ORDER BY
-            inputDT ASC LIMIT (?)''', (log, level, limit))
+        if level == '%':  # Without a level every row is read
+            entries = self.cursor.execute('''
+                SELECT * FROM logs WHERE log=(?) ORDER BY
+                inputDT ASC LIMIT (?)''', (log, limit))
+        elif '%' in level or '_' in level:
+            entries = self.cursor.execute('''
+                SELECT * FROM logs WHERE log=(?) AND level LIKE (?) ORDER BY
+                inputDT ASC LIMIT (?)''', (log, level, limit))
+        else:
+            # Levels are stored as given or upper-cased, both are found with the
+            # (level, inputDT) index; other cases fall back to scanning with LIKE
+            entries = self.cursor.execute('''
+                SELECT * FROM logs WHERE log=(?) AND level IN (?, ?) ORDER BY
+                inputDT ASC LIMIT (?)''', (log, level, level.upper(), limit))
+            if entries.fetchone():
+                return
+            entries = self.cursor.execute('''
+                SELECT * FROM logs WHERE log=(?) AND level LIKE (?) ORDER BY
+                inputDT ASC LIMIT (?)''', (log, level, limit))
         assert bool(entries.fetchone())
 
+    def query(self, since=None, until=None, levels=None, contains=None, limit=None,
+              batch_size=1000):
+        """Find logged events, oldest first, using the logs indexes
+
+        :param since: datetime of the earliest event to find
+        :param until: datetime events must be logged before
+        :param levels: level or sequence of levels to find (@log_level funcs
+            or level strings), None for every level
+        :param contains: str the log must contain, case sensitive
+        :param limit: most events to find, None for all
+        :param batch_size: rows fetched from the database at a time
+        :return: generator of (inputDT, level, log) rows
+        """
+        sql, parameters = self._select(since, until, levels, contains, limit)
+        return self._fetch(sql, parameters, batch_size)
+
+    def search(self, query, limit=None, batch_size=1000):
+        """Find rows of table whose search_columns match a full-text query,
+        best matches first
+
+        :param query: FTS5 query such as 'timeout', 'disk AND full' or
+            '"req-1234"' (quote terms holding punctuation)
+        :param limit: most rows to find, None for all
+        :param batch_size: rows fetched from the database at a time
+        :return: generator of table rows
+        """
+        if not self.search_columns:
+            raise ValueError("{} has no search_columns to search".format(type(self).__name__))
+        sql = '''SELECT {table}.* FROM {fts} JOIN {table} ON {table}.rowid = {fts}.rowid
+                 WHERE {fts} MATCH ? ORDER BY {fts}.rank'''.format(table=self.table,
+                                                                fts=self.table + '_fts')
+        parameters = [query]
+        if limit is not None:
+            sql += ' LIMIT ?'
+            parameters.append(limit)
+        return self._fetch(sql, parameters, batch_size)
+
+    def _fetch(self, sql, parameters, batch_size):
+        """Execute sql on a new cursor, leaving self.cursor free while rows are read
+
+        :return: generator of rows fetched batch_size at a time
+        """
+        cursor = self.conn.cursor()
+        cursor.execute(sql, parameters)
+        try:
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    yield row
+        finally:
+            cursor.close()
+
+    def _select(self, since=None, until=None, levels=None, contains=None, limit=None):
+        """
+        :return: (sql, parameters) selecting the rows query finds
+        """
+        conditions = []
+        parameters = []
+        if levels is not None:
+            levels = _level_strings(levels)
+            conditions.append('level IN ({})'.format(', '.join('?' * len(levels))))
+            parameters.extend(levels)
+        if since is not None:
+            conditions.append('inputDT >= ?')
+            parameters.append(since)
+        if until is not None:
+            conditions.append('inputDT < ?')
+            parameters.append(until)
+        if contains is not None:
+            conditions.append('instr(log, ?) > 0')
+            parameters.append(contains)
+
+        sql = 'SELECT inputDT, level, log FROM logs'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        sql += ' ORDER BY inputDT ASC'
+        if limit is not None:
+            sql += ' LIMIT ?'
+            parameters.append(limit)
+        return sql, parameters
+
     def close(self):
         """Close the connection"""
         try:
@@ -82,3 +584,203 @@ class DiaryDB(object):
 
     def __exit__(self, exc_type, exc_val, exc_tb):
         self.close()
+
+
+class ReaderPool(object):
+    """
+    Read-only connections to a database that threads borrow to query it
+    while a Diary writes to it:
+        pool = ReaderPool("diary.db", size=4)
+        with pool.borrow() as db:
+            errors = list(db.query(levels=levels.error, limit=100))
+
+    Connections are opened as they are first needed, up to size. The
+    database must use journal_mode=WAL (see PROFILES) so readers run beside
+    the writer without blocking it; each query then reads a snapshot of the
+    commits made before it started. Under a rollback journal a partly read
+    query would make the writer fail with "database is locked", so borrow
+    refuses such databases.
+    """
+
+    def __init__(self, path, size=4, db=DiaryDB):
+        """
+        :param path: str path of an existing database
+        :param size: most connections open at once
+        :param db: DiaryDB class to open with read_only=True
+        """
+        self.path = path
+        self.size = size
+        self.db = db
+        self.opened = 0
+        self.closed = False
+        self._idle = Queue()
+        self._lock = Lock()
+
+    @contextmanager
+    def borrow(self, timeout=None):
+        """Lend a read-only DiaryDB for the duration of a with block.
+        Consume query and search results inside the block.
+
+        :param timeout: seconds to wait for a connection once size are
+            borrowed, None waits forever
+        :raises RuntimeError: if no connection is returned within timeout
+        :raises ValueError: if the database does not use journal_mode=WAL
+        """
+        reader = self._take(timeout)
+        try:
+            yield reader
+        finally:
+            if self.closed:
+                reader.close()
+            else:
+                self._idle.put(reader)
+
+    def _take(self, timeout):
+        """:return: an idle connection, a new one if fewer than size are open"""
+        try:
+            return self._idle.get_nowait()
+        except Empty:
+            pass
+        with self._lock:
+            if self.closed:
+                raise ValueError("Cannot borrow from a closed ReaderPool")
+            opening = self.opened < self.size
+            if opening:
+                self.opened += 1
+        if opening:
+            try:
+                reader = self.db(self.path, read_only=True)
+                if not reader.uses_wal():
+                    reader.close()
+                    raise ValueError("Readers would block the writer of {}, use a pragma profile "
+                                     "to set journal_mode=WAL".format(self.path))
+                return reader
+            except Exception:
+                with self._lock:
+                    self.opened -= 1
+                raise
+        try:
+            return self._idle.get(timeout=timeout)
+        except Empty:
+            raise RuntimeError("No reader was returned to the pool within {} seconds".format(timeout))
+
+    def close(self):
+        """Close idle connections, borrowed ones are closed when returned"""
+        self.closed = True
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except Empty:
+                return
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+
+def _level_strings(levels):
+    """:return: list of the level strings of a level or sequence of levels"""
+    if isinstance(levels, (str, type(u''))) or callable(levels):
+        levels = [levels]
+    return [stringify_level(level) for level in levels]
+
+
+def _bucket(dt, period):
+    """:return: datetime start of the period's bucket holding dt"""
+    dt = dt.replace(second=0, microsecond=0, tzinfo=None)
+    if period != MINUTE:
+        dt = dt.replace(minute=0)
+    if period == DAY:
+        dt = dt.replace(hour=0)
+    return dt
+
+
+def _is_identifier(text):
+    """:return: True if text is a bare word safe to put in a pragma"""
+    return isinstance(text, _string_types) and text.replace('_', '').isalnum()
+
+
+class Retention(object):
+    """
+    Limits on the rows a DiaryDB keeps. Rows past a limit are deleted oldest
+    first a chunk at a time, and the freed pages are given back to the file
+    system with incremental_vacuum, so no step holds the database for long:
+        db = DiaryDB("diary.db", retention=Retention(max_age=timedelta(days=30)))
+        logger = Diary("logs", db=functools.partial(DiaryDB, retention=...))
+
+    Pages are only given back by databases created with a retention policy,
+    which turns on auto_vacuum=INCREMENTAL; older databases reuse freed pages
+    without shrinking until they are vacuumed once.
+    """
+
+    def __init__(self, max_age=None, max_rows=None, max_bytes=None, chunk=1000, interval=60):
+        """
+        :param max_age: timedelta or seconds, rows logged earlier are deleted
+        :param max_rows: most rows kept
+        :param max_bytes: most bytes of the database file used by rows
+        :param chunk: most rows deleted and pages vacuumed in one step
+        :param interval: seconds between checks once nothing is over a limit
+        """
+        if max_age is not None and not isinstance(max_age, timedelta):
+            max_age = timedelta(seconds=max_age)
+        self.max_age = max_age
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        self.chunk = chunk
+        self.interval = interval
+
+    def step(self, db):
+        """Delete up to chunk expired rows then vacuum up to chunk free pages
+
+        :param db: DiaryDB to enforce the policy on
+        :return: True if more rows or pages are waiting
+        """
+        deleted = 0
+        with db.conn:
+            if self.max_age is not None:
+                deleted += db.cursor.execute('''
+                    DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table}
+                    WHERE inputDT < ? ORDER BY inputDT LIMIT ?)'''.format(table=db.table),
+                    (datetime.now() - self.max_age, self.chunk)).rowcount
+            excess = max(self._excess_rows(db), self._excess_bytes(db))
+            if excess > 0 and deleted < self.chunk:
+                deleted += db.cursor.execute('''
+                    DELETE FROM {table} WHERE rowid IN (SELECT rowid FROM {table}
+                    ORDER BY rowid LIMIT ?)'''.format(table=db.table),
+                    (min(excess, self.chunk - deleted),)).rowcount
+
+        db.cursor.execute('PRAGMA incremental_vacuum({:d})'.format(self.chunk)).fetchall()
+        free = db.cursor.execute('PRAGMA freelist_count').fetchone()[0]
+        vacuuming = free > 0 and self._auto_vacuum(db)
+        return deleted >= self.chunk or vacuuming
+
+    @staticmethod
+    def _rows(db):
+        """:return: rows in db's table"""
+        return db.cursor.execute('SELECT count(*) FROM {}'.format(db.table)).fetchone()[0]
+
+    def _excess_rows(self, db):
+        """:return: rows over max_rows"""
+        if self.max_rows is None:
+            return 0
+        return self._rows(db) - self.max_rows
+
+    def _excess_bytes(self, db):
+        """:return: estimated rows over max_bytes, from the average bytes per row"""
+        if self.max_bytes is None:
+            return 0
+        pages = db.cursor.execute('PRAGMA page_count').fetchone()[0]
+        free = db.cursor.execute('PRAGMA freelist_count').fetchone()[0]
+        page_size = db.cursor.execute('PRAGMA page_size').fetchone()[0]
+        used = (pages - free) * page_size
+        rows = self._rows(db)
+        if used <= self.max_bytes or rows <= 0:
+            return 0
+        return int(math.ceil((used - self.max_bytes) * rows / float(used)))
+
+    @staticmethod
+    def _auto_vacuum(db):
+        """:return: True if db gives free pages back with incremental_vacuum"""
+        return db.cursor.execute('PRAGMA auto_vacuum').fetchone()[0] == 2
@@ -1,26 +1,30 @@
 from threading import Thread
 
 try:
-    from queue import Queue
+    from queue import Queue, Empty
 except ImportError:  # python 2
-    from Queue import Queue
+    from Queue import Queue, Empty
 
 
 class DiaryThread(Thread):
     """A thread for logging as to not disrupt the logged application"""
 
-    def __init__(self, diary, sets_db=False, name="Diary Logger"):
+    def __init__(self, diary, sets_db=False, name="Diary Logger", max_batch=1000,
+                 queue=None):
         """Construct a thread for logging
 
         :param diary: A Diary instance to handle logging
         :param sets_db: determines if self.run should call self.diary.set_db
         :param name: A string to represent this thread
+        :param max_batch: most events written in a single group commit
+        :param queue: queue events wait in, defaults to an unbounded Queue
         """
         Thread.__init__(self, name=name)
         self.daemon = True  # py2 constructor requires explicit
         self.diary = diary
         self.sets_db = sets_db
-        self.queue = Queue()
+        self.max_batch = max_batch
+        self.queue = Queue() if queue is None else queue
         self.start()
 
     def join(self, timeout=None):
@@ -41,7 +45,34 @@ class DiaryThread(Thread):
         if self.sets_db:
             self.diary.set_db()
         while True:
-            received = self.queue.get()
+            try:
+                received = self.queue.get(timeout=self.diary._idle_timeout())
+            except Empty:
+                self.diary._idle()
+                continue
             if received is None:
                 return
-            self.diary._write(received)
+            batch = [received]
+            finished = self._drain(batch)
+            try:
+                self.diary._write_many(batch)
+            except Exception:  # Keep logging later batches
+                self.diary.handle_error()
+            if finished:
+                return
+
+    def _drain(self, batch):
+        """Move every event waiting in the queue into batch
+
+        :param batch: list of events to extend
+        :return: True if the queue was closed while draining
+        """
+        while len(batch) < self.max_batch:
+            try:
+                received = self.queue.get_nowait()
+            except Empty:
+                return False
+            if received is None:
+                return True
+            batch.append(received)
+        return False
@@ -0,0 +1,137 @@
+"""
+Multiprocess logging funnels events from many processes into one Diary.
+A DiaryHub owns the only Diary writing to the log file and database; each
+process logs through a ClientDiary which sends batches of events to it:
+    hub = DiaryHub("logs")
+
+    def start_worker(queue):
+        global logger
+        logger = ClientDiary(queue)
+
+    pool = multiprocessing.Pool(4, initializer=start_worker, initargs=(hub.queue,))
+    ...
+    hub.close()
+"""
+
+from __future__ import absolute_import
+import atexit
+import multiprocessing
+from multiprocessing.util import Finalize
+from threading import Thread, Event
+
+try:
+    from queue import Empty
+except ImportError:  # python 2
+    from Queue import Empty
+
+from diary.diary import Diary
+
+
+class DiaryHub(object):
+    """Writes events sent by ClientDiary instances in other processes"""
+
+    def __init__(self, path, queue=None, max_batch=10000, **kwargs):
+        """
+        :param path: path for the hub's Diary (see Diary.__init__)
+        :param queue: multiprocessing.Queue clients send to, one is made if None
+        :param max_batch: most events written in a single group commit
+        :param kwargs: passed to the hub's Diary, which always writes
+            synchronously in the hub's own thread
+        """
+        self.queue = multiprocessing.Queue() if queue is None else queue
+        self.max_batch = max_batch
+        self.diary = None
+        self._error = None
+        self._ready = Event()
+        self.thread = Thread(target=self._collect, args=(path, kwargs), name="Diary Hub")
+        self.thread.daemon = True
+        self.thread.start()
+        self._ready.wait()
+        if self._error is not None:
+            raise self._error
+        atexit.register(self.close)
+
+    def client(self, **kwargs):
+        """
+        Make a ClientDiary for this hub. Call it in the process which logs,
+        a ClientDiary's thread does not survive a fork.
+
+        :param kwargs: passed to ClientDiary
+        """
+        return ClientDiary(self.queue, **kwargs)
+
+    def _collect(self, path, kwargs):
+        """Own the Diary and write every batch clients send until closed"""
+        try:
+            self.diary = Diary(path, async=False, **kwargs)
+        except Exception as e:
+            self._error = e
+            return
+        finally:
+            self._ready.set()
+
+        closed = False
+        while not closed:
+            batch = self.queue.get()
+            if batch is None:
+                break
+            events = list(batch)
+            while len(events) < self.max_batch:
+                try:
+                    batch = self.queue.get_nowait()
+                except Empty:
+                    break
+                if batch is None:
+                    closed = True
+                    break
+                events.extend(batch)
+            try:
+                self.diary._write_many(events)
+            except Exception:  # Keep writing later batches
+                self.diary.handle_error()
+        self.diary.close()
+
+    def close(self):
+        """Write everything clients have sent and close the hub's Diary"""
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+
+class ClientDiary(Diary):
+    """
+    A Diary which sends its events to a DiaryHub instead of writing them.
+    Events are rendered in the client, so deferred info never needs to be
+    pickled, and are sent a batch at a time by the client's DiaryThread.
+    Events, their levels and custom Event subclasses must be picklable.
+    """
+
+    def __init__(self, queue, **kwargs):
+        """
+        :param queue: a DiaryHub's queue
+        :param kwargs: passed to Diary, file and database arguments are ignored.
+            stats is ignored too, the hub's Diary collects statistics and
+            measures latency from when each event was logged in the client.
+        """
+        self.channel = queue
+        kwargs.setdefault('also_print', False)
+        kwargs['stats'] = False
+        Diary.__init__(self, None, **kwargs)
+        self._stamps = True  # For the hub's latency
+
+    def _register_close(self):
+        """Close before the queue's feeder thread is stopped on exit"""
+        Finalize(None, self.close, exitpriority=20)
+
+    def _open_path(self, path, file_name, db_name):
+        """A ClientDiary opens no files"""
+
+    def _write_many(self, events):
+        """Send a group of events to the hub
+
+        :param events: sequence of event objects to log
+        """
+        for event in events:
+            self._render(event)
+        self.channel.put(list(events))
+        self.last_logged_event = events[-1]
@@ -0,0 +1,360 @@
+"""
+PartitionedDiaryDB writes events to one SQLite file per day or hour,
+chosen by each event's dt, so old data is dropped by deleting files:
+    logger = Diary("logs", db=PartitionedDiaryDB)  # logs/diary-2016-07-04.db, ...
+
+    with PartitionedDiaryDB("logs/diary.db") as db:
+        for row in db.query(since=yesterday, levels=levels.error):
+            ...
+        db.drop(before=last_month)
+
+Queries only open the partitions overlapping the requested time range,
+and so do counts of partitions keeping rollups.
+"""
+
+from __future__ import absolute_import
+import itertools
+import os
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from timeit import default_timer
+
+from diary.logdb import DiaryDB, MINUTE
+from diary.writers import DAILY, HOURLY
+
+_NAME_FORMATS = {DAILY: '%Y-%m-%d', HOURLY: '%Y-%m-%d-%H'}
+_LENGTHS = {DAILY: timedelta(days=1), HOURLY: timedelta(hours=1)}
+
+
+class PartitionedDiaryDB(DiaryDB):
+    """
+    A DiaryDB which keeps a partition DiaryDB for every day or hour.
+    Partitions hold disjoint time ranges, so results of several partitions
+    are merged by reading them in order.
+    """
+    partition = DiaryDB
+    opens_path = False
+
+    def __init__(self, path=None, period=DAILY, search_columns=None, max_open=2,
+                 retention=None, pragmas=None, read_only=False, rollups=None):
+        """
+        :param path: path of a database the partitions are named after,
+            diary.db names partitions diary-<period>.db. The file itself is never made.
+        :param period: DAILY or HOURLY partitions
+        :param search_columns: passed to every partition (see DiaryDB)
+        :param max_open: most partitions kept open for writing, events
+            arriving late for older partitions reopen them
+        :param retention: Retention whose max_age and max_bytes are enforced
+            by deleting whole partitions, max_rows is not supported
+        :param pragmas: pragma profile or pragmas set on every partition (see DiaryDB)
+        :param read_only: refuse to log. Partitions are always opened
+            read-only for queries so reading never blocks the writer.
+        :param rollups: True to keep rollups in every partition (see DiaryDB)
+        """
+        if period not in _NAME_FORMATS:
+            raise ValueError("Could not identify partition period {}".format(period))
+        if path is None:
+            path = DiaryDB.default_path()
+        self.path = path
+        self.read_only = read_only
+        self.period = period
+        self.max_open = max_open
+        if search_columns is not None:
+            self.search_columns = tuple(search_columns)
+        if pragmas is not None:
+            self.pragmas = pragmas
+        if rollups is not None:
+            self.rollups = rollups
+        if retention is not None:
+            if retention.max_rows is not None:
+                raise ValueError("Partitions are dropped whole and cannot keep max_rows")
+            self.retention = retention
+        self._maintenance_due = default_timer()
+        self._base, self._ext = os.path.splitext(path)
+        self._open = OrderedDict()
+
+    def configure(self, pragmas):
+        """Set pragmas on every partition, including those made later
+        (see DiaryDB.configure)
+
+        :return: dict of each partition's path to the values SQLite reports
+        """
+        self.pragmas = pragmas
+        return self._each('configure', pragmas)
+
+    def uses_wal(self):
+        """:return: True if the newest partition, the one being written, uses
+            journal_mode=WAL (see DiaryDB.uses_wal), or if there are none yet"""
+        partitions = self.partitions()
+        if not partitions:
+            return True
+        db = self._open_partition(partitions[-1][1], read_only=True)
+        try:
+            return db.uses_wal()
+        finally:
+            db.close()
+
+    def create_tables(self):
+        """Create tables in every partition, new partitions create their own"""
+        self._each('create_tables')
+
+    def create_indexes(self):
+        """Index logs in every partition (see DiaryDB.create_indexes)"""
+        self._each('create_indexes')
+
+    def create_search(self):
+        """Create the full-text index of every partition (see DiaryDB.create_search)"""
+        self._each('create_search')
+
+    def drop_search(self):
+        """Drop the full-text index of every partition"""
+        self._each('drop_search')
+
+    def create_rollups(self):
+        """Keep rollups in every partition, including those made later
+        (see DiaryDB.create_rollups)
+        """
+        self.rollups = True
+        self._each('create_rollups')
+
+    def backfill_rollups(self):
+        """Recount the rollups of every partition (see DiaryDB.backfill_rollups)"""
+        self._each('backfill_rollups')
+
+    def _each(self, method, *args):
+        """Call a method on every existing partition, reusing those open for writing
+
+        :return: dict of each partition's path to what method returned
+        """
+        if self.read_only:
+            raise ValueError("Cannot change a read-only PartitionedDiaryDB")
+        results = {}
+        for start, path in self.partitions():
+            db = self._open.get(self._key(start))
+            if db is not None:
+                results[path] = getattr(db, method)(*args)
+                continue
+            db = self._open_partition(path)
+            try:
+                results[path] = getattr(db, method)(*args)
+            finally:
+                db.close()
+        return results
+
+    def _key(self, dt):
+        """:return: tuple identifying the partition of dt"""
+        if self.period == DAILY:
+            return dt.year, dt.month, dt.day
+        return dt.year, dt.month, dt.day, dt.hour
+
+    def partition_path(self, start):
+        """
+        :param start: datetime within the partition
+        :return: str path of the partition holding start
+        """
+        return "{}-{}{}".format(self._base, start.strftime(_NAME_FORMATS[self.period]), self._ext)
+
+    def partitions(self, since=None, until=None):
+        """
+        :param since: datetime partitions must hold times at or after
+        :param until: datetime partitions must hold times before
+        :return: sorted list of (start datetime, path) of existing partitions
+            overlapping since and until
+        """
+        head, tail = os.path.split(os.path.abspath(self._base))
+        prefix = tail + '-'
+        length = _LENGTHS[self.period]
+        found = []
+        for name in os.listdir(head or '.'):
+            if not name.startswith(prefix) or not name.endswith(self._ext):
+                continue
+            try:
+                start = datetime.strptime(name[len(prefix):len(name) - len(self._ext)],
+                                          _NAME_FORMATS[self.period])
+            except ValueError:
+                continue
+            if (until is None or start < until) and (since is None or start + length > since):
+                found.append((start, os.path.join(head, name)))
+        return sorted(found)
+
+    def _open_partition(self, path, read_only=False):
+        return self.partition(path, search_columns=self.search_columns or None,
+                              pragmas=self.pragmas, read_only=read_only, rollups=self.rollups)
+
+    def _writer(self, key, dt):
+        """:return: open partition for key, closing the least recently used past max_open"""
+        if self.read_only:
+            raise ValueError("Cannot log to a read-only PartitionedDiaryDB")
+        db = self._open.pop(key, None)
+        if db is None:
+            db = self._open_partition(self.partition_path(dt))
+            while len(self._open) >= self.max_open:
+                self._open.popitem(last=False)[1].close()
+        self._open[key] = db
+        return db
+
+    def log(self, event):
+        """Log an event into the partition of its dt
+
+        :param event: event object to commit to db
+        """
+        self.log_many((event,))
+
+    def log_many(self, events):
+        """Log a group of events, one transaction for each partition they fall in
+
+        :param events: sequence of event objects to commit to db
+        """
+        for key, group in itertools.groupby(events, lambda event: self._key(event.dt)):
+            group = list(group)
+            self._writer(key, group[0].dt).log_many(group)
+
+    def query(self, since=None, until=None, levels=None, contains=None, limit=None,
+              batch_size=1000):
+        """Find logged events oldest first in the partitions overlapping since
+        and until (see DiaryDB.query). Partitions are opened one at a time as
+        the result is read.
+
+        :return: generator of (inputDT, level, log) rows
+        """
+        rows = itertools.chain.from_iterable(
+            self._read(path, 'query', since, until, levels, contains, limit, batch_size)
+            for _, path in self.partitions(since, until))
+        return rows if limit is None else itertools.islice(rows, limit)
+
+    def search(self, query, limit=None, batch_size=1000):
+        """Find rows matching a full-text query (see DiaryDB.search), newest
+        partition first and best matches first within each partition
+
+        :return: generator of rows
+        """
+        if not self.search_columns:
+            raise ValueError("{} has no search_columns to search".format(type(self).__name__))
+        rows = itertools.chain.from_iterable(
+            self._read(path, 'search', query, limit, batch_size)
+            for _, path in reversed(self.partitions()))
+        return rows if limit is None else itertools.islice(rows, limit)
+
+    def counts(self, period=MINUTE, since=None, until=None, levels=None):
+        """Read event counts from the rollups of the partitions overlapping
+        since and until (see DiaryDB.counts). Buckets longer than a partition
+        are summed over the partitions they span.
+
+        :return: generator of (bucket start datetime, level str, count) rows
+        """
+        rows = itertools.chain.from_iterable(
+            self._read(path, 'counts', period, since, until, levels)
+            for _, path in self.partitions(since, until))
+        for start, group in itertools.groupby(rows, lambda row: row[0]):
+            counts = OrderedDict()
+            for _, level, count in group:
+                counts[level] = counts.get(level, 0) + count
+            for level in sorted(counts):
+                yield start, level, counts[level]
+
+    def count(self, since=None, until=None, levels=None, period=MINUTE):
+        """Count events from the rollups of the partitions overlapping since
+        and until (see DiaryDB.count)
+
+        :return: int number of events
+        """
+        total = 0
+        for _, path in self.partitions(since, until):
+            db = self._open_partition(path, read_only=True)
+            try:
+                total += db.count(since, until, levels, period)
+            finally:
+                db.close()
+        return total
+
+    def log_stats(self, snapshot, dt=None):
+        """Save a stats snapshot in the partition of dt (see DiaryDB.log_stats)"""
+        dt = datetime.now() if dt is None else dt
+        self._writer(self._key(dt), dt).log_stats(snapshot, dt)
+
+    def saved_stats(self, since=None, until=None):
+        """Read stats snapshots from the partitions overlapping since and until
+        (see DiaryDB.saved_stats)
+
+        :return: generator of (datetime, snapshot dict)
+        """
+        return itertools.chain.from_iterable(
+            self._read(path, 'saved_stats', since, until)
+            for _, path in self.partitions(since, until))
+
+    def _read(self, path, method, *args):
+        """Call a reading method on a new read-only connection to a partition,
+        closing it when done
+
+        :return: generator of rows
+        """
+        db = self._open_partition(path, read_only=True)
+        try:
+            for row in getattr(db, method)(*args):
+                yield row
+        finally:
+            db.close()
+
+    def assert_event_logged(self, log, level='%', limit=-1):
+        """Testing method to ensure an event is logged in any partition
+        (see DiaryDB.assert_event_logged)
+        """
+        for _, path in self.partitions():
+            db = self._open_partition(path, read_only=True)
+            try:
+                db.assert_event_logged(log, level, limit)
+                return
+            except AssertionError:
+                pass
+            finally:
+                db.close()
+        raise AssertionError("{} was not logged".format(log))
+
+    def drop(self, before):
+        """Delete partitions which only hold times before a datetime
+
+        :param before: datetime to keep partitions from
+        :return: list of deleted paths
+        """
+        length = _LENGTHS[self.period]
+        return [self._remove(start, path) for start, path in self.partitions(until=before)
+                if start + length <= before]
+
+    def maintain(self):
+        """Drop partitions past the retention policy when it is due
+
+        :return: False, a partition is dropped in a single step
+        """
+        if self.retention is None or default_timer() < self._maintenance_due:
+            return False
+        self._maintenance_due = default_timer() + self.retention.interval  # Also after an error
+        if self.retention.max_age is not None:
+            self.drop(before=datetime.now() - self.retention.max_age)
+        if self.retention.max_bytes is not None:
+            partitions = self.partitions()
+            total = sum(os.path.getsize(path) for _, path in partitions)
+            for start, path in partitions[:-1]:  # Always keep the newest
+                if total <= self.retention.max_bytes:
+                    break
+                total -= os.path.getsize(path)
+                self._remove(start, path)
+        return False
+
+    def _remove(self, start, path):
+        """Close and delete the partition starting at start
+
+        :return: path
+        """
+        db = self._open.pop(self._key(start), None)
+        if db is not None:
+            db.close()
+        os.remove(path)
+        for suffix in ('-journal', '-wal', '-shm'):
+            if os.path.exists(path + suffix):
+                os.remove(path + suffix)
+        return path
+
+    def close(self):
+        """Close every open partition"""
+        while self._open:
+            self._open.popitem()[1].close()
@@ -0,0 +1,230 @@
+"""
+Queues hand events from logging threads to a DiaryThread.
+A bounded queue sheds events when it is full according to its overflow policy:
+    queue = DiaryQueue(maxsize=10000, overflow=DROP_LEVEL)
+    logger = Diary("log.txt", queue=queue)
+    queue.dropped  # {'DEBUG': 12, 'INFO': 3}
+
+DequeQueue trades blocking policies for less contention between many
+logging threads:
+    logger = Diary("log.txt", queue=DequeQueue())
+"""
+
+from __future__ import absolute_import
+from collections import deque
+from threading import Event, Lock
+from timeit import default_timer
+
+try:
+    from queue import Queue, Full, Empty
+except ImportError:  # python 2
+    from Queue import Queue, Full, Empty
+
+from diary import levels
+from diary.formats import stringify_level
+
+BLOCK = "block"
+DROP_NEWEST = "drop_newest"
+DROP_OLDEST = "drop_oldest"
+DROP_LEVEL = "drop_level"
+
+OVERFLOW_POLICIES = (BLOCK, DROP_NEWEST, DROP_OLDEST, DROP_LEVEL)
+
+
+class DiaryQueue(Queue):
+    """A Queue which can be bounded and drops events when full"""
+
+    def __init__(self, maxsize=0, overflow=BLOCK, timeout=None, protect=levels.error):
+        """
+        :param maxsize: most events held at once, 0 for no bound
+        :param overflow: policy used when the queue is full
+            * BLOCK waits for space, dropping the event after timeout
+            * DROP_NEWEST drops the event being added
+            * DROP_OLDEST drops the event waiting longest
+            * DROP_LEVEL drops the least severe event, never dropping
+              events as severe as protect and waiting for space instead
+        :param timeout: seconds BLOCK waits before dropping, None waits forever
+        :param protect: level at and above which DROP_LEVEL never drops
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError("Could not identify overflow policy {}".format(overflow))
+        Queue.__init__(self, maxsize)
+        self.overflow = overflow
+        self.timeout = timeout
+        self.protected = levels.severity(protect)
+        self.dropped = {}
+        self._drop_lock = Lock()
+
+    def put(self, item, block=True, timeout=None):
+        """Add an event, applying the overflow policy if the queue is full.
+        None closes the queue and is never dropped.
+        """
+        if item is None or self.maxsize <= 0:
+            return Queue.put(self, item, block, timeout)
+
+        if self.overflow == BLOCK:
+            try:
+                Queue.put(self, item, True, self.timeout)
+            except Full:
+                self._drop(item)
+            return
+
+        with self.not_full:
+            while self._qsize() >= self.maxsize:
+                if self.overflow == DROP_NEWEST:
+                    self._drop(item)
+                    return
+                elif self.overflow == DROP_OLDEST:
+                    if not self._drop_oldest():
+                        self._drop(item)
+                        return
+                elif not self._shed(item):
+                    return
+            self._put(item)
+            self.unfinished_tasks += 1
+            self.not_empty.notify()
+
+    def _drop_oldest(self):
+        """Drop the event waiting longest, passing over close sentinels.
+        Must be called holding self.mutex.
+
+        :return: False if only sentinels are queued
+        """
+        for index, queued in enumerate(self.queue):
+            if queued is not None:
+                del self.queue[index]
+                self.unfinished_tasks -= 1
+                self._drop(queued)
+                return True
+        return False
+
+    def _shed(self, item):
+        """Make room for item by dropping the least severe event.
+        Must be called holding self.mutex.
+
+        :return: True if item should still be added
+        """
+        item_severity = levels.severity(item.level)
+        lowest = lowest_severity = None
+        for index, queued in enumerate(self.queue):
+            if queued is None:  # Close sentinels are never dropped
+                continue
+            queued_severity = levels.severity(queued.level)
+            if lowest is None or queued_severity < lowest_severity:
+                lowest, lowest_severity = index, queued_severity
+                if lowest_severity <= levels.SEVERITIES['DEBUG']:
+                    break
+        if lowest is None:  # Only sentinels are queued, nothing can make room
+            lowest_severity = float('inf')
+
+        if item_severity <= lowest_severity and item_severity < self.protected:
+            self._drop(item)
+            return False
+        elif lowest_severity < self.protected:
+            self._drop(self.queue[lowest])
+            del self.queue[lowest]
+            self.unfinished_tasks -= 1
+        else:
+            self.not_full.wait()  # Everything is protected, wait for space
+        return True
+
+    def _drop(self, event):
+        _count_drop(self, event)
+
+
+class DequeQueue(object):
+    """
+    A queue for many logging threads and a single DiaryThread.
+    Adding an event is a deque append which takes no lock; the DiaryThread
+    is woken by an Event which is only set if it is not set already, so a
+    burst of events costs a single wake up.
+    """
+
+    def __init__(self, maxsize=0, overflow=DROP_NEWEST):
+        """
+        :param maxsize: most events held at once, 0 for no bound. The bound
+            is checked without a lock so it may be briefly exceeded.
+        :param overflow: DROP_NEWEST or DROP_OLDEST, use DiaryQueue to block
+            or drop by level
+        """
+        if overflow not in (DROP_NEWEST, DROP_OLDEST):
+            raise ValueError("DequeQueue does not support overflow policy {}".format(overflow))
+        self.maxsize = maxsize
+        self.overflow = overflow
+        self.queue = deque()
+        self.dropped = {}
+        self._wakeup = Event()
+        self._drop_lock = Lock()
+
+    def put(self, item, block=True, timeout=None):
+        """Add an event, dropping an event if the queue is full.
+        None closes the queue and is never dropped.
+        """
+        if self.maxsize > 0 and item is not None and len(self.queue) >= self.maxsize:
+            if self.overflow == DROP_NEWEST:
+                self._drop(item)
+                return
+            try:
+                oldest = self.queue.popleft()
+            except IndexError:
+                pass
+            else:
+                if oldest is None:  # Never drop the close sentinel, drop the new event instead
+                    self.queue.appendleft(oldest)
+                    self._drop(item)
+                    return
+                self._drop(oldest)
+        self.queue.append(item)
+        if not self._wakeup.is_set():
+            self._wakeup.set()
+
+    def get(self, block=True, timeout=None):
+        """Remove and return the oldest event
+
+        :param block: wait for an event if the queue is empty
+        :param timeout: seconds to wait, None waits forever
+        :raises Empty: if no event arrives in time
+        """
+        deadline = None if timeout is None else default_timer() + timeout
+        while True:
+            try:
+                return self.queue.popleft()
+            except IndexError:
+                pass
+            self._wakeup.clear()
+            try:  # An event may have arrived before clearing
+                return self.queue.popleft()
+            except IndexError:
+                pass
+
+            if not block:
+                raise Empty
+            remaining = None if deadline is None else deadline - default_timer()
+            if remaining is not None and remaining <= 0:
+                raise Empty
+            self._wakeup.wait(remaining)
+
+    def get_nowait(self):
+        return self.get(False)
+
+    def put_nowait(self, item):
+        return self.put(item, False)
+
+    def qsize(self):
+        return len(self.queue)
+
+    def empty(self):
+        return not self.queue
+
+    def task_done(self):
+        """Does nothing, unfinished tasks are not tracked. Present for DiaryThread.join"""
+
+    def _drop(self, event):
+        _count_drop(self, event)
+
+
+def _count_drop(queue, event):
+    """Count a dropped event by its level in queue.dropped"""
+    level_str = stringify_level(event.level)
+    with queue._drop_lock:
+        queue.dropped[level_str] = queue.dropped.get(level_str, 0) + 1
@@ -0,0 +1,350 @@
+"""
+Reads text logs written by Diary back into events without loading whole
+files into memory:
+    for event in read("log.txt"):
+        ...
+
+    reader = LogReader("log.txt", log_format=formats.minimal)
+    for event in reader.events(follow=True):  # Waits for new events like tail -f
+        ...
+
+Every built-in format can be parsed, as can str.format templates of event
+attributes such as "{level_str}|{dt}|{info}", including Event subclasses
+with a template formatter. Lines which do not begin an entry are part of
+the entry before them, so tracebacks added by levels.error stay in the
+info they were logged with. A time range of a log with an index is read
+by seeking close to its start (see index.py):
+    reader.window(since=datetime(2016, 7, 4, 14, 3), until=datetime(2016, 7, 4, 14, 4))
+"""
+
+from __future__ import absolute_import
+import io
+import os
+import re
+import time
+from datetime import datetime
+from string import Formatter
+
+from diary import events
+from diary import formats
+from diary import index
+from diary import levels
+
+FORMAT_TEMPLATES = {
+    formats.standard: ("[{level_str}]:[{dt}]: {info}",),
+    formats.minimal: ("{level_str}: {dt:%x %X}: {info}",),
+    formats.alarms: ("!!!{level_str}!!!{dt}!!!{info}!!!", " - {level_str} - {dt} - {info} - "),
+    formats.easy_read: ("|{level_str}| On {dt:%x @ %I:%M.%S%p} | {info}",),
+}
+# compile_format's versions of the built-in formats write the same text
+FORMAT_TEMPLATES.update((formats.compile_format(log_format), templates)
+                        for log_format, templates in list(FORMAT_TEMPLATES.items()))
+
+_DT = r'\d{4}-\d\d-\d\d \d\d:\d\d:\d\d(?:\.\d{6})?'  # str(datetime)
+_DT_MATCH = re.compile(_DT + r'\Z').match
+_LEVEL_FIELDS = ('level_str', 'level')
+
+
+def parse_dt(text, pattern=None):
+    """
+    :param text: str of a datetime rendered by a format
+    :param pattern: strftime pattern it was rendered with, None for str(datetime)
+    :return: datetime
+    :raises ValueError: if text does not match pattern
+    """
+    if pattern is None:  # Much faster than strptime
+        if not _DT_MATCH(text):
+            raise ValueError("{} is not a datetime".format(text))
+        return datetime(int(text[0:4]), int(text[5:7]), int(text[8:10]), int(text[11:13]),
+                        int(text[14:16]), int(text[17:19]), int(text[20:26] or 0))
+    return datetime.strptime(text, pattern)
+
+
+class Template(object):
+    """Parses the text a str.format template of event attributes rendered"""
+
+    def __init__(self, template):
+        """
+        :param template: str.format template with named fields and no
+            conversions, {dt} may have a strftime pattern as its spec
+        :raises ValueError: if the template has fields which cannot be parsed
+        """
+        self.template = template
+        self.dt_pattern = None
+        pattern = []
+        start = None
+        seen = set()
+        for literal, field, spec, conversion in Formatter().parse(template):
+            pattern.append(re.escape(literal))
+            if field is None:
+                continue
+            if not re.match(r'[A-Za-z_]\w*\Z', field) or conversion or (spec and field != 'dt'):
+                raise ValueError("Cannot parse template field {{{}}} of {}".format(field, template))
+            if field in seen:
+                pattern.append('(?P={})'.format(field))
+                continue
+            seen.add(field)
+            if field == 'info':
+                start = ''.join(pattern)  # Only the first line of info is known to be there
+                pattern.append(r'(?P<info>[\s\S]*?)')
+            elif field == 'dt' and not spec:
+                pattern.append('(?P<dt>{})'.format(_DT))
+            else:
+                if field == 'dt':
+                    self.dt_pattern = spec
+                pattern.append(r'(?P<{}>[^\n]*?)'.format(field))
+        self.fields = seen
+        self.pattern = re.compile(''.join(pattern) + r'\Z')
+        self.start = re.compile(''.join(pattern) + r'\Z' if start is None else start)
+
+    def starts(self, line):
+        """
+        :param line: str of a single line
+        :return: True if line is the first line of an entry
+        """
+        match = self.start.match(line)
+        if match is None:
+            return False
+        if self.dt_pattern is not None:  # Rules out lines which only look alike
+            try:
+                parse_dt(match.group('dt'), self.dt_pattern)
+            except ValueError:
+                return False
+        return True
+
+    def parse(self, text):
+        """
+        :param text: str of a whole entry without its final newline
+        :return: dict of field name to str, dt as a datetime, None if text does not match
+        """
+        match = self.pattern.match(text)
+        if match is None:
+            return None
+        fields = match.groupdict()
+        if 'dt' in fields:
+            try:
+                fields['dt'] = parse_dt(fields['dt'], self.dt_pattern)
+            except ValueError:
+                return None
+        return fields
+
+
+def templates_for(log_format, event=events.Event):
+    """
+    :param log_format: built-in format or str.format template a log was written with
+    :param event: Event class logged, a str formatter takes the place of log_format
+    :return: tuple of Templates for every way an entry may be written
+    :raises ValueError: if log_format cannot be parsed
+    """
+    if isinstance(event.formatter, str):
+        return (Template(event.formatter),)
+    if isinstance(log_format, str):
+        return (Template(log_format),)
+    try:
+        return tuple(Template(template) for template in FORMAT_TEMPLATES[log_format])
+    except (KeyError, TypeError):
+        raise ValueError("Cannot parse log_format {}, use a built-in format or a template".format(
+            log_format))
+
+
+class LogReader(object):
+    """Streams the entries of a text log, a buffer_size chunk at a time"""
+
+    def __init__(self, path, log_format=formats.standard, event=events.Event,
+                 encoding="utf-8", buffer_size=1 << 20):
+        """
+        :param path: str path of a text log
+        :param log_format: built-in format or str.format template the log was written with
+        :param event: Event class to construct, other template fields are set as attributes
+        :param encoding: str encoding of the log, newlines must be a single b'\\n'
+        :param buffer_size: bytes read from the file at a time
+        """
+        self.path = path
+        self.templates = templates_for(log_format, event)
+        self.event = event
+        self.encoding = encoding
+        self.buffer_size = buffer_size
+        self.skipped = 0  # Entries which began like an entry but did not parse
+        self._base_init = events.CompactEvent.__init__ if issubclass(event, events.CompactEvent) \
+            else events.Event.__init__
+        if len(self.templates) == 1:
+            self._starts = self.templates[0].starts
+
+    def _starts(self, line):
+        """:return: True if line is the first line of an entry"""
+        return any(template.starts(line) for template in self.templates)
+
+    def entries(self, offset=0, follow=False, interval=.1):
+        """Read the text of each entry with the byte offset it begins at
+
+        :param offset: byte offset of an entry to start reading from
+        :param follow: keep waiting for new entries at the end of the file,
+            starting over when the file is rotated or truncated
+        :param interval: seconds to wait for new data when following
+        :return: generator of (offset, text) with no final newline.
+            Lines before the first entry are skipped.
+        """
+        encoding = self.encoding
+        f = io.open(self.path, 'rb')
+        try:
+            f.seek(offset)
+            position = offset  # Of the next unread line
+            start = None  # Offset of the entry being gathered
+            lines = []
+            rest = b''
+            while True:
+                chunk = f.read(self.buffer_size)
+                if chunk:
+                    complete = (rest + chunk).split(b'\n')
+                    rest = complete.pop()
+                    for raw in complete:
+                        line = raw.decode(encoding)
+                        if self._starts(line):
+                            if lines:
+                                yield start, u'\n'.join(lines)
+                            start, lines = position, [line]
+                        elif lines:
+                            lines.append(line)
+                        position += len(raw) + 1
+                    continue
+
+                if not follow:
+                    break
+                if lines and not rest:  # Diary writes whole entries at once
+                    yield start, u'\n'.join(lines)
+                    lines = []
+                if self._replaced(f, position + len(rest)):
+                    f.close()
+                    f = io.open(self.path, 'rb')
+                    position, lines, rest = 0, [], b''
+                else:
+                    time.sleep(interval)
+
+            if rest:
+                line = rest.decode(encoding)
+                if self._starts(line):
+                    if lines:
+                        yield start, u'\n'.join(lines)
+                    start, lines = position, [line]
+                elif lines:
+                    lines.append(line)
+            if lines:
+                yield start, u'\n'.join(lines)
+        finally:
+            f.close()
+
+    def _replaced(self, f, read):
+        """:return: True if the file at path is no longer f or is shorter than read"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:  # Between the rename and the new file of a rotation
+            return False
+        return stat.st_ino != os.fstat(f.fileno()).st_ino or stat.st_size < read
+
+    def parse(self, text):
+        """
+        :param text: str of an entry
+        :return: event, None if text is not an entry
+        """
+        for template in self.templates:
+            fields = template.parse(text)
+            if fields is not None:
+                return self._make(fields)
+        return None
+
+    def _make(self, fields):
+        """:return: event built from parsed fields, other fields are set as attributes"""
+        level = None
+        for name in _LEVEL_FIELDS:
+            if name in fields:
+                level = levels.from_name(fields.pop(name))
+        made = self.event.__new__(self.event)  # Subclass constructors may take other arguments
+        self._base_init(made, fields.pop('info', u''), level, fields.pop('dt', None))
+        for name, value in fields.items():
+            setattr(made, name, value)
+        return made
+
+    def events(self, offset=0, follow=False, interval=.1):
+        """Read events (see entries)
+
+        :return: generator of events in the order they were written
+        """
+        for _, text in self.entries(offset, follow, interval):
+            event = self.parse(text)
+            if event is None:
+                self.skipped += 1
+            else:
+                yield event
+
+    def window(self, since=None, until=None):
+        """Read the events logged in a time range, starting from the
+        closest offset in the log's index (see index.py) instead of the
+        start of the log when it has one. Events are assumed to be logged
+        in time order.
+
+        :param since: datetime of the earliest event to read, None for the start
+        :param until: datetime events must be logged before, None for the end
+        :return: generator of events
+        """
+        before = None if since is None else self._before(since)
+        for _, text in self.entries(index.offset(self.path, since)):
+            if before is not None:
+                if before(text):  # Skipped without being parsed
+                    continue
+                before = None  # Every later entry is in the window
+            event = self.parse(text)
+            if event is None:
+                self.skipped += 1
+            elif until is not None and event.dt >= until:
+                return
+            else:
+                yield event
+
+    def _before(self, since):
+        """:return: function of an entry's text, True if it was logged before since"""
+        if since.tzinfo is None and all(template.dt_pattern is None and 'dt' in template.start.groupindex
+                                        for template in self.templates):
+            since_text = str(since)  # str(datetime) sorts like the datetime
+            matchers = [template.start.match for template in self.templates]
+
+            def before(text):
+                for match in matchers:
+                    found = match(text)
+                    if found is not None:
+                        return found.group('dt') < since_text
+                return False
+            return before
+
+        def before(text):
+            dt = self._dt(text)
+            return dt is not None and dt < since
+        return before
+
+    def _dt(self, text):
+        """:return: datetime of an entry read from its first line, None if it cannot be"""
+        for template in self.templates:
+            match = template.start.match(text)
+            if match is not None and match.groupdict().get('dt') is not None:
+                try:
+                    return parse_dt(match.group('dt'), template.dt_pattern)
+                except ValueError:
+                    pass
+        event = self.parse(text)
+        return None if event is None else event.dt
+
+    def __iter__(self):
+        return self.events()
+
+
+def read(path, log_format=formats.standard, event=events.Event, follow=False,
+         encoding="utf-8"):
+    """Read events from a text log
+
+    :param path: str path of a text log
+    :param log_format: built-in format or str.format template the log was written with
+    :param event: Event class to construct
+    :param follow: keep waiting for new events at the end of the file
+    :param encoding: str encoding of the log
+    :return: generator of events in the order they were written
+    """
+    return LogReader(path, log_format, event, encoding).events(follow=follow)
@@ -0,0 +1,251 @@
+"""
+Segments are preallocated, memory-mapped log files. SegmentWriter copies
+formatted text into the mapping instead of calling write, so a flush costs
+no system call and never changes the file's size; a full segment is sealed
+and the next one is started:
+    logger = Diary("app.log", sink=SegmentWriter)  # app.log.000000, app.log.000001, ...
+
+BinarySegmentWriter stores binary records (see binary.py) the same way.
+A SegmentReader tails the segments from another thread or process through
+its own read-only mapping without copying:
+    reader = SegmentReader("app.log")
+    for chunk in reader.follow():
+        ...
+
+Every segment begins with a HEADER_SIZE byte header holding SEGMENT_MAGIC,
+the offset committed data ends at and whether the segment is sealed.
+Data is committed after it is copied, so readers never see a partial flush.
+Pages reach the disk when the kernel writes them or the writer seals or
+closes a segment.
+"""
+
+from __future__ import absolute_import
+import mmap
+import os
+import struct
+import time
+
+from diary import binary
+from diary import events
+from diary.writers import LogWriter
+
+SEGMENT_MAGIC = b'DIARYSEG'
+SEGMENT_SIZE = 16 * 1024 ** 2
+HEADER = struct.Struct('<8sQQ')
+HEADER_SIZE = 64
+
+
+def segment_name(path, index):
+    """:return: str path of segment index of the log at path"""
+    return "{}.{:06d}".format(path, index)
+
+
+def segment_indexes(path):
+    """:return: sorted indexes of the existing segments of the log at path"""
+    head, tail = os.path.split(os.path.abspath(path))
+    prefix = tail + '.'
+    return sorted(int(name[len(prefix):]) for name in os.listdir(head)
+                  if name.startswith(prefix) and name[len(prefix):].isdigit())
+
+
+def _read_header(segment):
+    """:return: (committed offset, sealed) of a mapped segment"""
+    magic, committed, sealed = HEADER.unpack_from(segment, 0)
+    if magic != SEGMENT_MAGIC:
+        raise ValueError("Mapping is not a diary segment")
+    return committed, bool(sealed)
+
+
+def _view(segment, start, end):
+    """:return: segment[start:end] without copying where the python allows it"""
+    try:
+        return memoryview(segment)[start:end]
+    except TypeError:  # python 2 mmaps do not export buffers
+        return segment[start:end]
+
+
+class SegmentWriter(LogWriter):
+    """Writes formatted text into memory-mapped segments preallocated to segment_size"""
+
+    def __init__(self, path, encoding="utf-8", flush_policy=None, rotation=None,
+                 segment_size=SEGMENT_SIZE):
+        """
+        :param path: str path segments are named after
+        :param encoding: str type of encoding to use for writing
+        :param flush_policy: FlushPolicy deciding when text is copied into the mapping
+        :param rotation: unsupported, segments roll when they are full
+        :param segment_size: bytes preallocated for each segment
+        """
+        if rotation is not None:
+            raise ValueError("SegmentWriter rolls to a new segment when full and does not rotate")
+        if segment_size <= HEADER_SIZE:
+            raise ValueError("segment_size must be larger than the {} byte header".format(HEADER_SIZE))
+        self.segment_size = segment_size
+        self.segment = None
+        self.index = None
+        self.rolls = 0
+        LogWriter.__init__(self, path, encoding, flush_policy)
+
+    def _open(self):
+        """Continue the last unsealed segment or start a new one"""
+        indexes = segment_indexes(self.name)
+        if indexes:
+            self._map(indexes[-1])
+            committed, sealed = _read_header(self.segment)
+            if sealed:
+                self.segment.close()
+                self._map(indexes[-1] + 1, self.segment_size)
+            else:
+                self.size = committed
+        else:
+            self._map(0, self.segment_size)
+
+    def _map(self, index, size=None):
+        """Map segment index, creating and preallocating it if size is given.
+        New segments are prepared under a temporary name so readers never
+        map a segment without a header.
+
+        :param index: int segment index
+        :param size: bytes to preallocate for a new segment
+        """
+        name = segment_name(self.name, index)
+        path = name if size is None else name + '.tmp'
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if size is not None:
+                try:
+                    os.posix_fallocate(fd, 0, size)
+                except (AttributeError, OSError):  # Not every platform or file system
+                    os.ftruncate(fd, size)
+            self.segment = mmap.mmap(fd, 0)
+        finally:
+            os.close(fd)  # The mapping keeps the file open
+        self.index = index
+        if size is not None:
+            HEADER.pack_into(self.segment, 0, SEGMENT_MAGIC, HEADER_SIZE, 0)
+            os.rename(path, name)
+            self.size = HEADER_SIZE
+
+    def roll(self, minimum=0):
+        """Seal the current segment and start the next
+
+        :param minimum: bytes the new segment must hold
+        """
+        HEADER.pack_into(self.segment, 0, SEGMENT_MAGIC, self.size, 1)
+        self.segment.flush()
+        self.segment.close()
+        self._map(self.index + 1, max(self.segment_size, HEADER_SIZE + minimum))
+        self.rolls += 1
+
+    def _write(self, data):
+        """Copy encoded data into the mapping then commit it
+
+        :param data: bytes to write
+        """
+        end = self.size + len(data)
+        if end > len(self.segment):
+            self.roll(len(data))
+            end = self.size + len(data)
+        self.segment[self.size:end] = data
+        HEADER.pack_into(self.segment, 0, SEGMENT_MAGIC, end, 0)
+        self.size = end
+
+    def rotate(self):
+        """Segments are rolled with roll, not rotated"""
+        raise ValueError("SegmentWriter rolls to a new segment when full and does not rotate")
+
+    @property
+    def closed(self):
+        return self.segment is None
+
+    def close(self):
+        """Flush the buffer, write the mapping to disk and unmap it"""
+        if self.segment is not None:
+            self.flush()
+            self.segment.flush()
+            self.segment.close()
+            self.segment = None
+
+
+class BinarySegmentWriter(binary.BinaryWriter, SegmentWriter):
+    """Writes binary records into memory-mapped segments"""
+
+
+class SegmentReader(object):
+    """Reads the data committed to a log's segments as it is written"""
+
+    def __init__(self, path):
+        """
+        :param path: str path the segments are named after
+        """
+        self.path = path
+        self.index = None
+        self.position = HEADER_SIZE
+        self.segment = None
+
+    def _map(self, index):
+        """:return: True if segment index exists and is now mapped"""
+        try:
+            fd = os.open(segment_name(self.path, index), os.O_RDONLY)
+        except OSError:
+            return False
+        try:
+            self.segment = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+        finally:
+            os.close(fd)
+        self.index = index
+        self.position = HEADER_SIZE
+        return True
+
+    def read(self):
+        """
+        :return: memoryview of data committed since the last read, empty if
+            there is none. Data from two segments is returned by separate reads.
+        """
+        if self.segment is None:
+            indexes = segment_indexes(self.path)
+            if not indexes or not self._map(indexes[0]):
+                return memoryview(b'')
+
+        while True:
+            committed, sealed = _read_header(self.segment)
+            if self.position < committed:
+                start, self.position = self.position, committed
+                return _view(self.segment, start, committed)
+            if not sealed or not self._map(self.index + 1):
+                return memoryview(b'')
+            # Views of the sealed segment keep its mapping open until released
+
+    def follow(self, interval=.1):
+        """Read forever, waiting interval seconds whenever there is no new data
+
+        :return: generator of memoryviews of committed data
+        """
+        while True:
+            chunk = self.read()
+            if len(chunk):
+                yield chunk
+            else:
+                time.sleep(interval)
+
+    def events(self, event=events.Event):
+        """Read events committed since the last read from binary segments
+
+        :param event: Event class to construct
+        :return: list of events
+        """
+        logged = []
+        while True:
+            chunk = self.read()
+            if not len(chunk):
+                return logged
+            logged.extend(binary.build(binary.unpack(chunk), event))
+
+    def close(self):
+        """Unmap the current segment unless views of it are still held"""
+        if self.segment is not None:
+            try:
+                self.segment.close()
+            except BufferError:
+                pass
+            self.segment = None
@@ -0,0 +1,181 @@
+"""
+Runtime statistics of a Diary's writing, cheap enough to leave on:
+    logger = Diary("logs")
+    ...
+    logger.stats()  # {'events': 1200, 'latency': {'p99': 0.0021, ...}, ...}
+
+Timings are kept in Histograms of power of two buckets, so recording a
+value is a bit_length and a list increment and percentiles are accurate to
+within a factor of two. Events are counted by the batch; only the latency
+from each event being queued to its write is recorded per event.
+
+Snapshots can be saved to the database every interval seconds:
+    logger = Diary("logs", stats=Stats(interval=60))
+"""
+
+from __future__ import absolute_import
+from datetime import datetime
+from threading import Lock
+from timeit import default_timer
+
+# Histograms recorded by Stats, all but batch_size are in seconds
+HISTOGRAMS = ('latency', 'format', 'db', 'file', 'batch_size')
+
+
+class Histogram(object):
+    """Counts non-negative values in buckets bounded by powers of two"""
+
+    def __init__(self, scale=1):
+        """
+        :param scale: multiplier turning recorded ints into reported values,
+            1e-6 for ints of microseconds reported as seconds
+        """
+        self.scale = scale
+        self.buckets = []  # buckets[n] counts values with bit_length n, at most 2 ** n - 1
+        self.count = 0
+        self.total = 0
+        self.min = None
+        self.max = None
+
+    def add(self, value):
+        """
+        :param value: int to record, negative values are recorded as 0
+        """
+        self.add_many((value,))
+
+    def add_many(self, values):
+        """
+        :param values: sequence of ints to record, negative values are recorded as 0
+        """
+        if not values:
+            return
+        values = [value if value > 0 else 0 for value in map(int, values)]
+        buckets = self.buckets
+        for value in values:
+            bucket = value.bit_length()
+            try:
+                buckets[bucket] += 1
+            except IndexError:
+                buckets.extend([0] * (bucket + 1 - len(buckets)))
+                buckets[bucket] += 1
+        self.count += len(values)
+        self.total += sum(values)
+        low, high = min(values), max(values)
+        if self.min is None or low < self.min:
+            self.min = low
+        if self.max is None or high > self.max:
+            self.max = high
+
+    def percentile(self, fraction):
+        """
+        :param fraction: float between 0 and 1, .99 for the 99th percentile
+        :return: upper bound of the bucket holding the percentile, never more
+            than the largest value, None if nothing was recorded
+        """
+        if not self.count:
+            return None
+        rank = max(fraction * self.count, 1)
+        seen = 0
+        for bucket, count in enumerate(self.buckets):
+            seen += count
+            if seen >= rank:
+                return min((1 << bucket) - 1, self.max) * self.scale
+        return self.max * self.scale
+
+    def snapshot(self):
+        """
+        :return: dict of count, sum, min, max, mean, p50, p99 and p999, and
+            buckets as a list of [upper bound, count] of non-empty buckets
+        """
+        scale = self.scale
+        return {
+            'count': self.count,
+            'sum': self.total * scale,
+            'min': None if self.min is None else self.min * scale,
+            'max': None if self.max is None else self.max * scale,
+            'mean': self.total * scale / self.count if self.count else None,
+            'p50': self.percentile(.5),
+            'p99': self.percentile(.99),
+            'p999': self.percentile(.999),
+            'buckets': [[((1 << bucket) - 1) * scale, count]
+                        for bucket, count in enumerate(self.buckets) if count],
+        }
+
+
+class Stats(object):
+    """Counters and histograms of the batches a Diary writes"""
+
+    def __init__(self, interval=None):
+        """
+        :param interval: seconds between snapshots saved to the Diary's
+            database (see DiaryDB.log_stats), None saves none
+        """
+        self.interval = interval
+        self.events = 0
+        self.batches = 0
+        self.histograms = dict((name, Histogram(1 if name == 'batch_size' else 1e-6))
+                               for name in HISTOGRAMS)
+        self.started = datetime.now()
+        self._lock = Lock()
+        self._save_due = None if interval is None else default_timer() + interval
+
+    def record(self, events, written, timings):
+        """Record a batch once it is written
+
+        :param events: sequence of events in the batch
+        :param written: time.time() the batch began to be written
+        :param timings: dict of histogram name to seconds spent on the batch
+        """
+        histograms = self.histograms
+        latencies = _latencies(events, written)
+        with self._lock:
+            self.events += len(events)
+            self.batches += 1
+            histograms['batch_size'].add(len(events))
+            for name, seconds in timings.items():
+                histograms[name].add(seconds * 1000000)
+            histograms['latency'].add_many(latencies)
+
+    def snapshot(self, queue=None, log_file=None):
+        """
+        :param queue: queue events wait in to report the depth and drops of
+        :param log_file: writer of the log file to report the output of
+        :return: dict of counters and histogram snapshots, ready for json
+        """
+        with self._lock:
+            snapshot = dict((name, histogram.snapshot())
+                            for name, histogram in self.histograms.items())
+            snapshot.update(events=self.events, batches=self.batches,
+                            started=str(self.started),
+                            uptime=(datetime.now() - self.started).total_seconds())
+        snapshot['queue_depth'] = None if queue is None else queue.qsize()
+        snapshot['dropped'] = dict(getattr(queue, 'dropped', {}))
+        for name in ('bytes_written', 'flushes', 'rotations'):
+            snapshot[name] = getattr(log_file, name, None)
+        return snapshot
+
+    def timeout(self):
+        """:return: seconds until a snapshot is due to be saved, None if never"""
+        if self._save_due is None:
+            return None
+        return max(self._save_due - default_timer(), 0)
+
+    def save_due(self):
+        """:return: True if a snapshot should be saved, scheduling the next one"""
+        if self._save_due is None or default_timer() < self._save_due:
+            return False
+        self._save_due = default_timer() + self.interval
+        return True
+
+
+def _latencies(events, written):
+    """:return: list of microseconds each event waited from being queued until
+        written. Events are stamped by Diary._log rather than measured from dt,
+        which may be given; events which were not stamped are left out.
+    """
+    waited = []
+    for event in events:
+        queued = getattr(event, '_queued', None)
+        if queued is not None:
+            waited.append((written - queued) * 1000000)
+    return waited
@@ -0,0 +1,380 @@
+"""
+Writers buffer formatted events and hand them to a log file in bulk.
+A FlushPolicy decides when the buffer is written:
+    policy = FlushPolicy(max_bytes=64 * 1024, interval=1.0, level=levels.error)
+    logger = Diary("log.txt", flush_policy=policy)
+
+Passing index_every keeps a sparse index of entry times next to the
+log file so readers can seek to a time (see index.py).
+
+A RotationPolicy starts a new log file when the current one grows too large
+or a new day or hour begins; rotated files are compressed in the background:
+    rotation = RotationPolicy(max_bytes=100 * 1024 ** 2, keep=10, compress=GZIP)
+    logger = Diary("log.txt", rotation=rotation)
+"""
+
+from __future__ import absolute_import
+import gzip
+import os
+import shutil
+import time
+from threading import Thread
+from timeit import default_timer
+
+try:
+    from queue import Queue
+except ImportError:  # python 2
+    from Queue import Queue
+
+try:
+    import lzma
+except ImportError:  # python 2 or python built without lzma
+    lzma = None
+
+from diary import levels
+from diary.index import IndexWriter, index_path, SUFFIX as INDEX_SUFFIX
+
+DAILY = "daily"
+HOURLY = "hourly"
+GZIP = "gzip"
+LZMA = "lzma"
+
+_PERIODS = {DAILY: '%Y%m%d', HOURLY: '%Y%m%d%H'}
+_EXTENSIONS = {GZIP: '.gz', LZMA: '.xz'}
+
+
+class FlushPolicy(object):
+    """Conditions for a LogWriter to flush its buffer, any met condition flushes"""
+
+    def __init__(self, max_bytes=None, interval=None, max_events=None, level=None):
+        """
+        :param max_bytes: flush once this many encoded bytes are buffered
+        :param interval: flush once this many seconds pass since the last flush.
+            Only a DiaryThread checks while no events arrive; with async=False
+            the check is made on the next write, so text can wait until then
+            or until close
+        :param max_events: flush once this many events are buffered
+        :param level: flush immediately when an event at this level or more
+            severe is written
+        """
+        self.max_bytes = max_bytes
+        self.interval = interval
+        self.max_events = max_events
+        self.level = level
+        self.severity = None if level is None else levels.severity(level)
+
+    def due(self, writer, events=()):
+        """
+        :param writer: LogWriter holding the buffer
+        :param events: events that were just buffered
+        :return: True if writer should flush
+        """
+        if self.max_events is not None and writer.pending_events >= self.max_events:
+            return True
+        if self.max_bytes is not None and writer.pending_bytes >= self.max_bytes:
+            return True
+        if self.interval is not None and writer.since_flush() >= self.interval:
+            return True
+        if self.severity is not None:
+            for event in events:
+                if levels.severity(event.level) >= self.severity:
+                    return True
+        return False
+
+
+class RotationPolicy(object):
+    """Conditions for a LogWriter to start a new file, any met condition rotates"""
+
+    def __init__(self, max_bytes=None, when=None, keep=None, compress=None):
+        """
+        :param max_bytes: rotate before a file would grow past this many bytes
+        :param when: DAILY or HOURLY to rotate when a new day or hour begins
+        :param keep: most rotated files kept, the oldest are removed. None keeps all
+        :param compress: GZIP or LZMA to compress rotated files, None leaves them as is
+        """
+        if when is not None and when not in _PERIODS:
+            raise ValueError("Could not identify rotation period {}".format(when))
+        if compress is not None and compress not in _EXTENSIONS:
+            raise ValueError("Could not identify compression {}".format(compress))
+        if compress == LZMA and lzma is None:
+            raise ValueError("lzma compression requires the lzma module")
+        self.max_bytes = max_bytes
+        self.when = when
+        self.keep = keep
+        self.compress = compress
+
+    def period(self, timestamp):
+        """
+        :param timestamp: seconds since the epoch
+        :return: str naming the day or hour of timestamp, None if not rotating by time
+        """
+        if self.when is None:
+            return None
+        return time.strftime(_PERIODS[self.when], time.localtime(timestamp))
+
+    def due(self, writer, size):
+        """
+        :param writer: LogWriter about to write
+        :param size: bytes about to be written
+        :return: True if writer should rotate before writing
+        """
+        if self.max_bytes is not None and writer.size > len(writer.header) and \
+                writer.size + size > self.max_bytes:
+            return True
+        if self.when is not None and self.period(time.time()) != writer.period:
+            return True
+        return False
+
+
+class Archiver(Thread):
+    """Compresses rotated files and removes old ones away from the writer"""
+
+    def __init__(self, path, policy):
+        """
+        :param path: str path of the live log file
+        :param policy: RotationPolicy of the LogWriter
+        """
+        Thread.__init__(self, name="Diary Archiver")
+        self.path = path
+        self.policy = policy
+        self.queue = Queue()
+        self.daemon = True
+        self.start()
+
+    def add(self, rotated):
+        """Queue a rotated file to be compressed and old files to be removed
+
+        :param rotated: str path of the rotated file
+        """
+        self.queue.put(rotated)
+
+    def run(self):
+        while True:
+            rotated = self.queue.get()
+            if rotated is None:
+                break
+            if self.policy.compress is not None:
+                self.compress(rotated)
+            if self.policy.keep is not None:
+                self.prune()
+
+    def compress(self, rotated):
+        """Compress rotated into a new file then remove it
+
+        :param rotated: str path of the rotated file
+        """
+        opener = gzip.open if self.policy.compress == GZIP else lzma.open
+        target = rotated + _EXTENSIONS[self.policy.compress]
+        try:
+            with open(rotated, 'rb') as source:
+                with opener(target + '.tmp', 'wb') as dest:
+                    shutil.copyfileobj(source, dest)
+        except (IOError, OSError):  # Removed by prune before it was compressed
+            return
+        os.rename(target + '.tmp', target)
+        os.remove(rotated)
+        _remove_index(rotated)  # Offsets are meaningless once compressed
+
+    def rotated_files(self):
+        """:return: paths of rotated files, oldest first"""
+        head, tail = os.path.split(os.path.abspath(self.path))
+        prefix = tail + '.'
+        names = [name for name in os.listdir(head)
+                 if name.startswith(prefix) and name[len(prefix):len(prefix) + 1].isdigit()
+                 and not name.endswith(('.tmp', INDEX_SUFFIX))]
+        return [os.path.join(head, name) for name in sorted(names)]
+
+    def prune(self):
+        """Remove the oldest rotated files past policy.keep"""
+        rotated = self.rotated_files()
+        for path in rotated[:max(len(rotated) - self.policy.keep, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            _remove_index(path)
+
+    def join(self, timeout=None):
+        """Finish every queued file before stopping"""
+        if self.is_alive():
+            self.queue.put(None)
+        Thread.join(self, timeout)
+
+
+def _remove_index(path):
+    """Remove the index of the log at path if it has one"""
+    try:
+        os.remove(index_path(path))
+    except OSError:
+        pass
+
+
+class LogWriter(object):
+    """Buffered text log file which encodes and writes in bulk"""
+    text = True  # Diary formats events into text for this writer
+    header = b''  # Written at the start of every new file
+
+    def __init__(self, path, encoding="utf-8", flush_policy=None, rotation=None,
+                 index_every=None):
+        """
+        :param path: str path of the log file to append to
+        :param encoding: str type of encoding to use for writing
+        :param flush_policy: FlushPolicy, defaults to flushing after every write
+        :param rotation: RotationPolicy, None appends to a single file
+        :param index_every: bytes of log between records of an index.IndexWriter
+            sidecar, None keeps no index. A record is made at most once a flush.
+        """
+        self.name = path
+        self.encoding = encoding
+        self.policy = FlushPolicy(max_events=1) if flush_policy is None else flush_policy
+        self.rotation = rotation
+        if index_every is not None and not self.text:
+            raise ValueError("Only text logs can be indexed")
+        self.index_every = index_every
+        self.index = None
+        self.archiver = None
+        self.rotations = 0
+        self._first_dt = None  # Of the first event buffered since the last flush
+        self._open()
+        self.flushes = 0
+        self.bytes_written = 0
+        self.pending_events = 0
+        self.pending_bytes = 0
+        self._pending = []
+        self._last_flush = default_timer()
+
+    def write(self, text):
+        """Buffer text as a single event
+
+        :param text: unicode text to write
+        """
+        self.write_many((text,))
+
+    def write_many(self, texts, events=()):
+        """Buffer a group of formatted events and flush if the policy is met
+
+        :param texts: unicode texts to write, encoded as they are buffered
+            so max_bytes counts bytes rather than characters
+        :param events: events the texts were formatted from
+        """
+        if events and self._first_dt is None:
+            self._first_dt = events[0].dt
+        encoding = self.encoding
+        for text in texts:
+            data = text.encode(encoding)
+            self._pending.append(data)
+            self.pending_bytes += len(data)
+        self.pending_events += len(texts)
+        if self.policy.due(self, events):
+            self.flush()
+
+    def since_flush(self):
+        """:return: seconds since the buffer was last flushed"""
+        return default_timer() - self._last_flush
+
+    def timeout(self):
+        """:return: seconds until an interval flush is due or None if no flush is waiting"""
+        if self.policy.interval is None or not self._pending:
+            return None
+        return max(self.policy.interval - self.since_flush(), 0)
+
+    def poll(self):
+        """Flush if an interval flush is due"""
+        if self._pending and self.policy.due(self):
+            self.flush()
+
+    def flush(self):
+        """Write everything buffered in one call"""
+        self._last_flush = default_timer()
+        if not self._pending:
+            return
+        data = self._encode(self._pending)
+        self._pending = []
+        self.pending_events = 0
+        self.pending_bytes = 0
+        self._write(data)
+        self._first_dt = None
+        self.flushes += 1
+        self.bytes_written += len(data)
+
+    def _write(self, data):
+        """Write encoded data to the file, rotating first if it is due
+
+        :param data: bytes to write
+        """
+        if self.rotation is not None and self.rotation.due(self, len(data)):
+            self.rotate()
+        if self.index is not None and self._first_dt is not None:
+            self.index.add(self._first_dt, self.size)
+        self.file.write(data)
+        self.size += len(data)
+        self.file.flush()
+
+    def _encode(self, pending):
+        """
+        :param pending: list of buffered items
+        :return: bytes to write for pending
+        """
+        return b''.join(pending)
+
+    def _open(self):
+        """Open the log file and note its size and rotation period"""
+        self.file = open(self.name, 'ab')
+        self.file.seek(0, os.SEEK_END)
+        self.size = self.file.tell()
+        if self.size == 0 and self.header:
+            self.file.write(self.header)
+            self.file.flush()
+            self.size = len(self.header)
+        if self.index_every is not None:
+            self.index = IndexWriter(self.name, self.index_every)
+        if self.rotation is not None:
+            started = os.path.getmtime(self.name) if self.size else time.time()
+            self.period = self.rotation.period(started)
+
+    def rotate(self):
+        """Move the log file aside and start a new one, the rotated file is
+        compressed and old files are removed by a background Archiver.
+
+        :return: str path of the rotated file
+        """
+        self.file.close()
+        rotated = self._rotated_name()
+        os.rename(self.name, rotated)
+        if self.index is not None:
+            self.index.close()
+            os.rename(self.index.path, index_path(rotated))
+        self._open()
+        self.rotations += 1
+        if self.rotation.compress is not None or self.rotation.keep is not None:
+            if self.archiver is None:
+                self.archiver = Archiver(self.name, self.rotation)
+            self.archiver.add(rotated)
+        return rotated
+
+    def _rotated_name(self):
+        """:return: unused path for the file being rotated, sortable by age"""
+        now = time.time()
+        rotated = "{}.{}{:06d}".format(self.name, time.strftime('%Y%m%d-%H%M%S', time.localtime(now)),
+                                       int(now % 1 * 1000000))
+        suffixes = ('',) if self.rotation.compress is None else ('', _EXTENSIONS[self.rotation.compress])
+        count = 0
+        name = rotated
+        while any(os.path.exists(name + suffix) for suffix in suffixes):
+            count += 1
+            name = "{}-{}".format(rotated, count)
+        return name
+
+    @property
+    def closed(self):
+        return self.file.closed
+
+    def close(self):
+        """Flush the buffer, close the file and wait for compression to finish"""
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+        if self.index is not None:
+            self.index.close()
+        if self.archiver is not None:
+            self.archiver.join()
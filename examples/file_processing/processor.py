@@ -32,12 +32,12 @@ class FileProcessDB(DiaryDB):
             (inputDT TIMESTAMP, level TEXT, info TEXT, path TEXT, success INT)
                             ''')
 
-    def log(self, event):
-        with self.conn:
-            self.cursor.execute('''
-                INSERT INTO files(inputDT, level, info, path, success)
-                VALUES(?, ?, ?, ?, ?)''',
-                (event.dt, event.level_str, event.info, event.path, event.success))
+    insert_query = '''
+        INSERT INTO files(inputDT, level, info, path, success)
+        VALUES(?, ?, ?, ?, ?)'''
+
+    def values(self, event):
+        return event.dt, event.level_str, event.info, event.path, event.success
 
 logger = Diary("file_info", db_name="file_processes.db", db=FileProcessDB,
                file_name="file_processes.log")
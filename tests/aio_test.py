@@ -0,0 +1,150 @@
+from diary import DiaryDB, levels
+from diary.aio import AsyncDiary
+from diary.writers import FlushPolicy
+import asyncio
+import threading
+import unittest
+import sys
+import io
+import os
+
+
+class TestAsyncDiary(unittest.TestCase):
+    TEST_DIR_PATH = os.path.join(os.path.dirname(__file__),
+                                 'testing_dir', 'aio_testing')
+    INFO = "event was logged"
+
+    def setUp(self):
+        if not os.path.exists(self.TEST_DIR_PATH):
+            os.mkdir(self.TEST_DIR_PATH)
+        self.loop = asyncio.new_event_loop()
+
+    def tearDown(self):
+        self.loop.close()
+
+    def run_async(self, coroutine):
+        return self.loop.run_until_complete(coroutine)
+
+    def test_flush_and_close(self):
+        async def log_events():
+            logger = AsyncDiary(self.TEST_DIR_PATH, loop=self.loop, also_print=False,
+                                file_name="aio.log", db_name="aio.db")
+            for i in range(10):
+                logger.info("%s %s", self.INFO, i)
+            logger.warn(self.INFO)
+            await logger.flush()
+
+            with open(logger.log_file.name) as f:
+                self.assertEquals(len(f.readlines()), 11)
+            with DiaryDB(logger.db_file.name) as db:
+                db.assert_event_logged(self.INFO + " 9", "INFO")
+                db.assert_event_logged(self.INFO, "WARN")
+
+            logger.error(self.INFO, log_trace=False)
+            await logger.aclose()
+            return logger
+
+        logger = self.run_async(log_events())
+        self.assertTrue(logger.log_file.closed)
+        self.assertIs(logger.last_logged_event.level, levels.error)
+        with DiaryDB(logger.db_file.name) as db:
+            db.assert_event_logged(self.INFO, "ERROR")
+
+    def test_levels_semantics(self):
+        async def log_events():
+            logger = AsyncDiary(os.path.join(self.TEST_DIR_PATH, "levels.log"),
+                                loop=self.loop, also_print=False, min_level=levels.info)
+            logger.debug(self.INFO)
+            logger.info(self.INFO)
+            with self.assertRaises(ValueError):
+                logger.error(self.INFO, raises=True, e_type=ValueError)
+            await logger.aclose()
+            return logger
+
+        logger = self.run_async(log_events())
+        with open(logger.log_file.name) as f:
+            lines = f.readlines()
+        self.assertTrue(lines[0].startswith("[INFO]"))
+        self.assertTrue(lines[1].startswith("[ERROR]"))
+
+    def test_log_from_thread(self):
+        async def log_events():
+            logger = AsyncDiary(os.path.join(self.TEST_DIR_PATH, "thread.log"),
+                                loop=self.loop, also_print=False)
+            thread = threading.Thread(target=lambda: [logger.info(self.INFO) for _ in range(50)])
+            thread.start()
+            await self.loop.run_in_executor(None, thread.join)
+            await logger.aclose()
+            return logger
+
+        logger = self.run_async(log_events())
+        with open(logger.log_file.name) as f:
+            self.assertEquals(len(f.readlines()), 50)
+
+    def test_write_error(self):
+        async def log_events():
+            logger = AsyncDiary(os.path.join(self.TEST_DIR_PATH, "error.log"),
+                                loop=self.loop, also_print=False)
+            write_many = logger._write_many
+
+            def fail_once(events):
+                logger._write_many = write_many
+                raise IOError("disk is full")
+
+            logger._write_many = fail_once
+            logger.info("lost")
+            await logger.flush()
+            logger.info("written after")
+            await logger.flush()
+            await logger.aclose()
+            return logger
+
+        stderr = sys.stderr
+        sys.stderr = io.StringIO()
+        try:
+            logger = self.run_async(log_events())
+            reported = sys.stderr.getvalue()
+        finally:
+            sys.stderr = stderr
+
+        self.assertTrue("--- Diary error ---" in reported and "disk is full" in reported)
+        with open(logger.log_file.name) as f:
+            lines = f.readlines()
+        self.assertEquals(len(lines), 1)
+        self.assertTrue("written after" in lines[0])
+
+    def test_idle_interval_flush(self):
+        async def log_events():
+            logger = AsyncDiary(os.path.join(self.TEST_DIR_PATH, "idle.log"), loop=self.loop,
+                                also_print=False, flush_policy=FlushPolicy(interval=.05))
+            logger.info(self.INFO)
+            await asyncio.sleep(.3)
+            with open(logger.log_file.name) as f:
+                self.assertTrue(self.INFO in f.read())
+            await logger.aclose()
+
+        self.run_async(log_events())
+
+    def test_sync_close(self):
+        logger = AsyncDiary(os.path.join(self.TEST_DIR_PATH, "sync_close.log"),
+                            loop=self.loop, also_print=False)
+        logger.info(self.INFO)
+        logger.close()
+        logger.close()
+
+        with open(logger.log_file.name) as f:
+            self.assertTrue(self.INFO in f.readline())
+
+    def test_close_in_running_loop(self):
+        async def close():
+            logger = AsyncDiary(os.path.join(self.TEST_DIR_PATH, "running.log"),
+                                loop=self.loop, also_print=False)
+            with self.assertRaises(RuntimeError):
+                logger.close()
+            await logger.aclose()
+
+        self.run_async(close())
+
+
+if __name__ == '__main__':
+    unittest.main()
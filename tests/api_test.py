@@ -1,4 +1,4 @@
-from diary import Diary, DiaryDB, Event, levels, log_level, formats
+from diary import Diary, DiaryDB, Event, CompactEvent, levels, log_level, formats
 import unittest
 import shutil
 import os
@@ -96,6 +96,18 @@ class TestAPI(unittest.TestCase):
         with DiaryDB(logger.db_file.name) as db:
             db.assert_event_logged(self.INFO, "INFO")
 
+    def test_compact_event(self):
+        logger = Diary(self.API_DIR, file_name="compact.txt", db_name="compact.db",
+                       event=CompactEvent)
+        logger.warn(self.INFO)
+        logger.close()
+
+        with open(logger.log_file.name) as f:
+            self.assertEquals(f.readline(), formats.standard(logger.last_logged_event) + '\n')
+
+        with DiaryDB(logger.db_file.name) as db:
+            db.assert_event_logged(self.INFO, "WARN")
+
     def test_custom_db_formatted_event(self):
         logger = Diary(self.API_DIR, file_name="withdb.txt", db_name="user_events.db",
                        db=UserActivityDB, event=UserEvent)
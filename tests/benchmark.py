@@ -0,0 +1,248 @@
+"""
+Benchmarks Diary end to end: every scenario logs a number of events and
+closes the Diary, so asynchronous runs include draining the queue.
+Each scenario reports throughput and percentiles of two latencies:
+    call     seconds a log call blocks the logging thread
+    latency  seconds from a log call until the batch holding its event is written
+
+    python tests/benchmark.py                       # Every scenario
+    python tests/benchmark.py async_both threads    # Scenarios by name
+    python tests/benchmark.py --output results.json
+    python tests/benchmark.py --baseline results.json  # Exits 1 on regressions
+
+Results of a run can be saved with --output and used as the --baseline of
+later runs. A scenario regresses when its throughput falls or its p99
+latency rises by more than the tolerance. Latencies in multi-threaded
+scenarios pair events with log calls in the order they were queued, so
+they are off by however long concurrent calls took to queue.
+"""
+
+from __future__ import print_function
+import argparse
+import json
+import os
+import platform
+import shutil
+import sys
+from collections import deque
+from datetime import datetime
+from threading import Thread
+from timeit import default_timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from diary import Diary, Event, formats
+from diary.events import CompactEvent
+
+TEST_DIR = os.path.join(os.path.dirname(__file__), 'benchmark_dir')
+EVENTS = 20000
+REPEAT = 3
+PERCENTILES = (('p50', .5), ('p99', .99), ('p999', .999))
+
+
+class RequestEvent(Event):
+    """An Event subclass with a field of its own and a template formatter"""
+    formatter = "{dt}|{level_str}|{request_id}|{info}"
+    request_id = "req-1234"
+
+
+class MeasuredDiary(Diary):
+    """A Diary which times each event from its log call until it is written"""
+
+    def __init__(self, path, **kwargs):
+        self.created = deque()  # Times of log calls whose events are not written yet
+        self.latencies = []
+        Diary.__init__(self, path, **kwargs)
+
+    def _log(self, info, level, args=(), **kwargs):
+        self.created.append(default_timer())
+        Diary._log(self, info, level, args, **kwargs)
+
+    def _write_many(self, events):
+        Diary._write_many(self, events)
+        written = default_timer()
+        created = self.created
+        self.latencies.extend([written - created.popleft() for _ in events])
+
+
+# name: (path under the run's directory, Diary kwargs, producer threads, info)
+SCENARIOS = [
+    ('sync_file', ('log.txt', {'async': False}, 1, "event")),
+    ('sync_db', ('log.db', {'async': False}, 1, "event")),
+    ('sync_both', ('', {'async': False}, 1, "event")),
+    ('async_file', ('log.txt', {}, 1, "event")),
+    ('async_db', ('log.db', {}, 1, "event")),
+    ('async_both', ('', {}, 1, "event")),
+    ('format_minimal', ('log.txt', {'log_format': formats.minimal}, 1, "event")),
+    ('format_alarms', ('log.txt', {'log_format': formats.alarms}, 1, "event")),
+    ('format_easy_read', ('log.txt', {'log_format': formats.easy_read}, 1, "event")),
+    ('format_template', ('log.txt', {'log_format': "{level_str}|{dt}|{info}"}, 1, "event")),
+    ('compact_event', ('', {'event': CompactEvent}, 1, "event")),
+    ('custom_event', ('', {'event': RequestEvent}, 1, "event")),
+    ('threads', ('', {}, 8, "event")),
+    ('large_messages', ('', {}, 1, "event " * 1000)),
+]
+
+
+def percentiles(values):
+    """:return: dict of mean and PERCENTILES of values, None if there are none"""
+    if not values:
+        return None
+    values = sorted(values)
+    summary = dict((name, values[min(int(fraction * len(values)), len(values) - 1)])
+                   for name, fraction in PERCENTILES)
+    summary['mean'] = sum(values) / len(values)
+    summary['max'] = values[-1]
+    return summary
+
+
+def produce(log, messages, calls):
+    """Log messages, appending the seconds each call took to calls"""
+    for message in messages:
+        before = default_timer()
+        log(message)
+        calls.append(default_timer() - before)
+
+
+def run(scenario, events):
+    """Run a scenario once in a fresh directory
+
+    :param scenario: (path, kwargs, producers, info) of SCENARIOS
+    :param events: number of events to log
+    :return: (seconds, list of call seconds, list of latencies)
+    """
+    path, kwargs, producers, info = scenario
+    shutil.rmtree(TEST_DIR, ignore_errors=True)
+    os.mkdir(TEST_DIR)
+    kwargs = dict(kwargs, also_print=False)
+    logger = MeasuredDiary(os.path.join(TEST_DIR, path), **kwargs)
+    share = events // producers
+    calls = [[] for _ in range(producers)]
+    threads = [Thread(target=produce, args=(logger.info, [info] * share, calls[i]))
+               for i in range(producers)]
+
+    start = default_timer()
+    if producers == 1:
+        produce(logger.info, [info] * share, calls[0])
+    else:
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    logger.close()
+    seconds = default_timer() - start
+    return seconds, [call for thread_calls in calls for call in thread_calls], logger.latencies
+
+
+def measure(name, events=EVENTS, repeat=REPEAT):
+    """Run a scenario repeat times
+
+    :return: dict of events, median seconds, throughput and the percentiles
+        of every call and latency of every run
+    """
+    scenario = dict(SCENARIOS)[name]
+    times, calls, latencies = [], [], []
+    for _ in range(repeat):
+        seconds, run_calls, run_latencies = run(scenario, events)
+        times.append(seconds)
+        calls.extend(run_calls)
+        latencies.extend(run_latencies)
+    logged = events // scenario[2] * scenario[2]
+    seconds = sorted(times)[len(times) // 2]
+    return {
+        'events': logged,
+        'seconds': seconds,
+        'throughput': logged / seconds,
+        'call': percentiles(calls),
+        'latency': percentiles(latencies),
+    }
+
+
+def compare(results, baseline, tolerance=.1, latency_tolerance=.5):
+    """
+    :param results: dict of scenario name to measure results
+    :param baseline: dict of scenario name to measure results of an earlier run
+    :param tolerance: fraction throughput may fall by
+    :param latency_tolerance: fraction p99 latency may rise by
+    :return: list of str describing each regression
+    """
+    regressions = []
+    for name, result in sorted(results.items()):
+        before = baseline.get(name)
+        if before is None:
+            continue
+        change = result['throughput'] / before['throughput'] - 1
+        if change < -tolerance:
+            regressions.append("{}: throughput {:.0f}/s is {:.0%} below {:.0f}/s".format(
+                name, result['throughput'], -change, before['throughput']))
+        if result['latency'] and before.get('latency'):
+            change = result['latency']['p99'] / before['latency']['p99'] - 1
+            if change > latency_tolerance:
+                regressions.append("{}: p99 latency {:.6f}s is {:.0%} above {:.6f}s".format(
+                    name, result['latency']['p99'], change, before['latency']['p99']))
+    return regressions
+
+
+def report(name, result):
+    """Print a line of a scenario's results"""
+    line = "{:<18} {:>10.0f} events/s".format(name, result['throughput'])
+    for kind in ('call', 'latency'):
+        summary = result[kind]
+        line += "  {} p50 {:.1e} p99 {:.1e} p999 {:.1e}".format(
+            kind, summary['p50'], summary['p99'], summary['p999'])
+    print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Diary end to end")
+    parser.add_argument('scenarios', nargs='*', metavar='scenario',
+                        help="scenarios to run, all by default: " + ", ".join(
+                            name for name, _ in SCENARIOS))
+    parser.add_argument('--events', type=int, default=EVENTS, help="events logged per run")
+    parser.add_argument('--repeat', type=int, default=REPEAT, help="runs of each scenario")
+    parser.add_argument('--output', help="path to write json results to")
+    parser.add_argument('--baseline', help="path of json results to compare against")
+    parser.add_argument('--tolerance', type=float, default=.1,
+                        help="fraction throughput may fall by before it is a regression")
+    parser.add_argument('--latency-tolerance', type=float, default=.5,
+                        help="fraction p99 latency may rise by before it is a regression")
+    args = parser.parse_args(argv)
+
+    names = args.scenarios or [name for name, _ in SCENARIOS]
+    unknown = set(names) - set(dict(SCENARIOS))
+    if unknown:
+        parser.error("unknown scenarios: " + ", ".join(sorted(unknown)))
+
+    results = {}
+    try:
+        for name in names:
+            results[name] = measure(name, args.events, args.repeat)
+            report(name, results[name])
+    finally:
+        shutil.rmtree(TEST_DIR, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'date': str(datetime.now()),
+                'python': platform.python_version(),
+                'platform': platform.platform(),
+                'events': args.events,
+                'repeat': args.repeat,
+                'results': results,
+            }, f, indent=2, sort_keys=True)
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        regressions = compare(results, baseline, args.tolerance, args.latency_tolerance)
+        for regression in regressions:
+            print("REGRESSION " + regression)
+        if regressions:
+            return 1
+        print("No regressions against {}".format(args.baseline))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+from diary import Diary, Event, CompactEvent, levels, formats
+from diary.binary import BinaryWriter, MAGIC, read, records, convert
+from diary.writers import RotationPolicy
+from datetime import datetime
+import unittest
+import shutil
+import os
+
+
+class UserEvent(Event):
+    formatter = "{info}|{user_name}"
+
+    def __init__(self, info, user_name, level=None):
+        Event.__init__(self, info, level)
+        self.user_name = user_name
+
+
+class TestBinary(unittest.TestCase):
+    TEST_DIR_PATH = os.path.join(os.path.dirname(__file__),
+                                 'testing_dir', 'binary')
+    LOG_PATH = os.path.join(TEST_DIR_PATH, 'log.bin')
+    INFO = u"event was logged"
+
+    def setUp(self):
+        os.mkdir(self.TEST_DIR_PATH)
+
+    def tearDown(self):
+        shutil.rmtree(self.TEST_DIR_PATH)
+
+    def write(self, *events):
+        writer = BinaryWriter(self.LOG_PATH)
+        writer.write_many((), events)
+        writer.close()
+
+    def test_round_trip(self):
+        dt = datetime(2016, 7, 4, 12, 30, 15, 123456)
+        self.write(Event(self.INFO, levels.warn, dt), Event(u"ürgent", levels.error))
+
+        logged = list(read(self.LOG_PATH))
+        self.assertEquals(len(logged), 2)
+        self.assertEquals(logged[0].info, self.INFO)
+        self.assertIs(logged[0].level, levels.warn)
+        self.assertEquals(logged[0].level_str, "WARN")
+        self.assertEquals(logged[0].dt, dt)
+        self.assertEquals(logged[1].info, u"ürgent")
+        self.assertIs(logged[1].level, levels.error)
+
+    def test_compact_event(self):
+        event = CompactEvent(self.INFO, levels.info)
+        self.write(event)
+        logged = next(read(self.LOG_PATH, CompactEvent))
+        self.assertTrue(isinstance(logged, CompactEvent))
+        self.assertEquals(logged.dt, event.dt)
+        self.assertEquals(logged.info, self.INFO)
+
+    def test_extra_fields(self):
+        self.write(UserEvent(self.INFO, "admin", levels.info))
+        logged = next(read(self.LOG_PATH, UserEvent))
+        self.assertEquals(logged.user_name, "admin")
+        self.assertEquals(logged.formatted(), self.INFO + "|admin")
+
+    def test_custom_level(self):
+        self.write(Event(self.INFO, "AUDIT"))
+        logged = next(read(self.LOG_PATH))
+        self.assertEquals(logged.level, "AUDIT")
+        self.assertEquals(logged.level_str, "AUDIT")
+        self.assertFalse(hasattr(logged, '_level'))
+
+    def test_records(self):
+        self.write(Event(self.INFO, levels.debug))
+        us, code, info, extra = next(records(self.LOG_PATH))
+        self.assertEquals(code, levels.severity(levels.debug))
+        self.assertEquals(info, self.INFO.encode('utf-8'))
+        self.assertEquals(extra, b'')
+
+    def test_small_buffer(self):
+        self.write(*[Event(self.INFO * i, levels.info) for i in range(20)])
+        logged = list(read(self.LOG_PATH, buffer_size=7))
+        self.assertEquals([event.info for event in logged], [self.INFO * i for i in range(20)])
+
+    def test_not_binary(self):
+        with open(self.LOG_PATH, 'w') as f:
+            f.write("[INFO]")
+        with self.assertRaises(ValueError):
+            list(read(self.LOG_PATH))
+
+    def test_partial_record(self):
+        self.write(Event(self.INFO, levels.info))
+        with open(self.LOG_PATH, 'ab') as f:
+            f.write(b'\x40\x00')
+        reader = read(self.LOG_PATH)
+        self.assertEquals(next(reader).info, self.INFO)
+        with self.assertRaises(ValueError):
+            next(reader)
+
+    def test_convert(self):
+        events = [Event(self.INFO, levels.info), Event(self.INFO, levels.error)]
+        self.write(*events)
+        text_path = os.path.join(self.TEST_DIR_PATH, 'log.txt')
+
+        self.assertEquals(convert(self.LOG_PATH, text_path, formats.minimal), 2)
+        with open(text_path) as f:
+            self.assertEquals(f.read(), u''.join(formats.minimal(event) + u'\n'
+                                                 for event in events))
+
+    def test_diary_sink(self):
+        log = Diary(self.LOG_PATH, async=False, also_print=False, sink=BinaryWriter)
+        log.info(self.INFO)
+        log.close()
+        log = Diary(self.LOG_PATH, async=False, also_print=False, sink=BinaryWriter)
+        log.warn("%s %d", self.INFO, 2)
+        log.close()
+
+        logged = list(read(self.LOG_PATH))
+        self.assertEquals([event.info for event in logged], [self.INFO, self.INFO + " 2"])
+        self.assertIs(logged[1].level, levels.warn)
+
+    def test_rotation(self):
+        writer = BinaryWriter(self.LOG_PATH, rotation=RotationPolicy(max_bytes=len(MAGIC) + 1))
+        writer.write_many((), [Event(self.INFO, levels.info)])
+        writer.write_many((), [Event(self.INFO, levels.info)])
+        writer.close()
+
+        self.assertEquals(writer.rotations, 1)
+        for name in os.listdir(self.TEST_DIR_PATH):
+            logged = list(read(os.path.join(self.TEST_DIR_PATH, name)))
+            self.assertEquals(len(logged), 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
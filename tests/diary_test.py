@@ -1,7 +1,8 @@
-from diary import Diary, DiaryDB, Event, levels
+from diary import Diary, DiaryDB, Event, levels, writers
 import unittest
 import codecs
 import sys
+import threading
 import io
 import os
 
@@ -200,6 +201,105 @@ class TestDiary(unittest.TestCase):
         log.logdb.assert_event_logged(self.INFO, "DEBUG", 1)
         log.close()
 
+    def test_debug_disabled(self):
+        log = Diary(self.INIT_DIR, file_name="no_debug.log", async=False, debug_enabled=False)
+        log.debug(self.INFO)
+        self.assertIsNone(log.last_logged_event)
+
+        log.debug_enabled = True
+        log.debug(self.INFO)
+        self.assertIs(log.last_logged_event.level, levels.debug)
+        log.close()
+
+    def test_min_level(self):
+        log = Diary(self.INIT_DIR, file_name="min_level.log", async=False,
+                    min_level=levels.warn)
+        log.debug(self.INFO)
+        log.info(self.INFO)
+        log.log(self.INFO)
+        self.assertIsNone(log.last_logged_event)
+        self.assertFalse(log.enabled_for(levels.info))
+
+        log.warn(self.INFO)
+        self.assertIs(log.last_logged_event.level, levels.warn)
+        log.log(self.INFO, level=levels.error, log_trace=False)
+        self.assertIs(log.last_logged_event.level, levels.error)
+
+        log.set_min_level(levels.info)
+        log.info(self.INFO)
+        self.assertIs(log.last_logged_event.level, levels.info)
+
+        log.set_min_level(None)
+        log.debug(self.INFO)
+        self.assertIs(log.last_logged_event.level, levels.debug)
+        log.close()
+
+        with open(log.log_file.name) as f:
+            self.assertEquals(len(f.readlines()), 4)
+
+    def test_lazy_args(self):
+        class Recorder(object):
+            threads = []
+
+            def __repr__(self):
+                self.threads.append(threading.current_thread())
+                return "<recorder>"
+
+        log = Diary(self.INIT_DIR, file_name="lazy.log", db_name="lazy.db")
+        log.info("processed %s rows from %r", 10, Recorder())
+        log.debug(lambda: "computed later")
+        log.close()
+
+        self.assertEquals(Recorder.threads, [log.thread])
+        with DiaryDB(log.db_file.name) as db:
+            db.assert_event_logged("processed 10 rows from <recorder>", "INFO")
+            db.assert_event_logged("computed later", "DEBUG")
+
+    def test_bad_args(self):
+        log = Diary(self.INIT_DIR, file_name="bad_args.log", db_name="bad_args.db",
+                    also_print=False)
+        stderr = sys.stderr
+        sys.stderr = io.StringIO() if not _PY2 else io.BytesIO()
+        try:
+            log.info("%d items", "x")
+            log.info("logged after")
+            log.close()
+            reported = sys.stderr.getvalue()
+        finally:
+            sys.stderr = stderr
+
+        self.assertTrue("--- Diary error ---" in reported and "TypeError" in reported)
+        with DiaryDB(log.db_file.name) as db:
+            db.assert_event_logged("%d items ('x',)", "INFO")
+            db.assert_event_logged("logged after", "INFO")
+
+    def test_format_error_keeps_row(self):
+        def bad_format(event):
+            raise ValueError("cannot format")
+
+        log = Diary(self.INIT_DIR, file_name="bad_format.log", db_name="bad_format.db",
+                    async=False, also_print=False, log_format=bad_format)
+        with self.assertRaises(ValueError):
+            log.info("still in the database")
+        log.logdb.assert_event_logged("still in the database", "INFO")
+        log.close()
+
+    def test_log_args(self):
+        log = Diary(self.INIT_DIR, file_name="log_args.log", async=False, also_print=False)
+        log.log("%s and %s", levels.warn, "this", "that")
+        self.assertEquals(log.last_logged_event.info, "this and that")
+        with self.assertRaises(TypeError):
+            log.log("%s", "no level")
+        log.close()
+
+    def test_lazy_args_disabled(self):
+        log = Diary(self.INIT_DIR, file_name="lazy_disabled.log", async=False,
+                    min_level=levels.info)
+        log.debug(lambda: self.fail("disabled debug was evaluated"))
+        log.error("failed %s", "lazily", log_trace=False)
+        self.assertEquals(log.last_logged_event.info, "failed lazily")
+        log.close()
+
     def test_set_db_exc(self):
         log = Diary(self.TXT_PATH)
         self.assertIsNone(log.db_file)
@@ -331,6 +431,20 @@ class TestDiary(unittest.TestCase):
         with self.assertRaises(ValueError, msg="diary does not support logging unicode strings into a database in python2"):
             log.log(unicode_str)
 
+    def test_flush_policy(self):
+        log = Diary(self.INIT_DIR, file_name="flushing.log", async=False,
+                    flush_policy=writers.FlushPolicy(max_events=2, level=levels.error))
+        log.info(self.INFO)
+        self.assertEquals(log.log_file.flushes, 0)
+        log.error(self.INFO, log_trace=False)
+        self.assertEquals(log.log_file.flushes, 1)
+        log.info(self.INFO)
+        log.close()
+        self.assertEquals(log.log_file.flushes, 2)
+
+        with open(log.log_file.name) as f:
+            self.assertEquals(len(f.readlines()), 3)
+
     def test_diary_print(self):
         log = Diary(self.INIT_DIR, file_name="printing.log", also_print=True)
 
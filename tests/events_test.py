@@ -1,6 +1,6 @@
 import unittest
 import datetime as dt
-from diary import Event
+from diary import BaseEvent, Event, CompactEvent, levels
 
 DEFAULT_FORMATTER = "({level})({info})"
 
@@ -137,6 +137,34 @@ class TestEvent(unittest.TestCase):
                                                                  level=self.LEVEL))
         self.assertEquals(first_format, second_format)
 
+    def test_render_args(self):
+        event = Event("processed %s rows from %r", self.LEVEL)
+        event.args = (10, "table")
+        self.assertEquals(event.info, "processed %s rows from %r")
+        event.render()
+        self.assertEquals(event.info, "processed 10 rows from 'table'")
+        event.render()
+        self.assertEquals(event.info, "processed 10 rows from 'table'")
+
+    def test_render_callable(self):
+        calls = []
+
+        def expensive():
+            calls.append(1)
+            return self.INFO
+
+        event = Event(expensive, self.LEVEL)
+        self.assertEquals(calls, [])
+        event.render()
+        event.render()
+        self.assertEquals(event.info, self.INFO)
+        self.assertEquals(calls, [1])
+
+    def test_render_plain(self):
+        event = Event("100%", self.LEVEL)
+        event.render()
+        self.assertEquals(event.info, "100%")
+
     def test_set_level(self):
         mock_level = lambda: None
         event_to_change = Event(self.INFO, mock_level)
@@ -150,5 +178,56 @@ class TestEvent(unittest.TestCase):
 
 
 
+class TestCompactEvent(unittest.TestCase):
+    INFO = "something was logged"
+
+    def test_slots(self):
+        event = CompactEvent(self.INFO, levels.info)
+        event.render()
+        event.set_level(levels.warn)
+        self.assertFalse(hasattr(event, '__dict__'))  # Everything is held in slots
+        self.assertIsInstance(event, BaseEvent)
+        self.assertNotIsInstance(event, Event)
+        self.assertEquals(event.args, ())
+
+    def test_deferred_rendering(self):
+        event = CompactEvent(self.INFO, levels.warn)
+        self.assertIsNone(event._dt)
+        self.assertIsNone(event._level_str)
+        self.assertEquals(event.level_str, "WARN")
+        self.assertEquals(event.dt, dt.datetime.fromtimestamp(event.timestamp))
+        self.assertIs(event.dt, event.dt)
+
+        event.set_level(levels.error)
+        self.assertEquals(event.level_str, "ERROR")
+
+    def test_given_dt(self):
+        given_dt = dt.datetime(1901, 2, 3, 4, 5, 6)
+        event = CompactEvent(self.INFO, levels.info, given_dt)
+        self.assertIs(event.dt, given_dt)
+        self.assertIsNone(event.timestamp)
+
+    def test_str_formatter(self):
+        class SlottedUserEvent(CompactEvent):
+            __slots__ = ('user_name',)
+            formatter = "{level_str}|{info}|{user_name}|{dt:%Y}"
+
+            def __init__(self, info, level=None, user_name=""):
+                CompactEvent.__init__(self, info, level)
+                self.user_name = user_name
+
+        event = SlottedUserEvent(self.INFO, levels.info, user_name="admin")
+        self.assertEquals(event.formatted(), "INFO|{}|admin|{}".format(
+            self.INFO, event.dt.year))
+
+    def test_str_formatter_unslotted_subclass(self):
+        class UserEvent(CompactEvent):
+            formatter = "{info}|{user_name}"
+
+        event = UserEvent(self.INFO, levels.info)
+        event.user_name = "admin"
+        self.assertEquals(event.formatted(), self.INFO + "|admin")
+
+
 if __name__ == '__main__':
     unittest.main()
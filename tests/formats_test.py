@@ -1,4 +1,4 @@
-from diary import Event, formats
+from diary import Event, CompactEvent, formats, levels
 import datetime as dt
 import unittest
 
@@ -37,6 +37,95 @@ class TestFormat(unittest.TestCase):
         self.assertEquals(output,
                           "|CRITICAL| On 02/03/01 @ 04:05.06AM | event is logged")
 
+    def test_compile_builtins(self):
+        events = [self.SIMPLE_EVENT, Event(self.INFO, levels.error, self.TIMESTAMP),
+                  Event("  padded\n", levels.warn), CompactEvent(self.INFO, levels.debug)]
+        for log_format in (formats.standard, formats.minimal, formats.alarms, formats.easy_read):
+            compiled = formats.compile_format(log_format)
+            self.assertIsNot(compiled, log_format)
+            for event in events:
+                self.assertEquals(compiled(event), log_format(event))
+
+    def test_compile_custom_function(self):
+        custom = lambda event: event.info
+        self.assertIs(formats.compile_format(custom), custom)
+
+    def test_compile_template(self):
+        compiled = formats.compile_format("{{{level_str}}} {info!r:>20} {dt.year} {info}")
+        self.assertEquals(compiled(self.SIMPLE_EVENT),
+                          "{{{level_str}}} {info!r:>20} {dt.year} {info}".format(
+                              **self.SIMPLE_EVENT.__dict__))
+
+    def test_compile_template_single_field(self):
+        compiled = formats.compile_template("[{dt:%Y}]")
+        self.assertEquals(compiled(self.SIMPLE_EVENT), "[1901]")
+        self.assertEquals(formats.compile_template("{{}}")(self.SIMPLE_EVENT), "{}")
+
+    def test_compile_template_missing_field(self):
+        compiled = formats.compile_template("{info}|{user_name}")
+        with self.assertRaises(AttributeError):
+            compiled(self.SIMPLE_EVENT)
+
+    def test_timestamp_cache(self):
+        cache = formats.TimestampCache()
+        for microsecond in (0, 1, 999999, 0):
+            timestamp = self.TIMESTAMP.replace(microsecond=microsecond)
+            self.assertEquals(cache(timestamp), str(timestamp))
+        later = self.TIMESTAMP.replace(second=7, microsecond=10)
+        self.assertEquals(cache(later), str(later))
+
+    def test_timestamp_cache_pattern(self):
+        pattern = "%x @ %I:%M.%S%p"
+        cache = formats.TimestampCache(pattern)
+        for timestamp in (self.TIMESTAMP, self.TIMESTAMP.replace(microsecond=5),
+                          self.TIMESTAMP.replace(hour=20)):
+            self.assertEquals(cache(timestamp), timestamp.strftime(pattern))
+
+    def test_timestamp_cache_uncacheable(self):
+        cache = formats.TimestampCache("%S.%f")
+        self.assertFalse(cache.cacheable)
+        self.assertEquals(cache(self.TIMESTAMP.replace(microsecond=5)), "06.000005")
+        self.assertEquals(cache(self.TIMESTAMP.replace(microsecond=6)), "06.000006")
+
+    def test_timestamp_cache_other_objects(self):
+        day = self.TIMESTAMP.date()
+        self.assertEquals(formats.TimestampCache()(day), str(day))
+        self.assertEquals(formats.TimestampCache("%Y")(day), "1901")
+        compiled = formats.compile_template("{dt}|{dt:%Y}")
+        event = Event(self.INFO, self.LEVEL, day)
+        self.assertEquals(compiled(event), "{dt}|{dt:%Y}".format(dt=day))
+
+    def test_render_time(self):
+        self.assertEquals(formats.render_time(self.TIMESTAMP), str(self.TIMESTAMP))
+        self.assertEquals(formats.render_time(self.TIMESTAMP, "%x"), "02/03/01")
+
+    def test_compile_template_dt(self):
+        compiled = formats.compile_template("{dt}|{dt:%X}|{info}|{dt.year}")
+        event = Event(self.INFO, self.LEVEL, self.TIMESTAMP.replace(microsecond=7))
+        self.assertEquals(compiled(event), "{dt}|{dt:%X}|{info}|{dt.year}".format(
+            **event.__dict__))
+
+    def test_level_name(self):
+        self.assertEquals(formats.level_name(levels.warn), "WARN")
+        self.assertEquals(formats.level_name(levels.warn), "WARN")
+        self.assertEquals(formats.level_name(self.LEVEL), self.LEVEL)
+        self.assertEquals(formats.level_name([]), "[]")
+        self.assertEquals(formats.level_name(1), "1")
+        self.assertEquals(formats.level_name(True), "True")  # Equal to 1 but named differently
+        self.assertEquals(formats.level_name(levels.warn), "WARN")
+
+        class Changing(object):
+            name = "before"
+
+            def __str__(self):
+                return self.name
+
+        level = Changing()
+        self.assertEquals(formats.level_name(level), "before")
+        level.name = "after"
+        self.assertEquals(formats.level_name(level), "after")
+        self.assertFalse(level in formats._level_names)
+
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,107 @@
+from diary import Diary, Event, levels, formats
+from diary.binary import BinaryWriter
+from diary.index import Index, index_path, rebuild, offset
+from diary.reader import LogReader
+from diary.writers import LogWriter, RotationPolicy
+from datetime import datetime, timedelta
+from functools import partial
+import unittest
+import shutil
+import io
+import os
+
+
+class TestIndex(unittest.TestCase):
+    TEST_DIR_PATH = os.path.join(os.path.dirname(__file__),
+                                 'testing_dir', 'index')
+    LOG_PATH = os.path.join(TEST_DIR_PATH, 'log.txt')
+    START = datetime(2016, 7, 4, 14)
+
+    def setUp(self):
+        os.mkdir(self.TEST_DIR_PATH)
+        self.events = [Event("event {}".format(i), levels.info, self.START + timedelta(minutes=i))
+                       for i in range(100)]
+
+    def tearDown(self):
+        shutil.rmtree(self.TEST_DIR_PATH)
+
+    def write(self, every=200, log_format=formats.standard):
+        writer = LogWriter(self.LOG_PATH, index_every=every)
+        log_format = formats.compile_format(log_format)
+        for event in self.events:
+            writer.write_many([log_format(event) + u'\n'], [event])
+        writer.close()
+        return writer
+
+    def test_records(self):
+        writer = self.write()
+        index = Index(self.LOG_PATH)
+        self.assertEquals(len(index), writer.index.records)
+        self.assertTrue(10 < len(index) < 100)
+        self.assertEquals(index.offsets, sorted(index.offsets))
+        self.assertEquals(index.keys, sorted(index.keys))
+        with io.open(self.LOG_PATH, 'rb') as f:
+            for position in index.offsets:
+                f.seek(position)
+                self.assertTrue(f.readline().startswith(b'[INFO]'))
+
+    def test_window(self):
+        self.write()
+        since = self.START + timedelta(minutes=50)
+        self.assertTrue(0 < offset(self.LOG_PATH, since) < os.path.getsize(self.LOG_PATH))
+        self.assertEquals(offset(self.LOG_PATH, self.START), 0)
+
+        found = list(LogReader(self.LOG_PATH).window(since, since + timedelta(minutes=3)))
+        self.assertEquals([event.info for event in found], ["event 50", "event 51", "event 52"])
+        self.assertEquals(len(list(LogReader(self.LOG_PATH).window(until=since))), 50)
+
+        os.remove(index_path(self.LOG_PATH))  # Scans from the start without an index
+        self.assertEquals(offset(self.LOG_PATH, since), 0)
+        self.assertEquals(len(list(LogReader(self.LOG_PATH).window(since))), 50)
+
+    def test_window_strftime(self):
+        self.write(log_format=formats.minimal)
+        since = self.START + timedelta(minutes=50)
+        reader = LogReader(self.LOG_PATH, formats.minimal)
+        found = list(reader.window(since, since + timedelta(minutes=2)))
+        self.assertEquals([event.info for event in found], ["event 50", "event 51"])
+
+    def test_reopen(self):
+        self.write()
+        records = len(Index(self.LOG_PATH))
+        writer = self.write()  # Continues from the last record
+        index = Index(self.LOG_PATH)
+        self.assertEquals(len(index), records + writer.index.records)
+        self.assertTrue(index.offsets[records] - index.offsets[records - 1] >= 200)
+
+    def test_rebuild(self):
+        self.write()
+        written = Index(self.LOG_PATH)
+        os.remove(index_path(self.LOG_PATH))
+        self.assertEquals(rebuild(self.LOG_PATH, every=200), len(written))
+        rebuilt = Index(self.LOG_PATH)
+        self.assertEquals((rebuilt.keys, rebuilt.offsets), (written.keys, written.offsets))
+
+    def test_rotation(self):
+        writer = LogWriter(self.LOG_PATH, index_every=1, rotation=RotationPolicy())
+        writer.write_many([u"[INFO]:[2016-07-04 14:00:00]: first\n"], self.events[:1])
+        rotated = writer.rotate()
+        writer.close()
+        self.assertEquals(len(Index(rotated)), 1)
+        self.assertEquals(len(Index(self.LOG_PATH)), 0)
+
+    def test_diary(self):
+        logger = Diary(self.LOG_PATH, async=False, also_print=False,
+                       sink=partial(LogWriter, index_every=1))
+        for event in self.events[:3]:
+            logger.info(event)
+        logger.close()
+        self.assertEquals(len(Index(self.LOG_PATH)), 3)
+
+    def test_text_only(self):
+        with self.assertRaises(ValueError):
+            BinaryWriter(os.path.join(self.TEST_DIR_PATH, 'log.bin'), index_every=1)
+
+
+if __name__ == '__main__':
+    unittest.main()
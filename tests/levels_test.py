@@ -65,5 +65,16 @@ class TestLevel(unittest.TestCase):
 
         self.assertEquals(self.report_count + 1, report_count)
 
+    def test_severity(self):
+        self.assertTrue(levels.severity(levels.debug) < levels.severity(levels.info)
+                        < levels.severity(levels.warn) < levels.severity(levels.error))
+        self.assertEquals(levels.severity("ERROR"), levels.severity(levels.error))
+        self.assertEquals(levels.severity(mock_level), levels.severity(levels.info))
+
+    def test_from_name(self):
+        self.assertIs(levels.from_name("ERROR"), levels.error)
+        self.assertIs(levels.from_name("DEBUG"), levels.debug)
+        self.assertEquals(levels.from_name("CUSTOM"), "CUSTOM")
+
 if __name__ == '__main__':
     unittest.main()
@@ -1,9 +1,28 @@
-from diary import DiaryDB, Event
+from diary import Diary, DiaryDB, Event, levels
+from diary.logdb import Retention, ReaderPool, DURABLE, BALANCED, FAST, MINUTE, HOUR, DAY
+from functools import partial
+from datetime import datetime, timedelta, tzinfo
 import unittest
+import warnings
+import threading
 import sqlite3
 import os.path
 
 
+SEARCH_DB_PATH = os.path.join(os.path.dirname(__file__), 'testing_dir', 'search.db')
+
+
+def fts5_available():
+    conn = sqlite3.connect(':memory:')
+    try:
+        conn.execute('CREATE VIRTUAL TABLE fts5_test USING fts5(text)')
+        return True
+    except sqlite3.OperationalError:
+        return False
+    finally:
+        conn.close()
+
+
 class TestDiaryDB(unittest.TestCase):
     TEMP_DB_PATH = os.path.join(os.path.dirname(__file__),
                                  'testing_dir', 'temp.db')
@@ -13,6 +32,10 @@ class TestDiaryDB(unittest.TestCase):
         self.logdb = DiaryDB(self.TEMP_DB_PATH)
         self.logdb_default = DiaryDB()
 
+    def tearDown(self):
+        if os.path.exists(SEARCH_DB_PATH):
+            os.remove(SEARCH_DB_PATH)
+
     @classmethod
     def tearDownClass(cls):
         import os
@@ -43,6 +66,148 @@ class TestDiaryDB(unittest.TestCase):
         self.assertEquals(entry[1], self.SIMPLE_EVENT.level)
         self.assertEquals(entry[2], self.SIMPLE_EVENT.info)
 
+    def test_log_many(self):
+        events = [Event("MANY" + str(i), "LEVEL") for i in range(5)]
+        self.logdb.log_many(events)
+        entries = self.logdb.cursor.execute('''SELECT * FROM logs WHERE
+                                               log LIKE "MANY%"''').fetchall()
+        self.assertEquals(len(entries), 5)
+        self.assertEquals(entries[-1][2], events[-1].info)
+
+    def test_log_many_custom_values(self):
+        class LevelOnlyDB(DiaryDB):
+            insert_query = "INSERT INTO logs(level) VALUES(?)"
+
+            def values(self, event):
+                return event.level_str,
+
+        db = LevelOnlyDB(self.TEMP_DB_PATH)
+        db.log_many([Event("", "GROUPED"), Event("", "GROUPED")])
+        entries = db.cursor.execute('''SELECT * FROM logs
+                                       WHERE level="GROUPED"''').fetchall()
+        self.assertEquals(len(entries), 2)
+        self.assertIsNone(entries[0][2])
+        db.close()
+
+    def test_log_many_overridden_log(self):
+        logged = []
+
+        class OverriddenDB(DiaryDB):
+            def log(self, event):
+                logged.append(event)
+
+        db = OverriddenDB(self.TEMP_DB_PATH)
+        db.log_many([self.SIMPLE_EVENT, self.SIMPLE_EVENT])
+        self.assertEquals(logged, [self.SIMPLE_EVENT, self.SIMPLE_EVENT])
+        db.close()
+
+    def test_creates_indexes(self):
+        indexes = [row[0] for row in self.logdb.cursor.execute('''SELECT name FROM sqlite_master
+                                                                WHERE type="index"
+                                                                AND tbl_name="logs"''')]
+        self.assertTrue("logs_inputDT" in indexes)
+        self.assertTrue("logs_level_inputDT" in indexes)
+
+    def test_assert_event_logged(self):
+        self.logdb.log(Event("ASSERTED", "CUSTOM_LEVEL"))
+        self.logdb.assert_event_logged("ASSERTED")
+        self.logdb.assert_event_logged("ASSERTED", "CUSTOM_LEVEL")
+        self.logdb.assert_event_logged("ASSERTED", "CUSTOM%")
+        with self.assertRaises(AssertionError):
+            self.logdb.assert_event_logged("ASSERTED", "CUSTOM")
+
+    def test_assert_event_logged_ignores_level_case(self):
+        self.logdb.log(Event("ASSERTED", levels.info))
+        self.logdb.assert_event_logged("ASSERTED", level="info")
+        self.logdb.assert_event_logged("ASSERTED", level="Info")
+        self.logdb.log(Event("MIXED", "Custom"))
+        self.logdb.assert_event_logged("MIXED", level="custom")
+        plan = ' '.join(str(row) for row in self.logdb.cursor.execute('''
+            EXPLAIN QUERY PLAN SELECT * FROM logs WHERE log=(?) AND level IN (?, ?)
+            ORDER BY inputDT ASC LIMIT (?)''', ("ASSERTED", "info", "INFO", -1)))
+        self.assertTrue("logs_level_inputDT" in plan)
+        indexes = [row[0] for row in self.logdb.cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type='index'")]
+        self.assertFalse("logs_log_level" in indexes)
+
+    def test_query(self):
+        start = datetime(2016, 7, 4)
+        events = [Event("QUERY " + str(i), level, start + timedelta(minutes=i))
+                  for i, level in enumerate([levels.info, levels.error] * 5)]
+        self.logdb.log_many(events)
+
+        found = list(self.logdb.query(since=start, until=start + timedelta(minutes=10),
+                                      batch_size=3))
+        self.assertEquals([row[2] for row in found], [event.info for event in events])
+        self.assertEquals(found[0], (start, "INFO", "QUERY 0"))
+
+        found = list(self.logdb.query(since=start + timedelta(minutes=2),
+                                      until=start + timedelta(minutes=6), levels=levels.error))
+        self.assertEquals([row[2] for row in found], ["QUERY 3", "QUERY 5"])
+
+        found = list(self.logdb.query(levels=["INFO", levels.error], contains="QUERY 1", limit=5))
+        self.assertEquals(len(found), 1)
+        self.assertEquals(list(self.logdb.query(contains="query")), [])
+
+    def test_query_uses_indexes(self):
+        for arguments in ({'levels': levels.warn}, {'since': datetime(2016, 7, 4)},
+                          {'levels': levels.warn, 'until': datetime(2016, 7, 4)}):
+            sql, parameters = self.logdb._select(**arguments)
+            plan = self.logdb.cursor.execute("EXPLAIN QUERY PLAN " + sql, parameters).fetchall()
+            self.assertTrue(any("USING INDEX" in str(row) for row in plan), (arguments, plan))
+
+    def test_search(self):
+        if not fts5_available():
+            self.skipTest("SQLite is built without FTS5")
+        db = DiaryDB(SEARCH_DB_PATH, search_columns=('log',))
+        db.log_many([Event("request req-1234 timed out", "ERROR"),
+                     Event("request req-99 served", "INFO"),
+                     Event("timed out twice, timed out again", "WARN")])
+
+        found = list(db.search('"req-1234"'))
+        self.assertEquals(len(found), 1)
+        self.assertEquals(found[0][1:], ("ERROR", "request req-1234 timed out"))
+
+        found = list(db.search('"timed out"'))
+        self.assertEquals([row[1] for row in found], ["WARN", "ERROR"])  # Ranked
+        self.assertEquals(len(list(db.search('request', limit=1))), 1)
+
+        db.cursor.execute("DELETE FROM logs WHERE level='INFO'")
+        db.conn.commit()
+        self.assertEquals(list(db.search('served')), [])
+        db.close()
+
+    def test_search_existing_rows(self):
+        if not fts5_available():
+            self.skipTest("SQLite is built without FTS5")
+        db = DiaryDB(SEARCH_DB_PATH)
+        db.log(Event("logged before indexing", "INFO"))
+        db.close()
+
+        class SearchableDB(DiaryDB):
+            search_columns = ('log', 'level')
+
+        db = SearchableDB(SEARCH_DB_PATH)
+        self.assertEquals(len(list(db.search('indexing AND level:INFO'))), 1)
+        db.close()
+
+    def test_search_columns_changed(self):
+        if not fts5_available():
+            self.skipTest("SQLite is built without FTS5")
+        db = DiaryDB(SEARCH_DB_PATH, search_columns=('log',))
+        db.log(Event("disk is full", "CRITICAL"))
+        db.close()
+
+        db = DiaryDB(SEARCH_DB_PATH, search_columns=('log', 'level'))
+        self.assertEquals(len(list(db.search('level:CRITICAL'))), 1)
+        db.log(Event("disk is empty", "CRITICAL"))
+        self.assertEquals(len(list(db.search('level:CRITICAL AND disk'))), 2)
+        db.close()
+
+    def test_search_disabled(self):
+        with self.assertRaises(ValueError):
+            self.logdb.search("anything")
+
     def test_close(self):
         self.logdb.close()
         with self.assertRaises(sqlite3.ProgrammingError,
@@ -59,5 +224,319 @@ class TestDiaryDB(unittest.TestCase):
 
         self.logdb_default.close()
 
+class TestRetention(unittest.TestCase):
+    DB_PATH = os.path.join(os.path.dirname(__file__), 'testing_dir', 'retention.db')
+
+    def tearDown(self):
+        self.db.close()
+        os.remove(self.DB_PATH)
+
+    def log_rows(self, count, age=timedelta(0), info="row"):
+        dt = datetime.now() - age
+        self.db.log_many([Event(info, "INFO", dt) for _ in range(count)])
+
+    def count(self):
+        return self.db.cursor.execute("SELECT count(*) FROM logs").fetchone()[0]
+
+    def maintain_all(self):
+        steps = 1
+        while self.db.maintain():
+            steps += 1
+        return steps
+
+    def test_incremental_auto_vacuum(self):
+        self.db = DiaryDB(self.DB_PATH, retention=Retention(max_rows=10))
+        self.assertEquals(self.db.cursor.execute("PRAGMA auto_vacuum").fetchone()[0], 2)
+
+    def test_max_age(self):
+        self.db = DiaryDB(self.DB_PATH, retention=Retention(max_age=3600, chunk=10))
+        self.log_rows(25, timedelta(hours=2), "old")
+        self.log_rows(5, info="new")
+
+        self.assertEquals(self.maintain_all(), 3)
+        self.assertEquals(self.count(), 5)
+        self.db.assert_event_logged("new")
+
+    def test_max_rows(self):
+        self.db = DiaryDB(self.DB_PATH, retention=Retention(max_rows=10, chunk=4))
+        self.log_rows(20, info="first")
+        self.log_rows(5, info="last")
+        self.maintain_all()
+        self.assertEquals(self.count(), 10)
+        self.assertEquals(self.db.cursor.execute(
+            "SELECT count(*) FROM logs WHERE log='last'").fetchone()[0], 5)
+
+    def test_max_rows_with_gaps(self):
+        self.db = DiaryDB(self.DB_PATH, retention=Retention(max_rows=10))
+        self.log_rows(10, info="first")
+        self.db.cursor.execute("DELETE FROM logs WHERE rowid BETWEEN 2 AND 9")
+        self.db.conn.commit()
+        self.log_rows(8, info="last")
+        self.maintain_all()
+        self.assertEquals(self.count(), 10)
+
+    def test_max_bytes(self):
+        self.db = DiaryDB(self.DB_PATH, retention=Retention(max_bytes=64 * 1024, chunk=100))
+        self.log_rows(500, info="x" * 1000)
+        size = os.path.getsize(self.DB_PATH)
+        self.maintain_all()
+        self.assertTrue(os.path.getsize(self.DB_PATH) < size / 2)
+        self.assertTrue(0 < self.count() < 500)
+
+    def test_interval(self):
+        self.db = DiaryDB(self.DB_PATH, retention=Retention(max_rows=10, interval=60))
+        self.assertIsNone(DiaryDB.retention)
+        self.assertEquals(self.db.maintenance_timeout(), 0)
+        self.assertFalse(self.db.maintain())
+        self.assertTrue(self.db.maintenance_timeout() > 50)
+        self.log_rows(20)
+        self.db.maintain()
+        self.assertEquals(self.count(), 20)  # Not due yet
+
+    def test_diary(self):
+        self.db = DiaryDB(self.DB_PATH)
+        db = partial(DiaryDB, retention=Retention(max_rows=5, interval=0))
+        log = Diary(self.DB_PATH, db=db, also_print=False)
+        for i in range(20):
+            log.info(str(i))
+        log.close()
+        self.assertEquals(self.count(), 5)
+        self.db.assert_event_logged("19")
+
+
+class TestPragmas(unittest.TestCase):
+    DB_PATH = os.path.join(os.path.dirname(__file__), 'testing_dir', 'pragmas.db')
+
+    def tearDown(self):
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.DB_PATH + suffix):
+                os.remove(self.DB_PATH + suffix)
+
+    def pragma(self, db, name):
+        return db.cursor.execute("PRAGMA {}".format(name)).fetchone()[0]
+
+    def test_default(self):
+        with DiaryDB(self.DB_PATH) as db:
+            self.assertEquals(self.pragma(db, "journal_mode"), "delete")
+
+    def test_profiles(self):
+        for profile, synchronous in ((DURABLE, 2), (BALANCED, 1), (FAST, 0)):
+            with DiaryDB(self.DB_PATH, pragmas=profile) as db:
+                self.assertEquals(self.pragma(db, "journal_mode"), "wal")
+                self.assertEquals(self.pragma(db, "synchronous"), synchronous)
+                db.log(Event("logged", levels.info))
+                db.assert_event_logged("logged")
+
+    def test_fast(self):
+        with DiaryDB(self.DB_PATH, pragmas=FAST) as db:
+            self.assertEquals(self.pragma(db, "cache_size"), -64000)
+            self.assertEquals(self.pragma(db, "temp_store"), 2)
+            self.assertEquals(self.pragma(db, "wal_autocheckpoint"), 10000)
+
+    def test_custom(self):
+        class CheckpointingDB(DiaryDB):
+            pragmas = (('journal_mode', 'WAL'), ('wal_autocheckpoint', 100))
+
+        with CheckpointingDB(self.DB_PATH) as db:
+            self.assertEquals(self.pragma(db, "wal_autocheckpoint"), 100)
+            self.assertEquals(db.configure({'cache_size': -1000}), {'cache_size': -1000})
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            DiaryDB(self.DB_PATH, pragmas="reckless")
+        with DiaryDB(self.DB_PATH) as db:
+            with self.assertRaises(ValueError):
+                db.configure({'journal_mode': 'WAL; DROP TABLE logs'})
+
+
+class TestReaderPool(unittest.TestCase):
+    DB_PATH = os.path.join(os.path.dirname(__file__), 'testing_dir', 'readers.db')
+
+    def setUp(self):
+        self.writer = DiaryDB(self.DB_PATH, pragmas=BALANCED)
+        self.writer.log_many([Event("event {}".format(i), levels.info) for i in range(10)])
+
+    def tearDown(self):
+        self.writer.close()
+        for suffix in ('', '-wal', '-shm'):
+            if os.path.exists(self.DB_PATH + suffix):
+                os.remove(self.DB_PATH + suffix)
+
+    def test_read_only(self):
+        with DiaryDB(self.DB_PATH, read_only=True) as reader:
+            reader.assert_event_logged("event 3")
+            self.assertEquals(len(list(reader.query())), 10)
+            with self.assertRaises(sqlite3.OperationalError):
+                reader.log(Event("refused", levels.info))
+
+    def test_any_thread(self):
+        reader = DiaryDB(self.DB_PATH, read_only=True)
+        found = []
+        thread = threading.Thread(target=lambda: found.extend(reader.query(limit=2)))
+        thread.start()
+        thread.join()
+        reader.close()
+        self.assertEquals([row[2] for row in found], ["event 0", "event 1"])
+
+    def test_readers_do_not_block_writer(self):
+        with ReaderPool(self.DB_PATH) as pool:
+            with pool.borrow() as reader:
+                rows = reader.query(batch_size=1)
+                next(rows)  # Holds a read transaction open
+                self.writer.conn.execute("PRAGMA busy_timeout = 0")
+                self.writer.log(Event("written", levels.info))
+                self.assertEquals(len(list(rows)), 9)  # Reads its snapshot
+                reader.assert_event_logged("written")
+
+    def test_borrow(self):
+        pool = ReaderPool(self.DB_PATH, size=1)
+        with pool.borrow() as reader:
+            borrowed = reader
+            errors = []
+
+            def borrow():
+                try:
+                    with pool.borrow(timeout=.01):
+                        pass
+                except RuntimeError as e:
+                    errors.append(e)
+            thread = threading.Thread(target=borrow)
+            thread.start()
+            thread.join()
+            self.assertEquals(len(errors), 1)
+
+        with pool.borrow() as reader:
+            self.assertIs(reader, borrowed)
+        self.assertEquals(pool.opened, 1)
+        pool.close()
+        with self.assertRaises(ValueError):
+            with pool.borrow():
+                pass
+
+    def test_diary_readers(self):
+        logger = Diary(self.DB_PATH, async=False, also_print=False)
+        logger.info("from diary")
+        with logger.readers.borrow() as reader:
+            reader.assert_event_logged("from diary")
+        logger.close()
+        self.assertTrue(logger.readers.closed)
+
+    def test_refuses_rollback_journal(self):
+        path = os.path.join(os.path.dirname(__file__), 'testing_dir', 'diary_readers.db')
+        self.addCleanup(os.remove, path)
+        logger = Diary(path, async=False, also_print=False)
+        self.assertEquals(logger.logdb.cursor.execute("PRAGMA journal_mode").fetchone()[0], "delete")
+        with self.assertRaises(ValueError):
+            with logger.readers.borrow():
+                pass
+        self.assertEquals(logger.readers.opened, 0)
+        logger.close()
+
+
+class FixedOffset(tzinfo):
+    def __init__(self, hours):
+        self.offset = timedelta(hours=hours)
+
+    def utcoffset(self, dt):
+        return self.offset
+
+    def dst(self, dt):
+        return timedelta(0)
+
+
+class TestRollups(unittest.TestCase):
+    DB_PATH = os.path.join(os.path.dirname(__file__), 'testing_dir', 'rollups.db')
+    START = datetime(2016, 7, 4, 22, 58)
+
+    def setUp(self):
+        self.events = [Event("event {}".format(i), levels.error if i % 2 else levels.info,
+                             self.START + timedelta(seconds=20 * i)) for i in range(12)]
+
+    def tearDown(self):
+        self.db.close()
+        os.remove(self.DB_PATH)
+
+    def test_counts(self):
+        self.db = DiaryDB(self.DB_PATH, rollups=True)
+        self.db.log_many(self.events)
+        self.assertEquals(list(self.db.counts(levels=levels.error))[:2],
+                          [(datetime(2016, 7, 4, 22, 58), 'ERROR', 1),
+                           (datetime(2016, 7, 4, 22, 59), 'ERROR', 2)])
+        self.assertEquals(list(self.db.counts(HOUR)),
+                          [(datetime(2016, 7, 4, 22), 'ERROR', 3), (datetime(2016, 7, 4, 22), 'INFO', 3),
+                           (datetime(2016, 7, 4, 23), 'ERROR', 3), (datetime(2016, 7, 4, 23), 'INFO', 3)])
+        self.assertEquals(list(self.db.counts(DAY, levels=[levels.info])),
+                          [(datetime(2016, 7, 4), 'INFO', 6)])
+
+    def test_count(self):
+        self.db = DiaryDB(self.DB_PATH, rollups=True)
+        self.db.log_many(self.events[:6])
+        self.db.log_many(self.events[6:])
+        self.assertEquals(self.db.count(), 12)
+        self.assertEquals(self.db.count(levels=levels.error), 6)
+        self.assertEquals(self.db.count(since=datetime(2016, 7, 4, 23)), 6)
+        self.assertEquals(self.db.count(until=datetime(2016, 7, 4, 23), period=HOUR), 6)
+        self.assertEquals(self.db.count(since=datetime(2016, 7, 5)), 0)
+
+    def test_rate(self):
+        self.db = DiaryDB(self.DB_PATH, rollups=True)
+        self.db.log_many(self.events)
+        since = datetime(2016, 7, 4, 22, 58)
+        self.assertEquals(self.db.rate(since, since + timedelta(minutes=4)), 3)
+        self.assertEquals(self.db.rate(since, since + timedelta(minutes=4), per=HOUR), 180)
+        with self.assertRaises(ValueError):
+            self.db.rate(since, since)
+
+    def test_backfill(self):
+        self.db = DiaryDB(self.DB_PATH)
+        self.db.log_many(self.events)
+        with self.assertRaises(ValueError):
+            self.db.count()
+        self.db.close()
+
+        self.db = DiaryDB(self.DB_PATH, rollups=True)
+        self.assertEquals(list(self.db.counts()), list(self._counted(MINUTE)))
+        self.db.log_many(self.events)
+        self.assertEquals(self.db.count(period=DAY), 24)
+        self.db.cursor.execute("DELETE FROM logs")
+        self.db.backfill_rollups()
+        self.assertEquals(self.db.count(), 0)
+
+    def test_backfill_aware(self):
+        self.db = DiaryDB(self.DB_PATH, rollups=True)
+        self.db.log_many([Event("aware", levels.info, self.START.replace(tzinfo=FixedOffset(2)))])
+        counted = list(self.db.counts(HOUR))
+        self.db.backfill_rollups()
+        self.assertEquals(list(self.db.counts(HOUR)), counted)
+        self.assertEquals(counted, [(datetime(2016, 7, 4, 22), 'INFO', 1)])
+
+    def test_overridden_log_warns(self):
+        class CustomDB(DiaryDB):
+            def log(self, event):
+                pass
+
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter("always")
+            self.db = CustomDB(self.DB_PATH, rollups=True)
+        self.assertEquals(len(caught), 1)
+        self.assertTrue("CustomDB overrides log" in str(caught[0].message))
+
+    def _counted(self, period):
+        """Count events in Python to check the rollups against"""
+        counts = {}
+        for event in self.events:
+            start = event.dt.replace(second=0)
+            counts[start, event.level_str] = counts.get((start, event.level_str), 0) + 1
+        return sorted((start, level, count) for (start, level), count in counts.items())
+
+    def test_read_only(self):
+        self.db = DiaryDB(self.DB_PATH, rollups=True)
+        self.db.log_many(self.events)
+        with DiaryDB(self.DB_PATH, read_only=True, rollups=True) as reader:
+            self.assertEquals(reader.count(), 12)
+        with self.assertRaises(ValueError):
+            self.db.count(period="weekly")
+
+
 if __name__ == '__main__':
     unittest.main()
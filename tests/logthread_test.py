@@ -1,8 +1,27 @@
 from diary import Diary, DiaryDB
+from diary.logdb import Retention
+from diary.writers import FlushPolicy
+from functools import partial
+import sqlite3
 import unittest
 import time
+import sys
+import io
 import os
 
+_PY2 = sys.version_info[0] == 2
+
+
+class LockedRetention(Retention):
+    """Fails its first step as if another connection held the database"""
+    failed = False
+
+    def step(self, db):
+        if not self.failed:
+            self.failed = True
+            raise sqlite3.OperationalError("database is locked")
+        return Retention.step(self, db)
+
 
 class TestDiaryThread(unittest.TestCase):
     TEST_DIR_PATH = os.path.join(os.path.dirname(__file__),
@@ -35,6 +54,56 @@ class TestDiaryThread(unittest.TestCase):
         returned = self.log.thread.join()
         self.assertIsNone(returned)
 
+    def capture_stderr(self):
+        stderr = sys.stderr
+        sys.stderr = io.StringIO() if not _PY2 else io.BytesIO()
+        self.addCleanup(setattr, sys, 'stderr', stderr)
+        return sys.stderr
+
+    def test_idle_flush_error(self):
+        path = os.path.join(self.TEST_DIR_PATH, "idle_flush.txt")
+        self.addCleanup(os.remove, path)
+        log = Diary(path, also_print=False, flush_policy=FlushPolicy(interval=.01))
+        reported = self.capture_stderr()
+        flush = log.log_file.flush
+
+        def full_disk():
+            log.log_file.flush = flush
+            raise IOError("No space left on device")
+
+        log.log_file.flush = full_disk
+        log.info("waiting for the interval")
+        time.sleep(.1)
+        self.assertTrue(log.thread.is_alive())
+        log.info("written after")
+        log.close()
+
+        self.assertTrue("No space left on device" in reported.getvalue())
+        with open(path) as f:
+            self.assertTrue("written after" in f.read())
+
+    def test_maintenance_error(self):
+        for threaded in (True, False):
+            name = "maintenance_{}".format(threaded)
+            path = os.path.join(self.TEST_DIR_PATH, name + ".txt")
+            db_path = os.path.join(self.TEST_DIR_PATH, name + ".db")
+            self.addCleanup(os.remove, path)
+            self.addCleanup(os.remove, db_path)
+            reported = self.capture_stderr()
+            log = Diary(self.TEST_DIR_PATH, file_name=name + ".txt", db_name=name + ".db",
+                        also_print=False, async=threaded,
+                        db=partial(DiaryDB, retention=LockedRetention(max_rows=100, interval=0)))
+            log.info("first")
+            time.sleep(.05)
+            log.info("second")
+            log.close()
+
+            self.assertTrue("database is locked" in reported.getvalue())
+            with open(path) as f:
+                self.assertEquals(len(f.readlines()), 2)
+            with DiaryDB(db_path) as db:
+                db.assert_event_logged("second")
+
     def test_logs(self):
         self.log.log(self.INFO)
         self.log.close()
@@ -45,6 +114,26 @@ class TestDiaryThread(unittest.TestCase):
         with DiaryDB(self.log.db_file.name) as db:
             db.assert_event_logged(self.INFO)
 
+    def test_logs_batch(self):
+        trials = 50
+        batches = []
+        write_many = self.log._write_many
+
+        def record_batch(events):
+            batches.append(len(events))
+            write_many(events)
+
+        self.log._write_many = record_batch
+        for i in range(trials):
+            self.log.log(self.INFO + str(i))
+        self.log.close()
+
+        self.assertEquals(sum(batches), trials)
+        self.assertEquals(self.log.last_logged_event.info, self.INFO + str(trials - 1))
+
+        with DiaryDB(self.log.db_file.name) as db:
+            db.assert_event_logged(self.INFO + str(trials - 1))
+
     def test_timer_no_async(self):
         log = Diary(self.TEST_DIR_PATH, async=False)
         with self.assertRaises(RuntimeError,
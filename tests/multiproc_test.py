@@ -0,0 +1,97 @@
+from diary import DiaryDB, Event, levels
+from diary.multiproc import DiaryHub, ClientDiary
+import multiprocessing
+import unittest
+import time
+import sys
+import io
+import os
+
+_PY2 = sys.version_info[0] == 2
+
+EVENTS_PER_PROCESS = 100
+
+
+def log_from_process(queue, name):
+    logger = ClientDiary(queue)
+    for i in range(EVENTS_PER_PROCESS):
+        logger.info("%s logged %s", name, i)
+    logger.warn(lambda: name + " finished")
+    logger.close()
+
+
+class TestMultiprocess(unittest.TestCase):
+    TEST_DIR_PATH = os.path.join(os.path.dirname(__file__),
+                                 'testing_dir', 'multiproc_testing')
+
+    def setUp(self):
+        if not os.path.exists(self.TEST_DIR_PATH):
+            os.mkdir(self.TEST_DIR_PATH)
+
+    def test_processes_share_one_writer(self):
+        process_count = 4
+        hub = DiaryHub(self.TEST_DIR_PATH, file_name="hub.log", db_name="hub.db",
+                       also_print=False)
+        processes = [multiprocessing.Process(target=log_from_process,
+                                             args=(hub.queue, "process" + str(n)))
+                     for n in range(process_count)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+        hub.close()
+
+        self.assertFalse(hub.thread.is_alive())
+        with open(hub.diary.log_file.name) as f:
+            lines = f.readlines()
+        self.assertEquals(len(lines), process_count * (EVENTS_PER_PROCESS + 1))
+        self.assertTrue(all(line.startswith("[") for line in lines))
+
+        with DiaryDB(hub.diary.db_file.name) as db:
+            db.assert_event_logged("process0 logged 99", "INFO")
+            db.assert_event_logged("process3 finished", "WARN")
+
+    def test_client_in_process(self):
+        hub = DiaryHub(os.path.join(self.TEST_DIR_PATH, "client.log"), also_print=False)
+        logger = hub.client(min_level=levels.info)
+        self.assertIsNone(logger.log_file)
+        self.assertIsNone(logger.db_file)
+        self.assertIsNone(logger.stats())  # Collected by the hub
+        logger.debug("not sent")
+        logger.info("sent")
+        logger.close()
+        hub.close()
+
+        with open(hub.diary.log_file.name) as f:
+            lines = f.readlines()
+        self.assertEquals(len(lines), 1)
+        self.assertTrue("sent" in lines[0])
+
+    def test_write_error(self):
+        hub = DiaryHub(os.path.join(self.TEST_DIR_PATH, "error.log"), also_print=False)
+        stderr = sys.stderr
+        sys.stderr = io.StringIO() if not _PY2 else io.BytesIO()
+        try:
+            hub.queue.put([object()])
+            time.sleep(.1)  # Sent alone rather than in the same group commit
+            hub.queue.put([Event("sent after", levels.info)])
+            hub.close()
+            reported = sys.stderr.getvalue()
+        finally:
+            sys.stderr = stderr
+
+        self.assertTrue("--- Diary error ---" in reported)
+        with open(hub.diary.log_file.name) as f:
+            lines = f.readlines()
+        self.assertEquals(len(lines), 1)
+        self.assertTrue("sent after" in lines[0])
+
+    def test_bad_path(self):
+        with open(os.path.join(self.TEST_DIR_PATH, "hub.bad"), 'w'):
+            pass
+        with self.assertRaises(ValueError):
+            DiaryHub(os.path.join(self.TEST_DIR_PATH, "hub.bad"))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,160 @@
+from diary import Diary, Event, levels
+from diary.partitions import PartitionedDiaryDB
+from diary.logdb import Retention, FAST, DAY
+from diary.writers import HOURLY
+from datetime import datetime, timedelta
+from logdb_test import fts5_available
+import functools
+import unittest
+import shutil
+import os
+
+
+class TestPartitionedDiaryDB(unittest.TestCase):
+    TEST_DIR_PATH = os.path.join(os.path.dirname(__file__),
+                                 'testing_dir', 'partitions')
+    DB_PATH = os.path.join(TEST_DIR_PATH, 'diary.db')
+    START = datetime(2016, 7, 4, 22)
+
+    def setUp(self):
+        os.mkdir(self.TEST_DIR_PATH)
+        self.db = PartitionedDiaryDB(self.DB_PATH)
+        self.events = [Event("event {}".format(i), levels.error if i % 2 else levels.info,
+                             self.START + timedelta(hours=i)) for i in range(30)]
+        self.db.log_many(self.events)
+
+    def tearDown(self):
+        self.db.close()
+        shutil.rmtree(self.TEST_DIR_PATH)
+
+    def test_routes_by_dt(self):
+        self.assertEquals(sorted(os.listdir(self.TEST_DIR_PATH)),
+                          ['diary-2016-07-04.db', 'diary-2016-07-05.db', 'diary-2016-07-06.db'])
+        self.assertEquals(len(self.db._open), 2)
+
+    def test_query_merges_partitions(self):
+        found = list(self.db.query())
+        self.assertEquals([row[2] for row in found], [event.info for event in self.events])
+        self.assertEquals(found[0][0], self.START)
+
+        found = list(self.db.query(levels=levels.error, limit=3))
+        self.assertEquals([row[2] for row in found], ["event 1", "event 3", "event 5"])
+
+    def test_query_opens_overlapping_partitions(self):
+        since = datetime(2016, 7, 5, 23)
+        until = datetime(2016, 7, 6, 1)
+        self.assertEquals([start for start, _ in self.db.partitions(since, until)],
+                          [datetime(2016, 7, 5), datetime(2016, 7, 6)])
+        self.assertEquals([start for start, _ in self.db.partitions(until=datetime(2016, 7, 5))],
+                          [datetime(2016, 7, 4)])
+
+        found = list(self.db.query(since=since, until=until))
+        self.assertEquals([row[2] for row in found], ["event 25", "event 26"])
+
+    def test_drop(self):
+        dropped = self.db.drop(before=datetime(2016, 7, 5, 12))
+        self.assertEquals([os.path.basename(path) for path in dropped], ['diary-2016-07-04.db'])
+        self.assertEquals(list(self.db.query())[0][2], "event 2")
+
+    def test_retention(self):
+        with self.assertRaises(ValueError):
+            PartitionedDiaryDB(self.DB_PATH, retention=Retention(max_rows=10))
+
+        sizes = [os.path.getsize(path) for _, path in self.db.partitions()]
+        db = PartitionedDiaryDB(self.DB_PATH, retention=Retention(max_bytes=sum(sizes) - 1))
+        db.maintain()
+        self.assertEquals(len(db.partitions()), 2)
+        self.assertFalse(db.maintain())  # Not due again until the interval passes
+        db.close()
+
+        db = PartitionedDiaryDB(self.DB_PATH, retention=Retention(max_age=timedelta(days=1)))
+        db.log(Event("today", levels.info))
+        db.maintain()
+        self.assertEquals(len(db.partitions()), 1)
+        db.assert_event_logged("today")
+        db.close()
+
+    def test_pragmas(self):
+        db = PartitionedDiaryDB(self.DB_PATH, pragmas=FAST)
+        db.log(Event("fast", levels.info, self.START))
+        partition = db._open[db._key(self.START)]
+        self.assertEquals(partition.cursor.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        db.close()
+
+    def test_read_only(self):
+        db = PartitionedDiaryDB(self.DB_PATH, read_only=True)
+        with self.assertRaises(ValueError):
+            db.log(Event("refused", levels.info, self.START))
+        self.assertEquals(len(list(db.query())), 30)
+        db.close()
+
+    def test_rollups(self):
+        db = PartitionedDiaryDB(os.path.join(self.TEST_DIR_PATH, 'rollups.db'), period=HOURLY,
+                                rollups=True)
+        db.log_many(self.events[:3])
+        self.assertEquals(db.count(), 3)
+        self.assertEquals(db.count(since=self.START + timedelta(hours=1)), 2)
+        self.assertEquals(list(db.counts(DAY)), [(datetime(2016, 7, 4), 'ERROR', 1),
+                                                 (datetime(2016, 7, 4), 'INFO', 1),
+                                                 (datetime(2016, 7, 5), 'INFO', 1)])
+        db.close()
+
+    def test_late_event(self):
+        self.db.log(Event("late", levels.info, self.START))
+        self.db.assert_event_logged("late", "INFO")
+        with self.assertRaises(AssertionError):
+            self.db.assert_event_logged("never logged")
+
+    def test_hourly(self):
+        db = PartitionedDiaryDB(os.path.join(self.TEST_DIR_PATH, 'hourly.db'), period=HOURLY)
+        db.log_many(self.events[:3])
+        self.assertEquals(len(db.partitions()), 3)
+        self.assertEquals(len(list(db.query(since=self.START + timedelta(minutes=30)))), 2)
+        db.close()
+
+    def test_bad_period(self):
+        with self.assertRaises(ValueError):
+            PartitionedDiaryDB(self.DB_PATH, period="weekly")
+
+    def test_search(self):
+        if not fts5_available():
+            self.skipTest("SQLite is built without FTS5")
+        db = PartitionedDiaryDB(os.path.join(self.TEST_DIR_PATH, 'search.db'),
+                                search_columns=('log',))
+        db.log_many(self.events)
+        found = list(db.search('"event 3" OR "event 27"'))
+        self.assertEquals([row[2] for row in found], ["event 27", "event 3"])
+        db.close()
+
+    def test_diary(self):
+        log = Diary(self.TEST_DIR_PATH, file_name="diary.txt", db_name="logs.db",
+                    db=PartitionedDiaryDB, async=False, also_print=False)
+        log.info("partitioned")
+        log.close()
+        with PartitionedDiaryDB(os.path.join(self.TEST_DIR_PATH, "logs.db")) as db:
+            db.assert_event_logged("partitioned")
+            self.assertEquals(len(db.partitions()), 1)
+        self.assertFalse(os.path.exists(os.path.join(self.TEST_DIR_PATH, "logs.db")))
+
+        log = Diary(os.path.join(self.TEST_DIR_PATH, "hourly.db"),
+                    db=functools.partial(PartitionedDiaryDB, period=HOURLY))
+        log.close()
+        self.assertFalse(os.path.exists(os.path.join(self.TEST_DIR_PATH, "hourly.db")))
+
+    def test_changes_every_partition(self):
+        applied = self.db.configure(FAST)
+        self.assertEquals(len(applied), 3)
+        self.assertTrue(all(values['journal_mode'] == 'wal' for values in applied.values()))
+        self.db.create_rollups()
+        self.db.backfill_rollups()
+        self.assertEquals(self.db.count(), 30)
+        self.db.log(Event("late", levels.info, self.START + timedelta(days=3)))
+        self.assertEquals(self.db.count(levels=levels.info), 16)
+
+        with PartitionedDiaryDB(self.DB_PATH, read_only=True) as db:
+            with self.assertRaises(ValueError):
+                db.backfill_rollups()
+
+
+if __name__ == '__main__':
+    unittest.main()
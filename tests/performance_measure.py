@@ -1,11 +1,25 @@
+"""
+Times single components such as formats, sinks, queues and queries.
+End to end scenarios with latency percentiles and baselines are in benchmark.py.
+"""
 from timeit import default_timer
 from functools import wraps
-from diary import Diary
+from threading import Thread
+from diary import Diary, DiaryDB, Event, levels, formats
+from diary.logdb import DURABLE, BALANCED, FAST, HOUR
+from datetime import datetime, timedelta
+from diary.queues import DiaryQueue, DequeQueue
+from diary.binary import BinaryWriter
+from diary.reader import LogReader
+from diary.writers import FlushPolicy, LogWriter
+from diary.segments import SegmentWriter, BinarySegmentWriter
+import codecs
 import os
 import shutil
 
 TEST_DIR = os.path.join(os.path.dirname(__file__), 'performance_test_dir')
 TRIAL_COUNT = 1000
+PRODUCER_COUNT = 32
 def timed(timed_function):
 
     @wraps(timed_function)
@@ -57,11 +71,381 @@ def test_simple_performance_no_log_file(trials=TRIAL_COUNT):
         simple_logger.log("info")
     simple_logger.close()
 
+def quiet_logging(trials, name, stats):
+    """Log without printing so the cost of writing is not hidden by stdout"""
+    logger = Diary(TEST_DIR, file_name=name + ".log", db_name=name + ".db", also_print=False,
+                   stats=stats)
+    for i in range(trials):
+        logger.log("info")
+    logger.close()
+
+@timed
+def test_quiet_stats(trials=TRIAL_COUNT):
+    quiet_logging(trials, "quiet_stats", True)
+
+@timed
+def test_quiet_no_stats(trials=TRIAL_COUNT):
+    quiet_logging(trials, "quiet_no_stats", False)
+
+def log_from_producers(logger, trials, producers=PRODUCER_COUNT):
+    """Split trials between producer threads all logging at once"""
+    def produce():
+        for i in range(trials // producers):
+            logger.log("info")
+
+    threads = [Thread(target=produce) for _ in range(producers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    logger.close()
+
+@timed
+def test_producers_queue(trials=TRIAL_COUNT):
+    logger = Diary(os.path.join(TEST_DIR, "producers_queue.log"), also_print=False)
+    log_from_producers(logger, trials)
+
+@timed
+def test_producers_diary_queue(trials=TRIAL_COUNT):
+    logger = Diary(os.path.join(TEST_DIR, "producers_diary_queue.log"), also_print=False,
+                   queue=DiaryQueue(trials))
+    log_from_producers(logger, trials)
+
+@timed
+def test_producers_deque_queue(trials=TRIAL_COUNT):
+    logger = Diary(os.path.join(TEST_DIR, "producers_deque_queue.log"), also_print=False,
+                   queue=DequeQueue())
+    log_from_producers(logger, trials)
+
+@timed
+def test_empty_call_baseline(trials=TRIAL_COUNT):
+    def debug(info):
+        pass
+    for i in range(trials):
+        debug("debug")
+
+@timed
+def test_disabled_level(trials=TRIAL_COUNT):
+    logger = Diary(os.path.join(TEST_DIR, "disabled_level.log"), min_level=levels.info)
+    for i in range(trials):
+        logger.debug("debug")
+    logger.close()
+
+FORMAT_EVENT = Event("info", levels.info)
+TEMPLATE = "[{level_str}]|{dt}|{info}"
+
+def format_builtins(trials, compile_format):
+    for log_format in (formats.standard, formats.minimal, formats.alarms, formats.easy_read):
+        log_format = compile_format(log_format)
+        for i in range(trials // 4):
+            log_format(FORMAT_EVENT)
+
+@timed
+def test_builtin_formats(trials=TRIAL_COUNT):
+    format_builtins(trials, lambda log_format: log_format)
+
+@timed
+def test_compiled_builtin_formats(trials=TRIAL_COUNT):
+    format_builtins(trials, formats.compile_format)
+
+@timed
+def test_template_format(trials=TRIAL_COUNT):
+    for i in range(trials):
+        TEMPLATE.format(**FORMAT_EVENT.__dict__)
+
+@timed
+def test_compiled_template_format(trials=TRIAL_COUNT):
+    compiled = formats.compile_template(TEMPLATE)
+    for i in range(trials):
+        compiled(FORMAT_EVENT)
+
+@timed
+def test_strftime(trials=TRIAL_COUNT):
+    dt = FORMAT_EVENT.dt
+    for i in range(trials):
+        dt.strftime("%x %X")
+
+@timed
+def test_cached_strftime(trials=TRIAL_COUNT):
+    dt = FORMAT_EVENT.dt
+    for i in range(trials):
+        formats.render_time(dt, "%x %X")
+
+SINK_EVENTS = [Event("info", levels.info) for i in range(1000)]
+
+@timed
+def test_text_sink(trials=TRIAL_COUNT):
+    log_format = formats.compile_format(formats.standard)
+    writer = LogWriter(os.path.join(TEST_DIR, "text_sink.log"), flush_policy=FlushPolicy())
+    for i in range(trials // len(SINK_EVENTS)):
+        writer.write_many([log_format(event) + '\n' for event in SINK_EVENTS], SINK_EVENTS)
+        writer.flush()
+    writer.close()
+
+@timed
+def test_binary_sink(trials=TRIAL_COUNT):
+    writer = BinaryWriter(os.path.join(TEST_DIR, "binary_sink.bin"), flush_policy=FlushPolicy())
+    for i in range(trials // len(SINK_EVENTS)):
+        writer.write_many((), SINK_EVENTS)
+        writer.flush()
+    writer.close()
+
+@timed
+def test_segment_sink(trials=TRIAL_COUNT):
+    log_format = formats.compile_format(formats.standard)
+    writer = SegmentWriter(os.path.join(TEST_DIR, "segment_sink.log"), flush_policy=FlushPolicy())
+    for i in range(trials // len(SINK_EVENTS)):
+        writer.write_many([log_format(event) + '\n' for event in SINK_EVENTS], SINK_EVENTS)
+        writer.flush()
+    writer.close()
+
+@timed
+def test_binary_segment_sink(trials=TRIAL_COUNT):
+    writer = BinarySegmentWriter(os.path.join(TEST_DIR, "binary_segment_sink.bin"),
+                                 flush_policy=FlushPolicy())
+    for i in range(trials // len(SINK_EVENTS)):
+        writer.write_many((), SINK_EVENTS)
+        writer.flush()
+    writer.close()
+
+LINE = formats.standard(FORMAT_EVENT) + '\n'
+
+@timed
+def test_codecs_writes(trials=TRIAL_COUNT):
+    log_file = codecs.open(os.path.join(TEST_DIR, "codecs_writes.log"), mode='a+',
+                           buffering=1, encoding="utf-8")
+    for i in range(trials):
+        log_file.write(LINE)
+        log_file.flush()
+    log_file.close()
+
+@timed
+def test_file_writes(trials=TRIAL_COUNT):
+    writer = LogWriter(os.path.join(TEST_DIR, "file_writes.log"))
+    for i in range(trials):
+        writer.write(LINE)
+    writer.close()
+
+@timed
+def test_segment_writes(trials=TRIAL_COUNT):
+    writer = SegmentWriter(os.path.join(TEST_DIR, "segment_writes.log"))
+    for i in range(trials):
+        writer.write(LINE)
+    writer.close()
+
+TEXT_LOG_EVENTS = TRIAL_COUNT * 100
+TEXT_LOG_START = datetime(2016, 7, 4)
+
+def seed_text_log():
+    """Write TEXT_LOG_EVENTS indexed events a second apart in the standard format,
+    one in a hundred with a traceback"""
+    log_format = formats.compile_format(formats.standard)
+    writer = LogWriter(os.path.join(TEST_DIR, "read.log"), flush_policy=FlushPolicy(max_events=100),
+                       index_every=64 * 1024)
+    for i in range(TEXT_LOG_EVENTS):
+        info = "event {}".format(i)
+        if i % 100 == 0:
+            info += '\nTraceback (most recent call last):\n  File "app.py", line 1, in <module>'
+        event = Event(info, levels.info, TEXT_LOG_START + timedelta(seconds=i))
+        writer.write_many([log_format(event) + '\n'], [event])
+    writer.close()
+
+@timed
+def test_read_text_log(trials=TRIAL_COUNT):
+    reader = LogReader(os.path.join(TEST_DIR, "read.log"))
+    for i, event in zip(range(trials), reader):
+        pass
+
+def log_window(trials, reader_window):
+    """Read ten seconds of the text log at trials places"""
+    for i in range(trials):
+        since = TEXT_LOG_START + timedelta(seconds=i * 9973 % TEXT_LOG_EVENTS)
+        for event in reader_window(since, since + timedelta(seconds=10)):
+            pass
+
+@timed
+def test_indexed_window(trials=TRIAL_COUNT):
+    log_window(trials, LogReader(os.path.join(TEST_DIR, "read.log")).window)
+
+@timed
+def test_scanned_window(trials=TRIAL_COUNT):
+    reader = LogReader(os.path.join(TEST_DIR, "read.log"))
+
+    def scan(since, until):
+        for event in reader.events():
+            if event.dt >= until:
+                return
+            if event.dt >= since:
+                yield event
+    log_window(trials, scan)
+
+def db_commits(trials, name, pragmas):
+    """Log events one commit at a time, as a Diary does with a trickle of events"""
+    db = DiaryDB(os.path.join(TEST_DIR, name), pragmas=pragmas)
+    for i in range(trials):
+        db.log(FORMAT_EVENT)
+    db.close()
+
+@timed
+def test_db_commits_default(trials=TRIAL_COUNT):
+    db_commits(trials, "commits_default.db", None)
+
+@timed
+def test_db_commits_durable(trials=TRIAL_COUNT):
+    db_commits(trials, "commits_durable.db", DURABLE)
+
+@timed
+def test_db_commits_balanced(trials=TRIAL_COUNT):
+    db_commits(trials, "commits_balanced.db", BALANCED)
+
+@timed
+def test_db_commits_fast(trials=TRIAL_COUNT):
+    db_commits(trials, "commits_fast.db", FAST)
+
+def db_batches(trials, name, pragmas):
+    """Log events in batches of a thousand, as a Diary does under load"""
+    db = DiaryDB(os.path.join(TEST_DIR, name), pragmas=pragmas)
+    for i in range(trials // len(SINK_EVENTS)):
+        db.log_many(SINK_EVENTS)
+    db.close()
+
+@timed
+def test_db_batches_default(trials=TRIAL_COUNT):
+    db_batches(trials, "batches_default.db", None)
+
+@timed
+def test_db_batches_durable(trials=TRIAL_COUNT):
+    db_batches(trials, "batches_durable.db", DURABLE)
+
+@timed
+def test_db_batches_balanced(trials=TRIAL_COUNT):
+    db_batches(trials, "batches_balanced.db", BALANCED)
+
+@timed
+def test_db_batches_fast(trials=TRIAL_COUNT):
+    db_batches(trials, "batches_fast.db", FAST)
+
+QUERY_ROWS = 100000
+QUERY_START = datetime(2016, 7, 4)
+
+def seed_query_db():
+    """Fill a db with QUERY_ROWS events a second apart, one in a hundred an error"""
+    db = DiaryDB(os.path.join(TEST_DIR, "query.db"), search_columns=('log',))
+    db.log_many([Event("event {}".format(i), levels.error if i % 100 == 0 else levels.info,
+                       QUERY_START + timedelta(seconds=i)) for i in range(QUERY_ROWS)])
+    db.close()
+
+@timed
+def test_query_errors(trials=TRIAL_COUNT):
+    db = DiaryDB(os.path.join(TEST_DIR, "query.db"))
+    for i in range(trials):
+        since = QUERY_START + timedelta(seconds=i * 10)
+        for row in db.query(levels=levels.error, since=since, limit=10):
+            pass
+    db.close()
+
+@timed
+def test_query_time_range(trials=TRIAL_COUNT):
+    db = DiaryDB(os.path.join(TEST_DIR, "query.db"))
+    for i in range(trials):
+        since = QUERY_START + timedelta(seconds=i * 50)
+        for row in db.query(since=since, until=since + timedelta(seconds=100)):
+            pass
+    db.close()
+
+@timed
+def test_query_contains(trials=TRIAL_COUNT):
+    db = DiaryDB(os.path.join(TEST_DIR, "query.db"))
+    for i in range(trials):
+        for row in db.query(contains="event {}".format(i * 97 % QUERY_ROWS)):
+            pass
+    db.close()
+
+@timed
+def test_search(trials=TRIAL_COUNT):
+    db = DiaryDB(os.path.join(TEST_DIR, "query.db"), search_columns=('log',))
+    for i in range(trials):
+        for row in db.search('"event {}"'.format(i * 97 % QUERY_ROWS)):
+            pass
+    db.close()
+
+@timed
+def test_db_batches_rollups(trials=TRIAL_COUNT):
+    db = DiaryDB(os.path.join(TEST_DIR, "batches_rollups.db"), rollups=True)
+    for i in range(trials // len(SINK_EVENTS)):
+        db.log_many(SINK_EVENTS)
+    db.close()
+
+def seed_rollups_db():
+    """Copy the query db with rollups counted"""
+    shutil.copy(os.path.join(TEST_DIR, "query.db"), os.path.join(TEST_DIR, "rollups.db"))
+    DiaryDB(os.path.join(TEST_DIR, "rollups.db"), rollups=True).close()
+
+@timed
+def test_rollups_count(trials=TRIAL_COUNT):
+    """Count a day of events from the hourly rollups"""
+    db = DiaryDB(os.path.join(TEST_DIR, "rollups.db"), rollups=True)
+    for i in range(trials):
+        since = QUERY_START + timedelta(seconds=i * 50)
+        db.count(since=since, until=since + timedelta(days=1), period=HOUR)
+    db.close()
+
+@timed
+def test_table_count(trials=TRIAL_COUNT):
+    """Count a day of events from the logs table"""
+    db = DiaryDB(os.path.join(TEST_DIR, "query.db"))
+    for i in range(trials):
+        since = QUERY_START + timedelta(seconds=i * 50)
+        db.cursor.execute("SELECT count(*) FROM logs WHERE inputDT >= ? AND inputDT < ?",
+                          (since, since + timedelta(days=1))).fetchone()
+    db.close()
+
 if __name__ == '__main__':
     create_test_dir()
     test_simple_performance()
     test_simple_performance_no_async()
     test_simple_performance_no_db()
     test_simple_performance_no_log_file()
+    test_quiet_stats(TRIAL_COUNT * 100)
+    test_quiet_no_stats(TRIAL_COUNT * 100)
+    test_producers_queue(PRODUCER_COUNT * TRIAL_COUNT)
+    test_producers_diary_queue(PRODUCER_COUNT * TRIAL_COUNT)
+    test_producers_deque_queue(PRODUCER_COUNT * TRIAL_COUNT)
+    test_empty_call_baseline(TRIAL_COUNT * 100)
+    test_disabled_level(TRIAL_COUNT * 100)
+    test_builtin_formats(TRIAL_COUNT * 100)
+    test_compiled_builtin_formats(TRIAL_COUNT * 100)
+    test_template_format(TRIAL_COUNT * 100)
+    test_compiled_template_format(TRIAL_COUNT * 100)
+    test_strftime(TRIAL_COUNT * 100)
+    test_cached_strftime(TRIAL_COUNT * 100)
+    test_text_sink(TRIAL_COUNT * 100)
+    test_binary_sink(TRIAL_COUNT * 100)
+    test_segment_sink(TRIAL_COUNT * 100)
+    test_binary_segment_sink(TRIAL_COUNT * 100)
+    test_codecs_writes(TRIAL_COUNT * 100)
+    test_file_writes(TRIAL_COUNT * 100)
+    test_segment_writes(TRIAL_COUNT * 100)
+    seed_text_log()
+    test_read_text_log(TEXT_LOG_EVENTS)
+    test_indexed_window()
+    test_scanned_window(TRIAL_COUNT // 100)
+    test_db_commits_default()
+    test_db_commits_durable()
+    test_db_commits_balanced()
+    test_db_commits_fast()
+    test_db_batches_default(TRIAL_COUNT * 100)
+    test_db_batches_durable(TRIAL_COUNT * 100)
+    test_db_batches_balanced(TRIAL_COUNT * 100)
+    test_db_batches_fast(TRIAL_COUNT * 100)
+    test_db_batches_rollups(TRIAL_COUNT * 100)
+    seed_query_db()
+    test_query_errors()
+    test_query_time_range()
+    test_query_contains(TRIAL_COUNT // 10)
+    test_search(TRIAL_COUNT // 10)
+    seed_rollups_db()
+    test_rollups_count()
+    test_table_count()
     cleanup()
 
@@ -0,0 +1,185 @@
+from diary import Diary, DiaryDB, Event, levels
+from diary.queues import (DiaryQueue, DequeQueue, BLOCK, DROP_NEWEST,
+                          DROP_OLDEST, DROP_LEVEL)
+import threading
+import unittest
+
+try:
+    from queue import Empty
+except ImportError:  # python 2
+    from Queue import Empty
+import os
+
+
+class TestDiaryQueue(unittest.TestCase):
+    TEST_DIR_PATH = os.path.join(os.path.dirname(__file__),
+                                 'testing_dir')
+    INFO = "event was logged"
+
+    def fill(self, queue, *event_levels):
+        for level in event_levels:
+            queue.put(Event(self.INFO, level))
+
+    def levels_queued(self, queue):
+        return [event.level for event in queue.queue]
+
+    def test_bad_policy(self):
+        with self.assertRaises(ValueError):
+            DiaryQueue(1, overflow="drop_everything")
+
+    def test_unbounded(self):
+        queue = DiaryQueue(overflow=DROP_NEWEST)
+        self.fill(queue, *[levels.info] * 100)
+        self.assertEquals(queue.qsize(), 100)
+        self.assertEquals(queue.dropped, {})
+
+    def test_drop_newest(self):
+        queue = DiaryQueue(2, overflow=DROP_NEWEST)
+        self.fill(queue, levels.info, levels.warn, levels.error)
+        self.assertEquals(self.levels_queued(queue), [levels.info, levels.warn])
+        self.assertEquals(queue.dropped, {'ERROR': 1})
+
+    def test_drop_oldest(self):
+        queue = DiaryQueue(2, overflow=DROP_OLDEST)
+        self.fill(queue, levels.info, levels.warn, levels.error)
+        self.assertEquals(self.levels_queued(queue), [levels.warn, levels.error])
+        self.assertEquals(queue.dropped, {'INFO': 1})
+
+    def test_never_drops_sentinel(self):
+        for overflow in (DROP_OLDEST, DROP_LEVEL):
+            queue = DiaryQueue(2, overflow=overflow)
+            self.fill(queue, levels.info)
+            queue.put(None)
+            self.fill(queue, levels.debug, levels.info)
+            self.assertIn(None, list(queue.queue))
+            self.assertEquals(sum(queue.dropped.values()), 2)
+
+    def test_block_timeout(self):
+        queue = DiaryQueue(1, overflow=BLOCK, timeout=.01)
+        self.fill(queue, levels.info, levels.debug)
+        self.assertEquals(self.levels_queued(queue), [levels.info])
+        self.assertEquals(queue.dropped, {'DEBUG': 1})
+
+    def test_drop_level(self):
+        queue = DiaryQueue(3, overflow=DROP_LEVEL)
+        self.fill(queue, levels.info, levels.debug, levels.warn)
+
+        self.fill(queue, levels.error)
+        self.assertEquals(self.levels_queued(queue), [levels.info, levels.warn, levels.error])
+
+        self.fill(queue, levels.debug)
+        self.assertEquals(self.levels_queued(queue), [levels.info, levels.warn, levels.error])
+        self.assertEquals(queue.dropped, {'DEBUG': 2})
+
+        self.fill(queue, levels.warn)
+        self.assertEquals(self.levels_queued(queue), [levels.warn, levels.error, levels.warn])
+        self.assertEquals(queue.dropped, {'DEBUG': 2, 'INFO': 1})
+
+    def test_drop_level_never_drops_protected(self):
+        queue = DiaryQueue(1, overflow=DROP_LEVEL)
+        self.fill(queue, levels.error)
+        adder = threading.Thread(target=self.fill, args=(queue, levels.error))
+        adder.start()
+        adder.join(.05)
+        self.assertTrue(adder.is_alive())
+
+        self.assertIs(queue.get().level, levels.error)
+        adder.join()
+        self.assertIs(queue.get().level, levels.error)
+        self.assertEquals(queue.dropped, {})
+
+    def test_diary_queue(self):
+        queue = DiaryQueue(10, overflow=DROP_NEWEST)
+        log = Diary(self.TEST_DIR_PATH, file_name="bounded.log",
+                    db_name="bounded.db", queue=queue)
+        self.assertIs(log.thread.queue, queue)
+        for i in range(5):
+            log.info(self.INFO + str(i))
+        log.close()
+
+        with DiaryDB(log.db_file.name) as db:
+            db.assert_event_logged(self.INFO + "4")
+
+
+class TestDequeQueue(unittest.TestCase):
+    TEST_DIR_PATH = os.path.join(os.path.dirname(__file__),
+                                 'testing_dir')
+    INFO = "event was logged"
+
+    def test_bad_policy(self):
+        with self.assertRaises(ValueError):
+            DequeQueue(1, overflow=BLOCK)
+
+    def test_fifo(self):
+        queue = DequeQueue()
+        for i in range(5):
+            queue.put(i)
+        self.assertEquals(queue.qsize(), 5)
+        self.assertEquals([queue.get() for i in range(5)], list(range(5)))
+        self.assertTrue(queue.empty())
+
+    def test_get_timeout(self):
+        queue = DequeQueue()
+        with self.assertRaises(Empty):
+            queue.get(timeout=.01)
+        with self.assertRaises(Empty):
+            queue.get_nowait()
+
+    def test_wakes_consumer(self):
+        queue = DequeQueue()
+        received = []
+        consumer = threading.Thread(target=lambda: received.append(queue.get()))
+        consumer.start()
+        queue.put(self.INFO)
+        consumer.join(1)
+        self.assertEquals(received, [self.INFO])
+
+    def test_drop_newest(self):
+        queue = DequeQueue(1, overflow=DROP_NEWEST)
+        queue.put(Event(self.INFO, levels.info))
+        queue.put(Event(self.INFO, levels.warn))
+        self.assertIs(queue.get().level, levels.info)
+        self.assertEquals(queue.dropped, {'WARN': 1})
+
+    def test_drop_oldest(self):
+        queue = DequeQueue(1, overflow=DROP_OLDEST)
+        queue.put(Event(self.INFO, levels.info))
+        queue.put(Event(self.INFO, levels.warn))
+        self.assertIs(queue.get().level, levels.warn)
+        self.assertEquals(queue.dropped, {'INFO': 1})
+
+    def test_task_done(self):
+        queue = DequeQueue()
+        queue.put(Event(self.INFO, levels.info))
+        queue.get()
+        queue.task_done()  # Nothing is tracked, so nothing to complain about
+
+    def test_drop_oldest_keeps_sentinel(self):
+        queue = DequeQueue(1, overflow=DROP_OLDEST)
+        queue.put(None)
+        queue.put(Event(self.INFO, levels.info))
+        self.assertIs(queue.get(), None)
+        self.assertEquals(queue.dropped, {'INFO': 1})
+
+    def test_diary_many_producers(self):
+        producers, trials = 8, 50
+        log = Diary(self.TEST_DIR_PATH, file_name="deque.log",
+                    db_name="deque.db", queue=DequeQueue(), also_print=False)
+
+        def produce(n):
+            for i in range(trials):
+                log.info("{}-{}".format(n, i))
+
+        threads = [threading.Thread(target=produce, args=(n,)) for n in range(producers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        log.close()
+
+        with open(log.log_file.name) as f:
+            self.assertEquals(len(f.readlines()), producers * trials)
+
+
+if __name__ == '__main__':
+    unittest.main()
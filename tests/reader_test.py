@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+from diary import Diary, Event, CompactEvent, levels, formats
+from diary.reader import LogReader, Template, read
+from datetime import datetime
+import unittest
+import shutil
+import sys
+import io
+import os
+
+
+class UserEvent(Event):
+    formatter = "{info}|{user_name}"
+
+    def __init__(self, info, user_name, level=None):
+        Event.__init__(self, info, level)
+        self.user_name = user_name
+
+
+class TestReader(unittest.TestCase):
+    TEST_DIR_PATH = os.path.join(os.path.dirname(__file__),
+                                 'testing_dir', 'reader')
+    LOG_PATH = os.path.join(TEST_DIR_PATH, 'log.txt')
+    DT = datetime(2016, 7, 4, 21, 30, 15, 123456)
+
+    def setUp(self):
+        os.mkdir(self.TEST_DIR_PATH)
+
+    def tearDown(self):
+        shutil.rmtree(self.TEST_DIR_PATH)
+
+    def write(self, log_format, *events):
+        """Write events as Diary would"""
+        with io.open(self.LOG_PATH, 'ab') as f:
+            for event in events:
+                if sys.version_info[0] == 2 and isinstance(event.info, unicode):
+                    event.info = event.info.encode('utf-8')
+                text = log_format(event) + '\n'
+                f.write(text if isinstance(text, bytes) else text.encode('utf-8'))
+
+    def test_standard(self):
+        self.write(formats.standard, Event(u"ürgent", levels.error, self.DT),
+                   Event("no microseconds", levels.info, self.DT.replace(microsecond=0)))
+        logged = list(read(self.LOG_PATH))
+        self.assertEquals([event.info for event in logged], [u"ürgent", u"no microseconds"])
+        self.assertEquals(logged[0].dt, self.DT)
+        self.assertIs(logged[0].level, levels.error)
+        self.assertEquals(logged[1].level_str, "INFO")
+
+    def test_builtin_formats(self):
+        for log_format, dt in ((formats.minimal, self.DT.replace(microsecond=0)),
+                               (formats.easy_read, self.DT.replace(microsecond=0)),
+                               (formats.alarms, self.DT)):
+            self.write(log_format, Event("first", levels.warn, self.DT),
+                       Event("second", levels.error, self.DT))
+            logged = list(read(self.LOG_PATH, log_format))
+            self.assertEquals([(event.info, event.level_str, event.dt) for event in logged],
+                              [("first", "WARN", dt), ("second", "ERROR", dt)])
+            os.remove(self.LOG_PATH)
+
+    def test_compiled_format(self):
+        self.write(formats.compile_format(formats.standard), Event("compiled", levels.info, self.DT))
+        self.assertEquals(next(read(self.LOG_PATH, formats.compile_format(formats.standard))).info,
+                          "compiled")
+
+    def test_traceback(self):
+        logger = Diary(self.LOG_PATH, async=False, also_print=False)
+        logger.error("failed")
+        logger.info("next")
+        logger.close()
+
+        logged = list(read(self.LOG_PATH))
+        self.assertEquals(len(logged), 2)
+        self.assertTrue(logged[0].info.startswith("failed"))
+        self.assertTrue('\n  File "' in logged[0].info)
+        self.assertEquals(logged[1].info, "next")
+
+    def test_templates(self):
+        template = "{level_str}|{dt:%Y%m%d %H%M%S}|{info}"
+        self.write(formats.compile_format(template), Event("line one\nline two", levels.info, self.DT))
+        event = next(read(self.LOG_PATH, template, event=CompactEvent))
+        self.assertIsInstance(event, CompactEvent)
+        self.assertEquals(event.info, "line one\nline two")
+        self.assertEquals(event.dt, self.DT.replace(microsecond=0))
+
+        os.remove(self.LOG_PATH)
+        self.write(UserEvent.formatted, UserEvent("hello", "sam"))
+        event = next(read(self.LOG_PATH, event=UserEvent))
+        self.assertEquals((event.info, event.user_name), ("hello", "sam"))
+
+        with self.assertRaises(ValueError):
+            Template("{info!r}")
+        with self.assertRaises(ValueError):
+            read(self.LOG_PATH, log_format=lambda event: "")
+
+    def test_chunks_and_offsets(self):
+        events = [Event(u"event {}\ncontinued é".format(i), levels.info, self.DT) for i in range(20)]
+        self.write(formats.standard, *events)
+
+        reader = LogReader(self.LOG_PATH, buffer_size=7)
+        entries = list(reader.entries())
+        self.assertEquals([text for _, text in entries],
+                          [u"[INFO]:[2016-07-04 21:30:15.123456]: event {}\ncontinued é".format(i)
+                           for i in range(20)])
+        with io.open(self.LOG_PATH, 'rb') as f:
+            f.seek(entries[5][0])
+            self.assertTrue(f.readline().startswith(b'[INFO]'))
+        self.assertEquals([event.info.split('\n')[0] for event in reader.events(entries[18][0])],
+                          ["event 18", "event 19"])
+
+    def test_skipped(self):
+        with io.open(self.LOG_PATH, 'w') as f:
+            f.write(u"header line\n!!!ERROR!!!2016-07-04 21:30:15!!!unterminated\n")
+        reader = LogReader(self.LOG_PATH, formats.alarms)
+        self.assertEquals(list(reader), [])
+        self.assertEquals(reader.skipped, 1)
+
+    def test_follow(self):
+        self.write(formats.standard, Event("first", levels.info, self.DT))
+        logged = LogReader(self.LOG_PATH).events(follow=True, interval=.01)
+        self.assertEquals(next(logged).info, "first")
+
+        self.write(formats.standard, Event("second", levels.info, self.DT))
+        self.assertEquals(next(logged).info, "second")
+
+        os.rename(self.LOG_PATH, self.LOG_PATH + '.1')
+        self.write(formats.standard, Event("rotated", levels.info, self.DT))
+        self.assertEquals(next(logged).info, "rotated")
+        logged.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -10,12 +10,24 @@ sys.path.insert(0, myPath + '/../')
 import unittest
 import command_test
 import api_test
+import binary_test
 import diary_test
 import events_test
 import formats_test
+import index_test
 import levels_test
 import logdb_test
 import logthread_test
+import multiproc_test
+import partitions_test
+import queues_test
+import reader_test
+import segments_test
+import stats_test
+import writers_test
+
+if sys.version_info >= (3, 5):
+    import aio_test
 
 if __name__ == '__main__':
     cleanup = True
@@ -32,13 +44,31 @@ if __name__ == '__main__':
 
     # Add tests
     easy_load(api_test.TestAPI)
+    easy_load(binary_test.TestBinary)
     easy_load(command_test.SqliteTest)
     easy_load(diary_test.TestDiary)
     easy_load(events_test.TestEvent)
+    easy_load(events_test.TestCompactEvent)
     easy_load(formats_test.TestFormat)
+    easy_load(index_test.TestIndex)
     easy_load(levels_test.TestLevel)
     easy_load(logdb_test.TestDiaryDB)
+    easy_load(logdb_test.TestRetention)
+    easy_load(logdb_test.TestPragmas)
+    easy_load(logdb_test.TestReaderPool)
+    easy_load(logdb_test.TestRollups)
     easy_load(logthread_test.TestDiaryThread)
+    easy_load(multiproc_test.TestMultiprocess)
+    easy_load(partitions_test.TestPartitionedDiaryDB)
+    easy_load(queues_test.TestDiaryQueue)
+    easy_load(queues_test.TestDequeQueue)
+    easy_load(reader_test.TestReader)
+    easy_load(segments_test.TestSegments)
+    easy_load(stats_test.TestStats)
+    easy_load(writers_test.TestLogWriter)
+    easy_load(writers_test.TestRotation)
+    if sys.version_info >= (3, 5):
+        easy_load(aio_test.TestAsyncDiary)
 
     # Run tests
     results = unittest.TestResult()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+from diary import Diary, Event, levels
+from diary.segments import SegmentWriter, BinarySegmentWriter, SegmentReader, \
+    segment_name, segment_indexes, HEADER_SIZE
+from diary.writers import RotationPolicy
+import unittest
+import shutil
+import os
+
+
+class TestSegments(unittest.TestCase):
+    TEST_DIR_PATH = os.path.join(os.path.dirname(__file__),
+                                 'testing_dir', 'segments')
+    LOG_PATH = os.path.join(TEST_DIR_PATH, 'log.txt')
+    TEXT = u"event was logged\n"
+    SEGMENT_SIZE = HEADER_SIZE + len(TEXT) * 4
+
+    def setUp(self):
+        os.mkdir(self.TEST_DIR_PATH)
+        self.writer = None
+        self.reader = SegmentReader(self.LOG_PATH)
+
+    def tearDown(self):
+        self.reader.close()
+        if self.writer is not None:
+            self.writer.close()
+        shutil.rmtree(self.TEST_DIR_PATH)
+
+    def read_all(self):
+        data = b''
+        while True:
+            chunk = self.reader.read()
+            if not len(chunk):
+                return data.decode('utf-8')
+            data += bytes(chunk)
+
+    def test_preallocated(self):
+        self.writer = SegmentWriter(self.LOG_PATH, segment_size=self.SEGMENT_SIZE)
+        self.assertEquals(os.path.getsize(segment_name(self.LOG_PATH, 0)), self.SEGMENT_SIZE)
+        self.writer.write(self.TEXT)
+        self.assertEquals(os.path.getsize(segment_name(self.LOG_PATH, 0)), self.SEGMENT_SIZE)
+
+    def test_tail(self):
+        self.writer = SegmentWriter(self.LOG_PATH, segment_size=self.SEGMENT_SIZE)
+        self.assertEquals(self.read_all(), u"")
+        self.writer.write(self.TEXT)
+        self.assertEquals(self.read_all(), self.TEXT)
+        self.assertEquals(self.read_all(), u"")
+        self.writer.write(u"。\n")
+        self.assertEquals(self.read_all(), u"。\n")
+
+    def test_roll(self):
+        self.writer = SegmentWriter(self.LOG_PATH, segment_size=self.SEGMENT_SIZE)
+        for _ in range(10):
+            self.writer.write(self.TEXT)
+
+        self.assertEquals(self.writer.rolls, 2)
+        self.assertEquals(segment_indexes(self.LOG_PATH), [0, 1, 2])
+        self.assertEquals(self.read_all(), self.TEXT * 10)
+
+    def test_oversized_write(self):
+        self.writer = SegmentWriter(self.LOG_PATH, segment_size=self.SEGMENT_SIZE)
+        self.writer.write(self.TEXT * 6)
+        self.writer.write(self.TEXT)
+        self.assertEquals(self.writer.rolls, 2)
+        self.assertEquals(self.read_all(), self.TEXT * 7)
+
+    def test_reopen(self):
+        self.writer = SegmentWriter(self.LOG_PATH, segment_size=self.SEGMENT_SIZE)
+        self.writer.write(self.TEXT)
+        self.writer.close()
+        self.writer = SegmentWriter(self.LOG_PATH, segment_size=self.SEGMENT_SIZE)
+        self.writer.write(self.TEXT)
+        self.assertEquals(segment_indexes(self.LOG_PATH), [0])
+        self.assertEquals(self.read_all(), self.TEXT * 2)
+
+    def test_reopen_sealed(self):
+        self.writer = SegmentWriter(self.LOG_PATH, segment_size=self.SEGMENT_SIZE)
+        for _ in range(5):
+            self.writer.write(self.TEXT)
+        self.writer.close()
+        os.remove(segment_name(self.LOG_PATH, 1))
+
+        self.writer = SegmentWriter(self.LOG_PATH, segment_size=self.SEGMENT_SIZE)
+        self.writer.write(self.TEXT)
+        self.assertEquals(segment_indexes(self.LOG_PATH), [0, 1])
+        self.assertEquals(self.read_all(), self.TEXT * 5)
+
+    def test_binary(self):
+        self.writer = BinarySegmentWriter(self.LOG_PATH)
+        self.writer.write_many((), [Event(self.TEXT, levels.info), Event(self.TEXT, levels.error)])
+        logged = self.reader.events()
+        self.assertEquals([event.level for event in logged], [levels.info, levels.error])
+        self.assertEquals(logged[0].info, self.TEXT)
+        self.assertEquals(self.reader.events(), [])
+
+    def test_diary_sink(self):
+        log = Diary(self.LOG_PATH, async=False, also_print=False, sink=SegmentWriter)
+        log.info(self.TEXT)
+        log.close()
+        self.assertTrue(self.TEXT in self.read_all())
+
+    def test_rotation(self):
+        with self.assertRaises(ValueError):
+            SegmentWriter(self.LOG_PATH, rotation=RotationPolicy(max_bytes=1))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+from diary import Diary, DiaryDB, Event, levels
+from diary.events import CompactEvent
+from diary.queues import DiaryQueue, DROP_NEWEST
+from diary.stats import Histogram, Stats
+from datetime import datetime, timedelta
+from time import time
+import unittest
+import shutil
+import json
+import os
+
+
+class TestStats(unittest.TestCase):
+    TEST_DIR_PATH = os.path.join(os.path.dirname(__file__), 'testing_dir', 'stats')
+
+    def setUp(self):
+        os.mkdir(self.TEST_DIR_PATH)
+
+    def tearDown(self):
+        shutil.rmtree(self.TEST_DIR_PATH)
+
+    def test_histogram(self):
+        histogram = Histogram()
+        self.assertEquals(histogram.percentile(.5), None)
+        for value in [0, 1, 2, 3, 5, 900] + [10] * 94:
+            histogram.add(value)
+        self.assertEquals(histogram.count, 100)
+        self.assertEquals(histogram.min, 0)
+        self.assertEquals(histogram.max, 900)
+        self.assertEquals(histogram.percentile(.5), 15)  # The bucket of 8 to 15
+        self.assertEquals(histogram.percentile(.999), 900)  # Never more than the max
+        snapshot = histogram.snapshot()
+        self.assertEquals(snapshot['buckets'], [[0, 1], [1, 1], [3, 2], [7, 1], [15, 94], [1023, 1]])
+        self.assertEquals(snapshot['sum'], 1851)
+
+        histogram.add(-5)
+        self.assertEquals(histogram.min, 0)
+
+    def test_histogram_scale(self):
+        histogram = Histogram(scale=1e-6)
+        histogram.add(2500)
+        self.assertAlmostEquals(histogram.percentile(.5), .0025)
+        self.assertAlmostEquals(histogram.snapshot()['mean'], .0025)
+
+    def test_record(self):
+        stats = Stats()
+        written = time()
+        events = [Event("backdated", levels.info, datetime(2001, 1, 1)),
+                  CompactEvent("compact", levels.info), Event("not queued", levels.info)]
+        events[0]._queued = written - 2
+        events[1]._queued = written - .5
+        stats.record(events, written, {'format': .001, 'db': .002})
+        snapshot = stats.snapshot()
+        self.assertEquals(snapshot['events'], 3)
+        self.assertEquals(snapshot['batches'], 1)
+        self.assertEquals(snapshot['batch_size']['max'], 3)
+        self.assertAlmostEquals(snapshot['db']['max'], .002)
+        self.assertEquals(snapshot['file']['count'], 0)
+        self.assertEquals(snapshot['latency']['count'], 2)
+        self.assertAlmostEquals(snapshot['latency']['max'], 2, places=3)
+        self.assertEquals(snapshot['queue_depth'], None)
+        json.dumps(snapshot)
+
+    def test_diary(self):
+        queue = DiaryQueue(1, overflow=DROP_NEWEST)
+        log = Diary(self.TEST_DIR_PATH, also_print=False, queue=queue)
+        for i in range(50):
+            log.info("event {}".format(i))
+        log.close()
+        snapshot = log.stats()
+        self.assertEquals(snapshot['events'] + sum(snapshot['dropped'].values()), 50)
+        self.assertEquals(snapshot['latency']['count'], snapshot['events'])
+        self.assertEquals(snapshot['db']['count'], snapshot['batches'])
+        self.assertTrue(snapshot['bytes_written'] > 0)
+        self.assertEquals(snapshot['queue_depth'], 0)
+
+    def test_latency_from_queued(self):
+        log = Diary(self.TEST_DIR_PATH, async=False, also_print=False)
+        log.info(Event("backdated", levels.info, datetime(2001, 1, 1)))
+        log.close()
+        snapshot = log.stats()
+        self.assertEquals(snapshot['latency']['count'], 1)
+        self.assertTrue(snapshot['latency']['max'] < 60)
+
+    def test_disabled(self):
+        log = Diary(self.TEST_DIR_PATH, async=False, also_print=False, stats=False)
+        log.info("not counted")
+        self.assertEquals(log.stats(), None)
+        log.close()
+
+    def test_saved(self):
+        log = Diary(self.TEST_DIR_PATH, async=False, also_print=False, stats=Stats(interval=0))
+        log.info("saved")
+        log.info("saved again")
+        log.close()
+        with DiaryDB(os.path.join(self.TEST_DIR_PATH, 'diary.db')) as db:
+            saved = [snapshot for _, snapshot in db.saved_stats()]
+            self.assertEquals([snapshot['events'] for snapshot in saved], [1, 2])
+            self.assertEquals(list(db.saved_stats(since=datetime.now())), [])
+
+
+if __name__ == '__main__':
+    unittest.main()
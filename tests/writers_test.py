@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+from diary import Diary, Event, levels
+from diary import writers
+from diary.writers import FlushPolicy, LogWriter, RotationPolicy
+import unittest
+import shutil
+import gzip
+import time
+import os
+
+
+class TestLogWriter(unittest.TestCase):
+    TEMP_LOG_PATH = os.path.join(os.path.dirname(__file__),
+                                 'testing_dir', 'writer.log')
+    TEXT = u"event was logged\n"
+
+    def tearDown(self):
+        self.writer.close()
+        os.remove(self.TEMP_LOG_PATH)
+
+    def read(self):
+        with open(self.TEMP_LOG_PATH, 'rb') as f:
+            return f.read().decode('utf-8')
+
+    def test_default_flushes_every_write(self):
+        self.writer = LogWriter(self.TEMP_LOG_PATH)
+        self.writer.write_many([self.TEXT, self.TEXT])
+        self.writer.write(self.TEXT)
+        self.assertEquals(self.read(), self.TEXT * 3)
+        self.assertEquals(self.writer.flushes, 2)
+        self.assertEquals(self.writer.bytes_written, len(self.TEXT) * 3)
+
+    def test_max_events(self):
+        self.writer = LogWriter(self.TEMP_LOG_PATH, flush_policy=FlushPolicy(max_events=3))
+        self.writer.write(self.TEXT)
+        self.writer.write(self.TEXT)
+        self.assertEquals(self.read(), u"")
+        self.writer.write(self.TEXT)
+        self.assertEquals(self.read(), self.TEXT * 3)
+        self.assertEquals(self.writer.flushes, 1)
+
+    def test_max_bytes(self):
+        self.writer = LogWriter(self.TEMP_LOG_PATH,
+                                flush_policy=FlushPolicy(max_bytes=len(self.TEXT) * 2))
+        self.writer.write(self.TEXT)
+        self.assertEquals(self.writer.flushes, 0)
+        self.writer.write(self.TEXT)
+        self.assertEquals(self.writer.flushes, 1)
+
+    def test_max_bytes_counts_encoded_bytes(self):
+        self.writer = LogWriter(self.TEMP_LOG_PATH, flush_policy=FlushPolicy(max_bytes=8))
+        self.writer.write(u"\u00e9\u00e9\u00e9\u00e9")  # 4 characters, 8 bytes of utf-8
+        self.assertEquals(self.writer.flushes, 1)
+        self.assertEquals(self.read(), u"\u00e9\u00e9\u00e9\u00e9")
+
+    def test_interval(self):
+        self.writer = LogWriter(self.TEMP_LOG_PATH, flush_policy=FlushPolicy(interval=.05))
+        self.writer.write(self.TEXT)
+        self.assertEquals(self.read(), u"")
+        self.assertTrue(self.writer.timeout() <= .05)
+        time.sleep(.06)
+        self.writer.poll()
+        self.assertEquals(self.read(), self.TEXT)
+        self.assertIsNone(self.writer.timeout())
+
+    def test_level(self):
+        self.writer = LogWriter(self.TEMP_LOG_PATH,
+                                flush_policy=FlushPolicy(max_events=100, level=levels.error))
+        self.writer.write_many([self.TEXT], [Event(self.TEXT, levels.warn)])
+        self.assertEquals(self.writer.flushes, 0)
+        self.writer.write_many([self.TEXT], [Event(self.TEXT, levels.error)])
+        self.assertEquals(self.read(), self.TEXT * 2)
+
+    def test_close_flushes(self):
+        self.writer = LogWriter(self.TEMP_LOG_PATH, flush_policy=FlushPolicy())
+        self.writer.write(u"。")
+        self.writer.close()
+        self.assertTrue(self.writer.closed)
+        self.assertEquals(self.read(), u"。")
+        self.assertEquals(self.writer.bytes_written, 3)
+
+
+class TestRotation(unittest.TestCase):
+    TEST_DIR_PATH = os.path.join(os.path.dirname(__file__),
+                                 'testing_dir', 'rotation')
+    LOG_PATH = os.path.join(TEST_DIR_PATH, 'rotating.log')
+    TEXT = u"event was logged\n"
+
+    def setUp(self):
+        os.mkdir(self.TEST_DIR_PATH)
+        self.writer = None
+
+    def tearDown(self):
+        if self.writer is not None:
+            self.writer.close()
+        shutil.rmtree(self.TEST_DIR_PATH)
+
+    def rotated(self):
+        return [name for name in sorted(os.listdir(self.TEST_DIR_PATH))
+                if name != os.path.basename(self.LOG_PATH)]
+
+    def test_max_bytes(self):
+        rotation = RotationPolicy(max_bytes=len(self.TEXT) * 2)
+        self.writer = LogWriter(self.LOG_PATH, rotation=rotation)
+        for _ in range(5):
+            self.writer.write(self.TEXT)
+
+        self.assertEquals(self.writer.rotations, 2)
+        self.assertEquals(len(self.rotated()), 2)
+        self.assertEquals(self.writer.size, len(self.TEXT))
+        for name in self.rotated():
+            with open(os.path.join(self.TEST_DIR_PATH, name)) as f:
+                self.assertEquals(f.read(), self.TEXT * 2)
+
+    def test_oversized_write(self):
+        self.writer = LogWriter(self.LOG_PATH, rotation=RotationPolicy(max_bytes=1))
+        self.writer.write(self.TEXT)
+        self.assertEquals(self.writer.rotations, 0)
+        self.writer.write(self.TEXT)
+        self.assertEquals(self.writer.rotations, 1)
+
+    def test_when(self):
+        self.writer = LogWriter(self.LOG_PATH, rotation=RotationPolicy(when=writers.HOURLY))
+        self.writer.write(self.TEXT)
+        self.assertEquals(self.writer.rotations, 0)
+        self.writer.period = "1970010100"
+        self.writer.write(self.TEXT)
+        self.assertEquals(self.writer.rotations, 1)
+        self.assertEquals(self.writer.period, time.strftime('%Y%m%d%H'))
+
+    def test_keep(self):
+        rotation = RotationPolicy(max_bytes=2, keep=2)
+        self.writer = LogWriter(self.LOG_PATH, rotation=rotation)
+        for i in range(5):
+            self.writer.write(u"{}\n".format(i))
+        self.writer.close()
+
+        rotated = self.rotated()
+        self.assertEquals(len(rotated), 2)
+        with open(os.path.join(self.TEST_DIR_PATH, rotated[-1])) as f:
+            self.assertEquals(f.read(), u"3\n")
+
+    def test_gzip(self):
+        rotation = RotationPolicy(max_bytes=len(self.TEXT), compress=writers.GZIP)
+        self.writer = LogWriter(self.LOG_PATH, rotation=rotation)
+        self.writer.write(self.TEXT)
+        self.writer.write(self.TEXT)
+        self.writer.close()
+
+        rotated = self.rotated()
+        self.assertEquals(len(rotated), 1)
+        self.assertTrue(rotated[0].endswith('.gz'))
+        with gzip.open(os.path.join(self.TEST_DIR_PATH, rotated[0]), 'rb') as f:
+            self.assertEquals(f.read().decode('utf-8'), self.TEXT)
+
+    def test_lzma(self):
+        if writers.lzma is None:
+            with self.assertRaises(ValueError):
+                RotationPolicy(compress=writers.LZMA)
+            return
+        rotation = RotationPolicy(max_bytes=len(self.TEXT), compress=writers.LZMA, keep=1)
+        self.writer = LogWriter(self.LOG_PATH, rotation=rotation)
+        for _ in range(3):
+            self.writer.write(self.TEXT)
+        self.writer.close()
+
+        rotated = self.rotated()
+        self.assertEquals(len(rotated), 1)
+        with writers.lzma.open(os.path.join(self.TEST_DIR_PATH, rotated[0])) as f:
+            self.assertEquals(f.read().decode('utf-8'), self.TEXT)
+
+    def test_bad_policy(self):
+        with self.assertRaises(ValueError):
+            RotationPolicy(when="weekly")
+        with self.assertRaises(ValueError):
+            RotationPolicy(compress="zip")
+
+    def test_diary_rotation(self):
+        rotation = RotationPolicy(max_bytes=1, compress=writers.GZIP)
+        log = Diary(self.LOG_PATH, async=False, also_print=False, rotation=rotation)
+        log.info(self.TEXT)
+        log.info(self.TEXT)
+        log.close()
+        self.assertEquals(len(self.rotated()), 1)
+        with open(self.LOG_PATH) as f:
+            self.assertTrue(self.TEXT in f.read())
+
+
+if __name__ == '__main__':
+    unittest.main()